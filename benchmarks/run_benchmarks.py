@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""性能测试：用FFmpeg的lavfi测试源生成输入视频，比较各引擎/模式/质量/并行任务数的速度
+
+用法:
+    python benchmarks/run_benchmarks.py                    # 快速测试（两个小视频）
+    python benchmarks/run_benchmarks.py --full             # 包括1080p和4K输入
+    python benchmarks/run_benchmarks.py -e ffmpeg -m copy smart -w 1 4 --json result.json
+    python benchmarks/run_benchmarks.py --baseline old.json   # 与之前的结果比较
+
+每个组合在单独的子进程中运行，峰值内存包括该进程启动的所有FFmpeg进程（取其中最大者）。
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from splitter import __version__  # noqa: E402
+from splitter.options import MODES, MOVIEPY_MODES, QUALITY_CRF  # noqa: E402
+
+# 测试输入: 名称 -> (宽, 高, 帧率, 时长, GOP长度, 是否有音频)
+INPUTS = {
+    "360p_gop250_audio": (640, 360, 25, 20, 250, True),
+    "720p_gop50_noaudio": (1280, 720, 30, 20, 50, False),
+}
+FULL_INPUTS = dict(INPUTS, **{
+    "1080p_gop120_audio": (1920, 1080, 30, 60, 120, True),
+    "2160p_gop60_audio": (3840, 2160, 30, 20, 60, True),
+})
+
+DEFAULT_CACHE_DIR = os.path.join(ROOT, "benchmarks", ".inputs")
+
+
+def input_path(cache_dir, name):
+    return os.path.join(cache_dir, f"{name}.mp4")
+
+
+def generate_input(cache_dir, name, spec):
+    """用 testsrc2/sine 生成测试视频（已存在时直接使用）"""
+    width, height, fps, duration, gop, audio = spec
+    path = input_path(cache_dir, name)
+    if os.path.exists(path):
+        return path
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={duration}",
+    ]
+    if audio:
+        cmd += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}"]
+    cmd += [
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+    ]
+    if audio:
+        cmd += ["-c:a", "aac", "-b:a", "128k"]
+    
+    # 先写入临时文件，中断时不会留下不完整的输入
+    temp_path = path + ".part.mp4"
+    print(f"生成测试输入: {name}", file=sys.stderr)
+    subprocess.run(cmd + [temp_path], check=True)
+    os.replace(temp_path, path)
+    return path
+
+
+def directory_size(path):
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            if name.endswith(".mp4"):
+                total += os.path.getsize(os.path.join(folder, name))
+    return total
+
+
+def run_child(config):
+    """在子进程中执行一次分割，把耗时和峰值内存以JSON输出到stdout"""
+    from splitter import SplitOptions, split_videos
+    
+    options = SplitOptions(
+        segment_duration=config["segment_duration"],
+        quality=config["quality"],
+        engine=config["engine"],
+        mode=config["mode"],
+        workers=config["workers"],
+        resume=False
+    )
+    start = time.perf_counter()
+    split_videos([config["input"]], config["output_dir"], options, log=lambda line: None)
+    wall = time.perf_counter() - start
+    
+    peak_rss = None
+    try:
+        import resource
+    except ImportError:
+        # Windows 没有 resource 模块，不统计内存
+        pass
+    else:
+        # Linux 上 ru_maxrss 的单位是KB，macOS 上是字节
+        scale = 1 if sys.platform == "darwin" else 1024
+        peak_rss = max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        ) * scale
+    
+    json.dump({"wall": wall, "peak_rss": peak_rss}, sys.stdout)
+
+
+def run_case(case, input_file, spec, segment_duration):
+    """运行一个组合并计算指标；失败时记录错误信息"""
+    width, height, fps, duration, gop, audio = spec
+    output_dir = tempfile.mkdtemp(prefix="split_bench_")
+    config = dict(case, input=input_file, output_dir=output_dir,
+                  segment_duration=segment_duration)
+    result = dict(case)
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", json.dumps(config)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        if completed.returncode != 0:
+            error_lines = completed.stderr.strip().splitlines()
+            result["error"] = error_lines[-1] if error_lines else f"退出码 {completed.returncode}"
+            return result
+        
+        measured = json.loads(completed.stdout)
+        segments = sum(
+            1 for _, _, files in os.walk(output_dir) for name in files if name.endswith(".mp4")
+        )
+        if segments == 0:
+            result["error"] = "没有生成任何片段"
+            return result
+        wall = measured["wall"]
+        result.update(
+            wall=round(wall, 3),
+            segments=segments,
+            segments_per_sec=round(segments / wall, 2),
+            realtime=round(duration / wall, 2),
+            peak_rss_mb=(
+                round(measured["peak_rss"] / (1024 * 1024), 1)
+                if measured["peak_rss"] is not None else None
+            ),
+            output_mb=round(directory_size(output_dir) / (1024 * 1024), 2),
+        )
+        return result
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def build_cases(args, inputs):
+    cases = []
+    for name in inputs:
+        for engine in args.engines:
+            engine_modes = MODES if engine == "ffmpeg" else MOVIEPY_MODES
+            modes = [mode for mode in args.modes if mode in engine_modes]
+            # moviepy引擎固定使用libx264默认质量
+            qualities = args.qualities if engine == "ffmpeg" else ["medium"]
+            for mode, quality, workers in itertools.product(modes, qualities, args.workers):
+                cases.append({
+                    "input": name, "engine": engine, "mode": mode,
+                    "quality": quality, "workers": workers,
+                })
+    return cases
+
+
+def case_key(result):
+    return (result["input"], result["engine"], result["mode"], result["quality"], result["workers"])
+
+
+def format_table(results, baseline=None):
+    """对齐的文本表格；有基准结果时增加速度变化一列"""
+    columns = ["input", "engine", "mode", "quality", "workers",
+               "segments_per_sec", "realtime", "peak_rss_mb", "output_mb"]
+    headers = ["输入", "引擎", "模式", "质量", "并行", "片段/秒", "实时倍速", "峰值内存MB", "输出MB"]
+    baseline_map = {}
+    if baseline is not None:
+        baseline_map = {case_key(r): r for r in baseline["results"] if "error" not in r}
+        headers.append("对比基准")
+    
+    rows = []
+    for result in results:
+        if "error" in result:
+            row = [str(result[c]) for c in columns[:5]] + [f"失败: {result['error']}"]
+        else:
+            row = ["-" if result[c] is None else str(result[c]) for c in columns]
+            if baseline is not None:
+                old = baseline_map.get(case_key(result))
+                row.append(f"{result['realtime'] / old['realtime'] - 1:+.0%}" if old else "-")
+        rows.append(row)
+    
+    widths = [max([len(h)] + [len(r[i]) for r in rows if i < len(r)]) for i, h in enumerate(headers)]
+    lines = ["  ".join(h.ljust(w) for h, w in zip(headers, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    for row in rows:
+        lines.append("  ".join(cell.ljust(w) for cell, w in zip(row, widths)))
+    return "\n".join(lines)
+
+
+def host_info():
+    try:
+        version = subprocess.run(
+            ["ffmpeg", "-version"], stdout=subprocess.PIPE, text=True
+        ).stdout.splitlines()[0]
+    except (OSError, IndexError):
+        version = None
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": version,
+        "splitter": __version__,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="视频分割性能测试")
+    parser.add_argument("--full", action="store_true", help="包括1080p和4K测试输入")
+    parser.add_argument("-i", "--inputs", nargs="+", help="只测试指定的输入（名称见 INPUTS）")
+    parser.add_argument("-e", "--engines", nargs="+", default=["ffmpeg", "moviepy"],
+                        choices=["ffmpeg", "moviepy"])
+    parser.add_argument("-m", "--modes", nargs="+",
+                        default=list(MODES) + [m for m in MOVIEPY_MODES if m not in MODES])
+    parser.add_argument("-q", "--qualities", nargs="+", default=["medium"],
+                        choices=list(QUALITY_CRF))
+    parser.add_argument("-w", "--workers", nargs="+", type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument("-d", "--duration", type=float, default=3.0, help="片段长度（秒）")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="测试输入的保存目录")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    parser.add_argument("--baseline", help="之前保存的JSON结果，用于比较速度变化")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.child:
+        run_child(json.loads(args.child))
+        return 0
+    
+    all_inputs = FULL_INPUTS if args.full or args.inputs else INPUTS
+    names = args.inputs or list(all_inputs)
+    unknown = [name for name in names if name not in FULL_INPUTS]
+    if unknown:
+        print(f"未知的测试输入: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    args.workers = sorted(set(args.workers))
+    
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    
+    inputs = {name: generate_input(args.cache_dir, name, FULL_INPUTS[name]) for name in names}
+    cases = build_cases(args, names)
+    results = []
+    for number, case in enumerate(cases, 1):
+        print(f"[{number}/{len(cases)}] {case['input']} {case['engine']} {case['mode']} "
+              f"{case['quality']} x{case['workers']}", file=sys.stderr)
+        results.append(run_case(case, inputs[case["input"]], FULL_INPUTS[case["input"]],
+                                args.duration))
+    
+    report = {
+        "host": host_info(),
+        "segment_duration": args.duration,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(format_table(results, baseline))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""图形界面的文件列表：只绘制可见的行
+
+CTkTextbox 每次更新都要重写全部内容，几万个文件时非常慢。这里把数据保存在列表中，
+Canvas 上只绘制当前可见的几十行；添加文件、更新时长和状态时只标记需要重绘，
+在界面空闲时合并为一次绘制。
+"""
+import math
+import os
+import tkinter as tk
+
+import customtkinter as ctk
+
+# 行高（像素，缩放比例为1时）
+ROW_HEIGHT = 22
+
+# 列：(标题, 宽度)；文件名放在最后，过长时直接超出右边界
+COLUMNS = (
+    ("#", 56),
+    ("状态", 76),
+    ("时长", 76),
+    ("片段", 56),
+    ("文件", None),
+)
+
+# 文件状态
+STATUS_PROBING = "探测中"
+STATUS_READY = "就绪"
+STATUS_ERROR = "无法读取"
+
+# 队列中的视频的状态（splitter.job_queue 中的状态 -> 显示名称）
+QUEUE_STATUSES = {
+    "queued": "排队",
+    "running": "处理中",
+    "done": "完成",
+    "failed": "失败",
+    "cancelled": "已取消",
+}
+
+# 用红色显示的状态
+ERROR_STATUSES = (STATUS_ERROR, QUEUE_STATUSES["failed"])
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    seconds = int(round(seconds))
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def estimate_segments(duration, segment_duration):
+    """按固定间隔估计片段数（按场景或静音分割时实际数量会有差异）"""
+    if duration is None:
+        return None
+    return max(1, int(math.ceil(duration / segment_duration - 1e-6)))
+
+
+class VirtualFileList(ctk.CTkFrame):
+    def __init__(self, master, segment_duration=3.0, **kwargs):
+        super().__init__(master, **kwargs)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        
+        self.segment_duration = segment_duration
+        # 每个文件一行: [路径, 时长, 状态]
+        self.rows = []
+        # 路径 -> 行号
+        self.positions = {}
+        # 第一个可见行
+        self.first = 0
+        self.redraw_pending = False
+        
+        # Canvas不会自动按界面缩放比例（高DPI）调整，行高、列宽和字号需要自己换算
+        self.row_height = round(self._apply_widget_scaling(ROW_HEIGHT))
+        self.column_widths = [round(self._apply_widget_scaling(width or 0))
+                              for _, width in COLUMNS]
+        self.font = ctk.CTkFont(size=round(self._apply_widget_scaling(12)))
+        self.canvas = tk.Canvas(self, highlightthickness=0, borderwidth=0,
+                                bg=self.theme_color("CTkTextbox", "fg_color"))
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        
+        self.canvas.bind("<Configure>", lambda event: self.schedule_redraw())
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll_rows(3))
+    
+    def theme_color(self, widget, key):
+        return self._apply_appearance_mode(ctk.ThemeManager.theme[widget][key])
+    
+    def _set_appearance_mode(self, mode_string):
+        # 切换浅色/深色主题时Canvas不会自动换色
+        super()._set_appearance_mode(mode_string)
+        self.canvas.configure(bg=self.theme_color("CTkTextbox", "fg_color"))
+        self.schedule_redraw()
+    
+    def clear(self):
+        self.rows = []
+        self.positions = {}
+        self.first = 0
+        self.schedule_redraw()
+    
+    def add_files(self, paths):
+        """在末尾添加文件（状态为探测中），已在列表中的文件跳过，返回实际添加的文件"""
+        added = []
+        for path in paths:
+            if path in self.positions:
+                continue
+            self.positions[path] = len(self.rows)
+            self.rows.append([path, None, STATUS_PROBING])
+            added.append(path)
+        if added:
+            self.schedule_redraw()
+        return added
+    
+    def set_duration(self, path, duration, error=None):
+        position = self.positions.get(path)
+        if position is None:
+            return
+        row = self.rows[position]
+        row[1] = duration
+        if row[2] == STATUS_PROBING:  # 已加入队列的文件保留队列状态
+            row[2] = STATUS_ERROR if error is not None else STATUS_READY
+        self.schedule_redraw()
+    
+    def set_status(self, path, status):
+        position = self.positions.get(path)
+        if position is None:
+            return
+        self.rows[position][2] = status
+        self.schedule_redraw()
+    
+    def duration(self, path):
+        """文件的时长，未知或不在列表中时返回None"""
+        position = self.positions.get(path)
+        return None if position is None else self.rows[position][1]
+    
+    def set_segment_duration(self, segment_duration):
+        self.segment_duration = segment_duration
+        self.schedule_redraw()
+    
+    def summary(self):
+        """(文件数, 已知的总时长, 估计的总片段数, 无法读取的文件数)"""
+        total = 0.0
+        segments = 0
+        errors = 0
+        for _, duration, status in self.rows:
+            if duration is not None:
+                total += duration
+                segments += estimate_segments(duration, self.segment_duration)
+            elif status == STATUS_ERROR:
+                errors += 1
+        return len(self.rows), total, segments, errors
+    
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.row_height - 1)
+    
+    def scroll_rows(self, count):
+        last = max(0, len(self.rows) - self.visible_rows())
+        first = min(max(self.first + count, 0), last)
+        if first != self.first:
+            self.first = first
+            self.schedule_redraw()
+    
+    def on_mouse_wheel(self, event):
+        # Windows每格为120，macOS为较小的值
+        step = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll_rows(-3 * step)
+    
+    def on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.first = 0
+            self.scroll_rows(int(float(args[0]) * len(self.rows)))
+        elif action == "scroll":
+            count = int(args[0])
+            if args[1] == "pages":
+                count *= self.visible_rows()
+            self.scroll_rows(count)
+        self.schedule_redraw()
+    
+    def schedule_redraw(self):
+        """合并多次更新，在界面空闲时绘制一次"""
+        if not self.redraw_pending:
+            self.redraw_pending = True
+            self.after_idle(self.redraw)
+    
+    def redraw(self):
+        self.redraw_pending = False
+        canvas = self.canvas
+        canvas.delete("all")
+        text_color = self.theme_color("CTkLabel", "text_color")
+        dim_color = self.theme_color("CTkScrollbar", "button_color")
+        
+        visible = self.visible_rows()
+        self.first = min(self.first, max(0, len(self.rows) - visible))
+        
+        # 标题行
+        row_height = self.row_height
+        x = 6
+        for (title, _), width in zip(COLUMNS, self.column_widths):
+            canvas.create_text(x, row_height // 2, text=title, anchor="w", font=self.font,
+                               fill=text_color)
+            x += width
+        y = row_height
+        canvas.create_line(0, y, canvas.winfo_width(), y, fill=dim_color)
+        
+        for position in range(self.first, min(self.first + visible, len(self.rows))):
+            path, duration, status = self.rows[position]
+            segments = estimate_segments(duration, self.segment_duration)
+            values = (
+                str(position + 1),
+                status,
+                format_duration(duration),
+                "-" if segments is None else str(segments),
+                os.path.basename(path),
+            )
+            x = 6
+            y += row_height
+            color = text_color if status not in ERROR_STATUSES else "#d9534f"
+            for width, value in zip(self.column_widths, values):
+                canvas.create_text(x, y - row_height // 2, text=value, anchor="w",
+                                   font=self.font, fill=color)
+                x += width
+        
+        if self.rows:
+            self.scrollbar.set(self.first / len(self.rows),
+                               min(1.0, (self.first + visible) / len(self.rows)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""视频分割引擎，不依赖图形界面
+    
+    from splitter import SplitOptions, split_videos
+    split_videos(["a.mp4"], "out", SplitOptions(segment_duration=3.0, mode="single_pass"))
+
+监视目录，新文件写入完成后立即分割:
+    
+    watch_folders(["incoming"], "out", SplitOptions(workers=4))
+
+实时分割正在录制的文件或管道输入，每个片段结束后立即输出:
+    
+    split_live("recording.ts", "out", SplitOptions(segment_duration=10.0))
+
+持久化队列，按优先级和时长处理（处理期间可以继续加入视频）:
+    
+    queue = JobQueue.open()
+    queue.add(["urgent.mp4"], "out", priority=10)
+    process_queue(queue, SplitOptions(workers=4))
+
+命令行: python -m splitter --help
+"""
+from .options import (BOUNDARIES, ENGINES, MODES, MOVIEPY_MODES, OUTPUT_FORMATS, PRESETS,
+                      QUALITY_CRF, Rendition, SplitOptions, parse_rendition)
+from .job_queue import JobQueue, QueueEntry
+from .live import DEFAULT_IDLE_TIMEOUT
+from .processes import Cancelled
+from .watch import DEFAULT_INTERVAL, DEFAULT_SETTLE, FolderWatcher
+
+__version__ = "1.1.0"
+
+
+def create_splitter(options, log=None, progress=None, status=None):
+    """按 options.engine 创建分割引擎；moviepy 只在使用时才导入"""
+    if options.engine == "moviepy":
+        from .moviepy_engine import MoviepySplitter
+        return MoviepySplitter(options, log, progress, status)
+    
+    from .ffmpeg_engine import FFmpegSplitter
+    return FFmpegSplitter(options, log, progress, status)
+
+
+def split_videos(video_files, output_directory, options=None, log=None, progress=None,
+                 status=None):
+    """把每个视频分割到 output_directory/<文件名>/ 下，出错时抛出异常；返回运行统计 (RunMetrics)
+    
+    log(line)、progress(0~1)、status(text) 都是可选回调，会从工作线程调用
+    """
+    splitter = create_splitter(options or SplitOptions(), log, progress, status)
+    return splitter.split_videos(list(video_files), output_directory)
+
+
+def watch_folders(directories, output_directory, options=None, log=None, progress=None,
+                  status=None, interval=DEFAULT_INTERVAL, settle=DEFAULT_SETTLE, stop=None):
+    """监视 directories，新视频写入完成（大小和修改时间 settle 秒不变）后立即分割到 output_directory
+    
+    一直运行到 stop（threading.Event）被设置或按下 Ctrl+C；返回运行统计 (RunMetrics)
+    """
+    splitter = create_splitter(options or SplitOptions(), log, progress, status)
+    watcher = FolderWatcher(directories, settle)
+    return splitter.watch(watcher, output_directory, interval, stop)
+
+
+def split_live(source, output_directory, options=None, log=None, status=None,
+               idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """实时分割标准输入（source 为 "-"）或仍在写入的文件，每个片段结束后立即输出；只支持FFmpeg引擎
+    
+    文件 idle_timeout 秒没有增长（或管道关闭）时视为输入结束；返回运行统计 (RunMetrics)
+    """
+    options = options or SplitOptions()
+    if options.engine != "ffmpeg":
+        raise ValueError("实时分割只支持FFmpeg引擎")
+    
+    from .ffmpeg_engine import FFmpegSplitter
+    return FFmpegSplitter(options, log, None, status).split_live(source, output_directory,
+                                                                 idle_timeout)
+
+
+def process_queue(queue, options=None, log=None, progress=None, status=None, stop=None,
+                  on_entry=None):
+    """处理队列 (JobQueue) 中的视频：优先级高的先处理，优先级相同时时长短的先处理
+    
+    一直运行到队列为空或 stop（threading.Event）被设置；需要暂停或取消时用 create_splitter
+    创建引擎并调用其 run_queue、pause、resume、cancel。返回运行统计 (RunMetrics)
+    """
+    splitter = create_splitter(options or SplitOptions(), log, progress, status)
+    return splitter.run_queue(queue, stop, on_entry=on_entry)
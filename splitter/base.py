@@ -0,0 +1,693 @@
+# -*- coding: utf-8 -*-
+"""各分割引擎共用的部分"""
+import heapq
+import itertools
+import math
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+from dataclasses import asdict
+from functools import partial
+
+from .hls import init_filename, playlist_filename, single_filename
+from .job_queue import (HEARTBEAT_INTERVAL, STATUS_CANCELLED, STATUS_DONE, STATUS_FAILED,
+                        STATUS_QUEUED, STATUS_RUNNING)
+from .manifest import SegmentManifest
+from .metrics import RunMetrics
+from .output_cache import OutputCache, content_id, segment_key
+from .probe import probe_streams
+from .probe_cache import ProbeCache
+from .processes import Cancelled
+from .runner import JobRunner
+
+
+# prepare_batch 所在任务的标签：其中启动的FFmpeg（例如校准时的试编码）同样可以暂停和取消
+PREPARE_TAG = "prepare"
+
+
+def segment_filename(base_name, index):
+    """第 index 个片段（从1开始）的输出文件名"""
+    return f"{base_name}_segment_{index:03d}.mp4"
+
+
+def segment_pattern(base_name):
+    """与 segment_filename 对应的FFmpeg文件名模板（文件名中的%需转义）"""
+    return base_name.replace("%", "%%") + "_segment_%03d.mp4"
+
+
+def unlink_shared_outputs(video_output_dir, base_name, indices):
+    """删除即将重新生成的片段中从输出缓存复用的文件
+
+    复用的输出文件与缓存文件是同一个文件（硬链接），FFmpeg覆盖写入会同时改坏缓存
+    和其他从缓存复用它的输出目录，所以重新生成前先删除
+    """
+    for index in indices:
+        output_path = os.path.join(video_output_dir, segment_filename(base_name, index))
+        try:
+            if os.stat(output_path).st_nlink > 1:
+                os.remove(output_path)
+        except OSError:
+            pass
+
+
+class BaseSplitter:
+    def __init__(self, options, log=None, progress=None, status=None):
+        self.options = options
+        self.runner = JobRunner(options.workers, log, progress, status)
+        self.log = self.runner.log
+        self.manifests = []
+        self.metrics = RunMetrics(options)
+        # 监视模式：视频文件 -> 尚未完成的任务数；处理中的文件又被修改时等处理完再重新处理
+        self.active = {}
+        self.active_lock = threading.Lock()
+        # 队列模式 (run_queue)：有任务结束、新任务待提交或继续处理时唤醒调度
+        self.queue = None
+        self.wake = threading.Event()
+        self.probe_cache = None
+        if options.probe_cache:
+            try:
+                self.probe_cache = ProbeCache.open(options.probe_cache_path)
+            except (OSError, sqlite3.Error) as e:
+                self.log(f"警告: 无法打开探测缓存，将直接探测: {str(e)}")
+        self.output_cache = None
+        if options.output_cache:
+            try:
+                self.output_cache = OutputCache.open(options.output_cache_dir,
+                                                     options.output_cache_mb)
+            except (OSError, sqlite3.Error) as e:
+                self.log(f"警告: 无法打开输出缓存，所有片段都将重新生成: {str(e)}")
+    
+    @property
+    def segment_duration(self):
+        return self.options.segment_duration
+    
+    def probe(self, video_file, name, probe_func):
+        """读取视频信息 name（probe_func(video_file) 的结果），优先使用探测缓存"""
+        if self.probe_cache is not None:
+            try:
+                return self.probe_cache.get(video_file, name, probe_func)
+            except sqlite3.Error as e:
+                self.log(f"警告: 探测缓存出错，将直接探测: {str(e)}")
+        return probe_func(video_file)
+    
+    def segment_ranges(self, video_file, duration):
+        """所有片段的 (开始, 结束) 时间：固定间隔、场景切换处或静音处（options.boundaries）"""
+        if self.options.boundaries == "scene":
+            cuts = self.scene_cuts(video_file, duration)
+        else:
+            count = int(math.ceil(duration / self.segment_duration))
+            cuts = [j * self.segment_duration for j in range(1, count)]
+            if self.options.boundaries == "silence" and cuts:
+                cuts = self.silence_cuts(video_file, cuts)
+        bounds = [0.0] + [cut for cut in cuts if 0 < cut < duration] + [duration]
+        return list(zip(bounds[:-1], bounds[1:]))
+    
+    def scene_cuts(self, video_file, duration):
+        """分析场景切换并返回分割点，结果保存在探测缓存中"""
+        # 分析需要 numpy，只在按场景分割时导入
+        from .scene_detect import detect_scene_cuts
+        
+        options = self.options
+        name = (f"scene_cuts/{options.scene_threshold}/{options.min_segment}/"
+                f"{options.max_segment}/{options.segment_duration}")
+        detect = partial(
+            detect_scene_cuts, duration=duration, threshold=options.scene_threshold,
+            min_length=options.min_segment, max_length=options.max_segment,
+            target_length=options.segment_duration
+        )
+        self.log("分析场景切换...")
+        started = time.perf_counter()
+        with self.metrics.stage("analyze", video_file):
+            cuts = self.probe(video_file, name, detect)
+        seconds = time.perf_counter() - started
+        self.log(f"找到 {len(cuts)} 个场景分割点 (分析用时 {seconds:.1f}秒)")
+        return cuts
+    
+    def silence_cuts(self, video_file, targets):
+        """把固定间隔的分割点移到附近的静音处，结果保存在探测缓存中；没有音轨时不移动"""
+        # 分析需要 numpy，只在按静音分割时导入
+        from .silence_detect import detect_silence_cuts
+        
+        options = self.options
+        try:
+            streams = self.probe(video_file, "streams", probe_streams)
+        except (OSError, subprocess.SubprocessError):
+            streams = None
+        if streams is not None and not any(s["type"] == "audio" for s in streams):
+            self.log("没有音轨，使用固定间隔的分割点")
+            return targets
+        
+        # 移动范围不超过片段长度的一半，相邻分割点不会交叉
+        tolerance = min(options.silence_window, self.segment_duration / 2)
+        name = (f"silence_cuts/{options.segment_duration}/{len(targets)}/{tolerance}/"
+                f"{options.silence_db}")
+        detect = partial(detect_silence_cuts, targets=targets, tolerance=tolerance,
+                         threshold_db=options.silence_db)
+        self.log("分析静音...")
+        started = time.perf_counter()
+        with self.metrics.stage("analyze", video_file):
+            cuts = self.probe(video_file, name, detect)
+        seconds = time.perf_counter() - started
+        moved = sum(1 for cut, target in zip(cuts, targets) if abs(cut - target) > 1e-6)
+        self.log(f"{moved}/{len(targets)} 个分割点移到了静音处附近 (分析用时 {seconds:.1f}秒)")
+        return cuts
+    
+    def output_params(self, rendition=None):
+        """决定输出内容的编码参数（输出缓存键的一部分）；rendition 是多规格输出中的一种规格"""
+        raise NotImplementedError
+    
+    def restores_prefix_only(self):
+        """FFmpeg一次输出从第一个未完成片段到结尾的所有片段时，只能复用开头连续的已缓存片段"""
+        return False
+    
+    def prepare_output(self, video_file, output_directory):
+        """创建视频的输出子目录，返回 (输出目录, 文件名主干)"""
+        base_name = os.path.splitext(os.path.basename(video_file))[0]
+        video_output_dir = os.path.join(output_directory, base_name)
+        os.makedirs(video_output_dir, exist_ok=True)
+        return video_output_dir, base_name
+    
+    def manifest_params(self, rendition=None):
+        """决定输出内容的参数，任何一项变化时清单失效，所有片段重新处理"""
+        params = {
+            "engine": self.options.engine,
+            "mode": self.options.mode,
+            "segment_duration": self.segment_duration,
+            "quality": self.options.quality,
+        }
+        if self.options.preset != "fast":
+            params["preset"] = self.options.preset
+        if self.options.boundaries == "scene":
+            params.update(
+                boundaries=self.options.boundaries,
+                min_segment=self.options.min_segment,
+                max_segment=self.options.max_segment,
+                scene_threshold=self.options.scene_threshold,
+            )
+        elif self.options.boundaries == "silence":
+            params.update(
+                boundaries=self.options.boundaries,
+                silence_window=self.options.silence_window,
+                silence_db=self.options.silence_db,
+            )
+        if self.options.output_format != "mp4":
+            params["output_format"] = self.options.output_format
+        if rendition is not None:
+            params["rendition"] = asdict(rendition)
+        if self.options.thumbnails:
+            # 续传时跳过的片段需要有之前保存的取样帧
+            params.update(
+                thumbnail_interval=self.options.thumbnail_interval,
+                thumbnail_width=self.options.thumbnail_width,
+            )
+        return params
+    
+    def open_thumbnails(self, video_output_dir, base_name, segments, jobs=1):
+        """未启用缩略图时返回None；jobs 是会调用 finish_job() 的任务数"""
+        if not self.options.thumbnails:
+            return None
+        # 缩略图需要 numpy 和 PIL，只在启用时导入
+        from .thumbnails import VideoThumbnails
+        
+        return VideoThumbnails(video_output_dir, base_name, segments,
+                               self.options.thumbnail_interval, self.options.thumbnail_width,
+                               jobs, self.log)
+    
+    def run_with_thumbnails(self, thumbnails, video_file, job):
+        try:
+            job()
+        finally:
+            self.finish_thumbnails(thumbnails, video_file)
+    
+    def finish_thumbnails(self, thumbnails, video_file):
+        """一个任务结束（出错时也调用），最后一个任务拼接雪碧图"""
+        if thumbnails is None:
+            return
+        try:
+            with self.metrics.stage("thumbnail", video_file):
+                thumbnails.finish_job()
+        except (OSError, ValueError) as e:
+            self.log(f"警告: 无法生成缩略图: {str(e)}")
+    
+    def open_manifest(self, video_file, video_output_dir, segments, rendition=None):
+        """打开视频的片段清单，报告续传时跳过的片段数，并从输出缓存复用已生成过的片段
+        
+        segments 是各片段的 (开始, 结束) 时间；rendition 是多规格输出中该目录对应的规格
+        """
+        num_segments = len(segments)
+        manifest, resumed = SegmentManifest.open(
+            video_output_dir, video_file, self.manifest_params(rendition), self.options.resume
+        )
+        manifest.metrics = self.metrics
+        self.manifests.append(manifest)
+        
+        if resumed:
+            skipped = num_segments - len(manifest.pending(num_segments))
+            if skipped:
+                label = f" ({rendition.name})" if rendition is not None else ""
+                self.log(f"续传{label}: 跳过 {skipped}/{num_segments} 个已完成的片段")
+        else:
+            manifest.save(force=True)
+        
+        base_name = os.path.splitext(os.path.basename(video_file))[0]
+        # 从缓存复用的片段没有经过解码，取不到缩略图
+        if (self.output_cache is not None and self.options.output_format == "mp4"
+                and not self.options.thumbnails):
+            self.use_output_cache(manifest, video_file, video_output_dir, base_name, segments,
+                                  rendition)
+        
+        unlink_shared_outputs(video_output_dir, base_name, manifest.pending(num_segments))
+        return manifest
+    
+    def use_output_cache(self, manifest, video_file, video_output_dir, base_name, segments,
+                         rendition=None):
+        """复用缓存中的片段，并在之后生成的片段检查通过时把它们加入缓存"""
+        try:
+            input_id = content_id(video_file)
+        except OSError as e:
+            self.log(f"警告: 无法读取 {video_file}，不使用输出缓存: {str(e)}")
+            return
+        params = self.output_params(rendition)
+        keys = [segment_key(input_id, start, end, params) for start, end in segments]
+        
+        restored = 0
+        for index in manifest.pending(len(segments)):
+            output_path = os.path.join(video_output_dir, segment_filename(base_name, index))
+            try:
+                cached = self.output_cache.restore(keys[index - 1], output_path)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                self.log(f"警告: 读取输出缓存出错: {str(e)}")
+                cached = None
+            if cached is None:
+                if self.restores_prefix_only():
+                    break
+                continue
+            manifest.mark_cached(index, output_path, cached)
+            restored += 1
+        if restored:
+            label = f" ({rendition.name})" if rendition is not None else ""
+            self.log(f"输出缓存{label}: 复用 {restored}/{len(segments)} 个片段")
+        
+        manifest.on_done = partial(self.cache_segment, keys)
+    
+    def cache_segment(self, keys, index, output_path, record):
+        try:
+            self.output_cache.store(keys[index - 1], output_path, record)
+        except (OSError, sqlite3.Error) as e:
+            self.log(f"警告: 无法保存到输出缓存: {str(e)}")
+    
+    def split_videos(self, video_files, output_directory):
+        """分割所有视频，出错时抛出异常；返回运行统计 (RunMetrics)"""
+        total_files = len(video_files)
+        self.log(f"并行任务数: {self.options.workers} (每个任务 {self.options.threads} 线程)")
+        
+        try:
+            self.run_prepare_batch(video_files)
+            jobs = []
+            for i, video_file in enumerate(video_files, 1):
+                jobs.extend(self.create_jobs(video_file, i, total_files, output_directory))
+            
+            self.run_jobs(jobs)
+        except Cancelled:
+            for video_file in video_files:
+                self.remove_partial_outputs(video_file, output_directory)
+            raise
+        finally:
+            self.close()
+        self.log("所有视频处理完成!")
+        return self.metrics
+    
+    def prepare_batch(self, video_files):
+        """创建任务之前调用一次，可以根据整批视频调整参数"""
+    
+    def run_prepare_batch(self, video_files):
+        """在可以暂停和取消的任务中调用 prepare_batch"""
+        with self.runner.tracker.task(PREPARE_TAG):
+            self.runner.tracker.checkpoint(PREPARE_TAG)
+            self.prepare_batch(video_files)
+    
+    def watch(self, watcher, output_directory, interval, stop=None):
+        """监视目录（watcher 是 FolderWatcher），视频写入完成后立即提交处理任务，直到 stop 被设置
+        
+        stop 是可选的 threading.Event；单个视频出错只记录日志，不停止监视。
+        所有任务完成时保存清单和报告，返回运行统计 (RunMetrics)
+        """
+        if self.options.auto_tune:
+            raise ValueError("监视目录时总时长未知，不能按目标速度或完成时限选择预设")
+        self.log(f"并行任务数: {self.options.workers} (每个任务 {self.options.threads} 线程)")
+        self.log(f"监视目录: {', '.join(watcher.directories)}")
+        stop = stop or threading.Event()
+        file_index = 0
+        busy = False
+        
+        self.runner.start()
+        try:
+            while True:
+                for video_file in watcher.poll():
+                    with self.active_lock:
+                        if video_file in self.active:
+                            watcher.defer(video_file)
+                            continue
+                        self.active[video_file] = 1
+                    file_index += 1
+                    self.log(f"发现新文件: {video_file}")
+                    self.runner.submit([partial(
+                        self.ingest, video_file, file_index, output_directory
+                    )])
+                    busy = True
+                self.runner.collect()
+                if busy and self.runner.idle():
+                    busy = False
+                    self.finish_batch()
+                    self.log("等待新文件...")
+                if stop.wait(interval):
+                    break
+        except KeyboardInterrupt:
+            self.log("停止监视，等待正在处理的任务完成...")
+        finally:
+            self.runner.stop()
+            self.runner.reset_progress()
+            self.close()
+        self.log("已停止监视")
+        return self.metrics
+    
+    def ingest(self, video_file, file_index, output_directory):
+        """监视模式中处理一个新文件：在工作线程中准备任务（探测、分析）并提交"""
+        try:
+            jobs = self.create_jobs(video_file, file_index, file_index, output_directory)
+            with self.active_lock:
+                self.active[video_file] += len(jobs)
+            self.runner.submit([partial(self.run_watched, video_file, job) for job in jobs])
+        finally:
+            self.release(video_file)
+    
+    def run_watched(self, video_file, job):
+        try:
+            job()
+        finally:
+            self.release(video_file)
+    
+    def release(self, video_file):
+        with self.active_lock:
+            self.active[video_file] -= 1
+            if not self.active[video_file]:
+                del self.active[video_file]
+    
+    def run_queue(self, queue, stop=None, interval=1.0, on_entry=None):
+        """处理队列 (JobQueue) 中的视频，直到队列为空或 stop（threading.Event）被设置
+        
+        处理期间可以继续向队列加入视频。每当有空闲的并行任务，从排队的视频和已开始视频的剩余任务中
+        选出最靠前的一个（优先级高、时长短），后加入的紧急短视频不必等前面的长视频处理完。
+        pause()、resume()、cancel() 可以从其他线程调用；stop 被设置（或按下 Ctrl+C）时立即终止
+        正在运行的FFmpeg，这些视频回到队列，下次续传；暂停期间即使队列已空也等待 resume()。
+        on_entry(条目) 在视频开始和结束时调用（从工作线程调用）。返回运行统计 (RunMetrics)
+        """
+        self.log(f"并行任务数: {self.options.workers} (每个任务 {self.options.threads} 线程)")
+        stop = stop or threading.Event()
+        self.queue = queue
+        self.on_entry = on_entry
+        self.owner = uuid.uuid4().hex
+        # 已开始的视频: 条目编号 -> [条目, 未结束的任务数, 第一个错误]
+        self.started = {}
+        # 已开始的视频中尚未提交的任务堆: (排序键, 序号, 条目编号, 任务)
+        self.backlog = []
+        self.sequence = itertools.count()
+        # 已提交、尚未结束的任务数
+        self.in_flight = 0
+        self.aborting = False
+        self.file_index = 0
+        
+        requeued = queue.requeue_interrupted()
+        if requeued:
+            self.log(f"{requeued} 个上次中断的视频回到队列")
+        self.runner.start()
+        last_heartbeat = time.monotonic()
+        try:
+            if self.options.auto_tune:
+                try:
+                    self.run_prepare_batch(
+                        [entry.path for entry in queue.entries([STATUS_QUEUED])]
+                    )
+                except Cancelled:
+                    self.log(f"已取消校准，使用预设 {self.options.preset}")
+            while not stop.is_set():
+                self.wake.clear()
+                self.dispatch_queue()
+                self.runner.collect()
+                if time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                    last_heartbeat = time.monotonic()
+                    queue.heartbeat(self.owner)
+                    queue.requeue_interrupted()
+                with self.active_lock:
+                    busy = self.in_flight > 0 or bool(self.started)
+                if not busy and not self.runner.tracker.paused and queue.next_entry() is None:
+                    break
+                self.wake.wait(interval)
+            else:
+                self.abort_queue()
+        except KeyboardInterrupt:
+            self.log("停止处理，终止正在运行的任务...")
+            self.abort_queue()
+        finally:
+            self.runner.stop()
+            self.requeue_started()
+            self.runner.reset_progress()
+            self.close()
+        self.log("队列处理结束")
+        return self.metrics
+    
+    def dispatch_queue(self):
+        """为空闲的并行任务提交排序最靠前的任务：排队的新视频或已开始视频的剩余任务"""
+        queue = self.queue
+        while not self.runner.tracker.paused:
+            with self.active_lock:
+                if self.in_flight >= self.options.workers:
+                    return
+                best = self.backlog[0] if self.backlog else None
+            entry = queue.next_entry()
+            if entry is not None and (best is None or entry.sort_key() < best[0]):
+                if not queue.start(entry.id, self.owner):
+                    continue  # 刚被取消或被其他进程取走
+                entry.status = STATUS_RUNNING
+                self.file_index += 1
+                with self.active_lock:
+                    self.started[entry.id] = [entry, 1, None]
+                    self.in_flight += 1
+                self.notify_entry(entry)
+                total = self.file_index + queue.counts().get(STATUS_QUEUED, 0)
+                self.runner.submit([partial(self.ingest_entry, entry, self.file_index, total)],
+                                   tag=entry.id)
+            elif best is not None:
+                with self.active_lock:
+                    _, _, entry_id, job = heapq.heappop(self.backlog)
+                if self.runner.tracker.is_cancelled(entry_id):
+                    self.release_entry(entry_id)
+                    continue
+                with self.active_lock:
+                    self.in_flight += 1
+                self.runner.submit([partial(self.run_entry_job, entry_id, job)], tag=entry_id)
+            else:
+                return
+    
+    def ingest_entry(self, entry, file_index, total_files):
+        """在工作线程中准备一个视频的任务（探测、分析），按该视频的排序键放入待提交的任务堆"""
+        try:
+            jobs = self.create_jobs(entry.path, file_index, total_files, entry.output_directory)
+            key = entry.sort_key()
+            with self.active_lock:
+                self.started[entry.id][1] += len(jobs)
+                for job in jobs:
+                    heapq.heappush(self.backlog, (key, next(self.sequence), entry.id, job))
+        except Exception as e:
+            self.record_entry_error(entry.id, e)
+            raise
+        finally:
+            self.release_entry(entry.id, slot=True)
+    
+    def run_entry_job(self, entry_id, job):
+        try:
+            job()
+        except Exception as e:
+            self.record_entry_error(entry_id, e)
+            raise
+        finally:
+            self.release_entry(entry_id, slot=True)
+    
+    def record_entry_error(self, entry_id, error):
+        with self.active_lock:
+            state = self.started[entry_id]
+            if state[2] is None:
+                state[2] = error
+    
+    def release_entry(self, entry_id, slot=False):
+        """视频的一个任务结束（slot 为真时它占用了一个并行任务）；所有任务都结束时记录结果"""
+        with self.active_lock:
+            if slot:
+                self.in_flight -= 1
+            state = self.started[entry_id]
+            state[1] -= 1
+            finished = state[1] == 0
+            if finished:
+                del self.started[entry_id]
+        if finished:
+            self.finish_entry(state[0], state[2])
+        self.wake.set()
+    
+    def finish_entry(self, entry, error):
+        tracker = self.runner.tracker
+        name = os.path.basename(entry.path)
+        if tracker.is_cancelled(entry.id):
+            removed = self.remove_partial_outputs(entry.path, entry.output_directory)
+            if self.aborting:
+                entry.status = STATUS_QUEUED
+                self.log(f"中断: {name}，下次继续 (删除 {removed} 个未完成的文件)")
+            else:
+                entry.status = STATUS_CANCELLED
+                self.log(f"已取消: {name} (删除 {removed} 个未完成的文件)")
+            entry.error = None
+        elif error is not None:
+            entry.status = STATUS_FAILED
+            entry.error = str(error) or type(error).__name__
+        else:
+            entry.status = STATUS_DONE
+        tracker.forget(entry.id)
+        self.queue.finish(entry.id, entry.status, entry.error)
+        self.notify_entry(entry)
+    
+    def notify_entry(self, entry):
+        if self.on_entry is not None:
+            self.on_entry(entry)
+    
+    def abort_queue(self):
+        """停止处理队列：终止所有正在运行的任务，它们的视频回到队列"""
+        self.aborting = True
+        self.runner.tracker.cancel()
+        # 挂起的进程收到终止信号后才能退出
+        self.runner.tracker.resume()
+    
+    def requeue_started(self):
+        """停止处理后仍有未提交任务的视频回到队列"""
+        with self.active_lock:
+            started = list(self.started.values())
+            self.started = {}
+            self.backlog = []
+        for entry, _, _ in started:
+            self.remove_partial_outputs(entry.path, entry.output_directory)
+            entry.status = STATUS_QUEUED
+            self.queue.finish(entry.id, STATUS_QUEUED)
+            self.notify_entry(entry)
+    
+    def pause(self):
+        """暂停：不再开始新的任务，正在运行的FFmpeg被挂起"""
+        self.runner.tracker.pause()
+        self.log("已暂停")
+    
+    def resume(self):
+        self.runner.tracker.resume()
+        self.log("继续处理")
+        self.wake.set()
+    
+    def cancel(self, entry_id=None):
+        """取消队列中的一个视频（entry_id 为 None 时取消所有视频）：排队的不再处理，正在处理的
+        立即终止FFmpeg并删除未完成的输出。不在队列模式时取消正在运行的所有任务
+        """
+        tracker = self.runner.tracker
+        if self.queue is None:
+            tracker.cancel()
+            return
+        if entry_id is None:
+            self.queue.cancel()
+            tracker.cancel(PREPARE_TAG)
+            with self.active_lock:
+                started = list(self.started)
+            for started_id in started:
+                tracker.cancel(started_id)
+        else:
+            self.queue.cancel(entry_id)
+            tracker.cancel(entry_id)
+        self.wake.set()
+    
+    def remove_partial_outputs(self, video_file, output_directory):
+        """删除被取消的视频未完成的输出（清单中没有记录为完成的片段，HLS输出的播放列表等），
+        返回删除的文件数；之前完成的片段保留，之后仍可续传
+        """
+        video_file = os.path.abspath(video_file)
+        base_name = os.path.splitext(os.path.basename(video_file))[0]
+        directories = [os.path.join(output_directory, base_name)] + [
+            os.path.join(output_directory, rendition.name, base_name)
+            for rendition in self.options.renditions
+        ]
+        names = set()
+        if self.options.output_format != "mp4":
+            names = {playlist_filename(base_name), init_filename(base_name),
+                     single_filename(base_name)}
+        removed = 0
+        for directory in directories:
+            manifest = next((m for m in self.manifests
+                             if os.path.dirname(m.path) == directory
+                             and m.data["input"] == video_file), None)
+            if manifest is None:
+                # 在打开清单之前（探测、分析时）被取消：以之前保存的清单为准
+                manifest = SegmentManifest.load(directory)
+            done = manifest.done_paths() if manifest is not None else set()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if not (entry.name.startswith(base_name + "_segment_") or entry.name in names):
+                    continue
+                path = os.path.abspath(entry.path)
+                if path in done or path == video_file or not entry.is_file():
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+    
+    def finish_batch(self):
+        """保存已处理视频的清单和报告，并清空总进度"""
+        for manifest in self.manifests:
+            manifest.save(force=True)
+        self.manifests = []
+        self.write_reports()
+        self.runner.reset_progress()
+    
+    def close(self):
+        """运行结束（出错时也调用）：保存清单，关闭缓存，保存报告"""
+        for manifest in self.manifests:
+            manifest.save(force=True)
+        self.manifests = []
+        if self.probe_cache is not None:
+            self.probe_cache.close()
+        if self.output_cache is not None:
+            self.output_cache.close()
+        self.metrics.finish()
+        self.write_reports()
+    
+    def write_reports(self):
+        """按 options 保存JSON/CSV报告和Prometheus指标文件（出错时也保存已完成部分的统计）"""
+        outputs = (
+            (self.options.report_json, self.metrics.write_json),
+            (self.options.report_csv, self.metrics.write_csv),
+            (self.options.metrics_file, self.metrics.write_prometheus),
+        )
+        for path, write in outputs:
+            if not path:
+                continue
+            try:
+                write(path)
+            except OSError as e:
+                self.log(f"警告: 无法写入 {path}: {str(e)}")
+    
+    def run_jobs(self, jobs):
+        self.runner.run(jobs)
+    
+    def create_jobs(self, video_file, file_index, total_files, output_directory):
+        """返回处理一个视频的任务列表（无参数的可调用对象）"""
+        raise NotImplementedError
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""按目标速度自动选择编码预设
+
+固定使用 -preset fast 时，快的机器浪费了可以换成更小文件的时间，慢的机器又可能赶不上时限。
+校准时从本批视频中按总时长均匀选取几个短窗口，用各个预设从快到慢依次试编码，
+测量速度（实时倍数）和输出码率，选择仍能达到目标速度的最慢预设。某个预设达不到目标后
+更慢的预设不再测试。CRF仍由编码质量决定，校准只改变预设。
+
+测量结果按主机、编码器、CRF、每个进程的线程数和分辨率保存在用户缓存目录中：
+    
+    {"主机|libx264|crf=23|threads=4|1920x1080": {
+        "time": 测量时间,
+        "presets": {"fast": {"speed": 3.1, "bitrate": 2400000}, ...}
+    }}
+
+相同条件下不再重复试编码，换了目标速度只需补测之前没有测到的预设。
+试编码失败的窗口不计入结果，所有窗口都失败的预设跳过。
+"""
+import json
+import os
+import platform
+import tempfile
+import time
+
+from .ffmpeg_progress import run_ffmpeg
+from .metrics import write_atomic
+from .options import PRESETS
+from .processes import paused_seconds
+from .probe_cache import user_cache_dir
+
+CODEC = "libx264"
+
+# 参与自动选择的预设（从快到慢）；veryslow 比 slower 慢很多而文件几乎不再变小
+CANDIDATE_PRESETS = PRESETS[:PRESETS.index("slower") + 1]
+
+# 试编码的窗口数和每个窗口的长度（秒）
+SAMPLE_WINDOWS = 3
+SAMPLE_SECONDS = 4.0
+
+CACHE_NAME = "calibration.json"
+
+# 测量结果的有效期（秒），之后FFmpeg升级、机器负载变化等需要重新测量
+MAX_AGE = 30 * 24 * 3600
+
+
+def sample_windows(files, count=SAMPLE_WINDOWS, length=SAMPLE_SECONDS):
+    """files 是 [(视频文件, 时长)]，在所有视频首尾相接的总时长上均匀选取 count 个窗口
+    
+    返回 [(视频文件, 开始, 长度)]，窗口不跨越文件
+    """
+    files = [(video_file, duration) for video_file, duration in files if duration > 0]
+    total = sum(duration for _, duration in files)
+    windows = []
+    for k in range(count if files else 0):
+        position = (k + 0.5) / count * total
+        for video_file, duration in files:
+            if position < duration:
+                break
+            position -= duration
+        else:
+            position = duration
+        window = min(length, duration)
+        start = min(max(position - window / 2, 0.0), duration - window)
+        windows.append((video_file, round(start, 3), round(window, 3)))
+    return windows
+
+
+def calibration_key(crf, threads, resolution):
+    width, height = resolution
+    return f"{platform.node()}|{CODEC}|crf={crf}|threads={threads}|{width}x{height}"
+
+
+def encode_sample(video_file, start, length, preset, crf, threads, output_path):
+    """试编码一个窗口（只有视频），返回 (用时, 输出字节数)；失败时返回None"""
+    cmd = [
+        "ffmpeg", "-y", "-ss", str(start), "-t", str(length), "-i", video_file,
+        "-map", "0:v:0", "-an", "-sn",
+        "-c:v", CODEC, "-crf", crf, "-preset", preset, "-threads", str(threads),
+        "-f", "mp4", output_path
+    ]
+    started = time.perf_counter()
+    paused = paused_seconds()
+    result = run_ffmpeg(cmd)
+    # 试编码期间暂停的时间不计入用时
+    seconds = time.perf_counter() - started - (paused_seconds() - paused)
+    if result.returncode != 0 or not os.path.exists(output_path):
+        return None
+    return seconds, os.path.getsize(output_path)
+
+
+def measure_preset(windows, preset, crf, threads):
+    """用 preset 编码所有窗口，返回 {"speed": 实时倍数, "bitrate": 每秒比特数}；
+    所有窗口都试编码失败时返回None
+    """
+    seconds = 0.0
+    size = 0
+    media = 0.0
+    with tempfile.TemporaryDirectory(prefix="calibrate_") as work_dir:
+        for n, (video_file, start, length) in enumerate(windows):
+            output_path = os.path.join(work_dir, f"sample_{n}.mp4")
+            sample = encode_sample(video_file, start, length, preset, crf, threads,
+                                   output_path)
+            if sample is None:
+                continue
+            seconds += sample[0]
+            size += sample[1]
+            media += length
+    if media <= 0 or seconds <= 0:
+        return None
+    return {"speed": round(media / seconds, 3), "bitrate": int(size * 8 / media)}
+
+
+class CalibrationCache:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(user_cache_dir(), CACHE_NAME)
+    
+    def read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+    
+    def load(self, key):
+        """未过期的测量结果 {预设: {"speed", "bitrate"}}"""
+        entry = self.read().get(key)
+        if not isinstance(entry, dict) or time.time() - entry.get("time", 0) > MAX_AGE:
+            return {}
+        return dict(entry.get("presets", {}))
+    
+    def store(self, key, presets, replace=False):
+        """保存新测量的结果，与之前未过期的结果合并；replace 为真时丢弃之前的结果"""
+        # 重新读取：其他进程可能同时保存了其他条件的结果
+        data = self.read()
+        entry = data.get(key)
+        if (not replace and isinstance(entry, dict)
+                and time.time() - entry.get("time", 0) <= MAX_AGE):
+            merged = dict(entry.get("presets", {}), **presets)
+            measured = entry["time"]
+        else:
+            merged = presets
+            measured = time.time()
+        data[key] = {"time": measured, "presets": merged}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        write_atomic(self.path, lambda f: json.dump(data, f, ensure_ascii=False, indent=1))
+
+
+def choose_preset(measure, required_speed, measured=None, log=print):
+    """从快到慢测试预设，返回 (达到 required_speed 的最慢预设, 新测量的结果)
+    
+    measure(preset) 返回 {"speed", "bitrate"}，无法测量时返回None（跳过该预设）；
+    measured 是已有的测量结果，不再重复测量。最快的预设也达不到时返回测量到的最快预设，
+    所有预设都无法测量时返回None
+    """
+    measured = measured or {}
+    new = {}
+    chosen = None
+    fastest = None
+    for preset in CANDIDATE_PRESETS:
+        result = measured.get(preset)
+        if result is None:
+            result = measure(preset)
+            if result is None:
+                log(f"校准 {preset}: 试编码失败，跳过")
+                continue
+            new[preset] = result
+            log(f"校准 {preset}: {result['speed']:.2f}x 实时, "
+                f"{result['bitrate'] / 1000:.0f} kb/s")
+        fastest = fastest or preset
+        if result["speed"] < required_speed:
+            break
+        chosen = preset
+    return chosen or fastest, new
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""命令行入口: python -m splitter"""
+import argparse
+import re
+import sys
+
+from . import __version__, process_queue, split_live, split_videos, watch_folders
+from .importer import FileImporter
+from .job_queue import STATUS_CANCELLED, STATUS_DONE, STATUS_FAILED, STATUS_QUEUED, JobQueue
+from .live import DEFAULT_IDLE_TIMEOUT
+from .options import (BOUNDARIES, ENGINES, MODES, MOVIEPY_MODES, OUTPUT_FORMATS, PRESETS,
+                      QUALITY_CRF, SplitOptions, parse_rendition)
+from .watch import DEFAULT_INTERVAL, DEFAULT_SETTLE
+
+
+def rendition_arg(text):
+    try:
+        return parse_rendition(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def deadline_arg(text):
+    """秒数，或带单位的时长：90m、1.5h、2h30m"""
+    match = re.fullmatch(r"(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s?)?",
+                         text.strip())
+    if not text.strip() or not match:
+        raise argparse.ArgumentTypeError(f"时长格式无效: {text}")
+    hours, minutes, seconds = (float(part or 0) for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m splitter",
+        description="将长视频分割成指定长度的短片段"
+    )
+    parser.add_argument("inputs", nargs="*", help="输入视频文件")
+    parser.add_argument("-o", "--output-dir", help="输出目录")
+    parser.add_argument("-d", "--duration", type=float, default=3.0,
+                        help="片段长度（秒），默认 3")
+    parser.add_argument("-b", "--boundaries", choices=BOUNDARIES, default="fixed",
+                        help="分割点：fixed 每隔 --duration 秒，scene 在场景切换处，"
+                             "silence 移到附近的静音处；默认 fixed")
+    parser.add_argument("--min-segment", type=float,
+                        help="按场景分割时的最短片段（秒），默认 --duration 的一半")
+    parser.add_argument("--max-segment", type=float,
+                        help="按场景分割时的最长片段（秒），默认 --duration 的两倍")
+    parser.add_argument("--scene-threshold", type=float, default=0.3,
+                        help="场景切换阈值（0~1），越小分割点越多，默认 0.3")
+    parser.add_argument("--silence-window", type=float, default=1.0,
+                        help="按静音分割时分割点最多移动的秒数，默认 1")
+    parser.add_argument("--silence-db", type=float, default=-40.0,
+                        help="低于该音量（dBFS）视为静音，默认 -40")
+    parser.add_argument("-q", "--quality", choices=list(QUALITY_CRF), default="medium",
+                        help="编码质量，默认 medium")
+    parser.add_argument("--preset", choices=PRESETS, default="fast",
+                        help="libx264 编码预设（FFmpeg引擎），越慢文件越小，默认 fast")
+    parser.add_argument("--target-speed", type=float, metavar="X",
+                        help="自动选择预设：试编码本批视频的片段，选择所有并行任务合计仍能达到 X 倍"
+                             "实时速度的最慢预设；测量结果按主机保存，之后不再重复试编码")
+    parser.add_argument("--deadline", type=deadline_arg, metavar="TIME",
+                        help="自动选择预设：整批视频需要在该时间内编码完成，例如 5400、90m、1.5h")
+    parser.add_argument("--recalibrate", action="store_true",
+                        help="忽略保存的测量结果，重新试编码")
+    parser.add_argument("-e", "--engine", choices=ENGINES, default="ffmpeg",
+                        help="分割引擎，默认 ffmpeg")
+    mode_choices = list(MODES) + [mode for mode in MOVIEPY_MODES if mode not in MODES]
+    parser.add_argument("-m", "--mode", choices=mode_choices, default="per_segment",
+                        help="分割模式，默认 per_segment；stream 仅用于 moviepy 引擎")
+    parser.add_argument("-f", "--output-format", choices=OUTPUT_FORMATS, default="mp4",
+                        help="输出格式：mp4 每个片段一个MP4文件，hls 播放列表和fMP4片段，"
+                             "hls_single 播放列表和单个分片MP4文件；默认 mp4")
+    parser.add_argument("-r", "--rendition", dest="renditions", metavar="NAME:HEIGHT:CRF[:MAXRATE]",
+                        type=rendition_arg, action="append", default=[],
+                        help="多规格输出（可以多次指定），解码一次同时编码所有规格，"
+                             "输出到 输出目录/NAME/ 下；例如 -r 720p:720:23:3M -r 480p:480:28，"
+                             "HEIGHT 为空表示原分辨率；指定后忽略 --quality")
+    parser.add_argument("--thumbnails", action="store_true",
+                        help="在同一次解码中生成每个片段的封面和雪碧图（含WebVTT/JSON索引），"
+                             "输出到 thumbnails/ 下；不支持 copy 和 smart 模式")
+    parser.add_argument("--thumbnail-interval", type=float, default=2.0,
+                        help="雪碧图中缩略图的取样间隔（秒），默认 2")
+    parser.add_argument("--thumbnail-width", type=int, default=160,
+                        help="缩略图宽度（像素），高度按16:9计算，默认 160")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="并行任务数，默认 1")
+    parser.add_argument("--buffer-mb", type=int, default=512,
+                        help="stream 模式中排队帧的内存上限（MB），默认 512")
+    parser.add_argument("--report-json", metavar="PATH",
+                        help="保存JSON报告（各阶段耗时、每个片段的耗时和大小）")
+    parser.add_argument("--report-csv", metavar="PATH", help="保存CSV报告（每个片段一行）")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="保存Prometheus文本格式的指标（node_exporter textfile collector）")
+    parser.add_argument("--no-probe-cache", dest="probe_cache", action="store_false",
+                        help="不使用探测缓存，每次都重新读取视频信息")
+    parser.add_argument("--probe-cache", dest="probe_cache_path", metavar="PATH",
+                        help="探测缓存文件（SQLite），默认在用户缓存目录中")
+    parser.add_argument("--output-cache", action="store_true",
+                        help="复用之前用相同参数生成过的片段（硬链接或复制），不再重新编码")
+    parser.add_argument("--output-cache-dir", metavar="DIR",
+                        help="输出缓存目录，默认在用户缓存目录中")
+    parser.add_argument("--output-cache-mb", type=int, default=2048,
+                        help="输出缓存的总大小上限（MB），默认 2048")
+    parser.add_argument("--watch", metavar="DIR", action="append",
+                        help="监视目录（可以多次指定），新视频写入完成后立即分割，按 Ctrl+C 停止")
+    parser.add_argument("--watch-interval", type=float, default=DEFAULT_INTERVAL,
+                        help="监视目录的检查间隔（秒），默认 1")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                        help="文件大小和修改时间保持不变多少秒后视为写入完成，默认 2")
+    parser.add_argument("--live", metavar="SOURCE",
+                        help="实时分割仍在写入的文件，或 - 表示标准输入；每个片段结束后立即输出")
+    parser.add_argument("--live-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="--live 的文件多少秒没有增长时视为录制结束，默认 10")
+    parser.add_argument("--queue", action="store_true",
+                        help="使用持久化队列：把输入视频（可以是目录）加入队列，然后按优先级和时长"
+                             "（短的先处理）处理队列，直到队列为空；可以同时用 --enqueue 加入新视频，"
+                             "按 Ctrl+C 时正在处理的视频回到队列")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="只把输入视频加入队列，不处理")
+    parser.add_argument("--priority", type=int, default=0,
+                        help="加入队列的视频的优先级，越大越先处理，默认 0")
+    parser.add_argument("--queue-file", metavar="PATH",
+                        help="队列文件（SQLite），默认在用户缓存目录中")
+    parser.add_argument("--no-resume", dest="resume", action="store_false",
+                        help="忽略输出目录中的清单，重新处理所有片段")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    return parser
+
+
+def print_status(text):
+    """在终端的同一行刷新状态（速度、剩余时间）"""
+    sys.stderr.write(f"\r{text:<60}")
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    use_queue = args.queue or args.enqueue
+    if use_queue:
+        if args.live is not None or args.watch:
+            parser.error("--queue/--enqueue 不能与 --live 或 --watch 同时使用")
+        if args.enqueue and not args.inputs:
+            parser.error("--enqueue 需要指定输入视频文件")
+        if args.inputs and not args.output_dir:
+            parser.error("加入队列的视频需要指定 --output-dir")
+    elif not args.output_dir:
+        parser.error("需要指定 --output-dir")
+    if args.live is not None:
+        if args.inputs or args.watch:
+            parser.error("--live 不能与输入视频文件或 --watch 同时使用")
+        if args.live_timeout <= 0:
+            parser.error("--live-timeout 必须大于0")
+    elif not args.inputs and not args.watch and not use_queue:
+        parser.error("需要指定输入视频文件、--watch 目录、--live 或 --queue")
+    if args.watch_interval <= 0 or args.settle < 0:
+        parser.error("--watch-interval 必须大于0，--settle 不能小于0")
+    
+    try:
+        options = SplitOptions(
+            segment_duration=args.duration,
+            boundaries=args.boundaries,
+            min_segment=args.min_segment,
+            max_segment=args.max_segment,
+            scene_threshold=args.scene_threshold,
+            silence_window=args.silence_window,
+            silence_db=args.silence_db,
+            quality=args.quality,
+            preset=args.preset,
+            target_speed=args.target_speed,
+            deadline=args.deadline,
+            recalibrate=args.recalibrate,
+            engine=args.engine,
+            mode=args.mode,
+            output_format=args.output_format,
+            renditions=args.renditions,
+            thumbnails=args.thumbnails,
+            thumbnail_interval=args.thumbnail_interval,
+            thumbnail_width=args.thumbnail_width,
+            workers=args.workers,
+            resume=args.resume,
+            buffer_mb=args.buffer_mb,
+            report_json=args.report_json,
+            report_csv=args.report_csv,
+            metrics_file=args.metrics_file,
+            probe_cache=args.probe_cache,
+            probe_cache_path=args.probe_cache_path,
+            output_cache=args.output_cache,
+            output_cache_dir=args.output_cache_dir,
+            output_cache_mb=args.output_cache_mb
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if options.engine == "ffmpeg":
+        from .ffmpeg_engine import check_ffmpeg
+        if not check_ffmpeg():
+            print("错误: 未检测到FFmpeg。请确保FFmpeg已安装并添加到系统PATH中。", file=sys.stderr)
+            return 2
+    
+    status = print_status if sys.stderr.isatty() else None
+    if use_queue:
+        return run_queue(args, options, status)
+    try:
+        if args.live is not None:
+            split_live(args.live, args.output_dir, options, status=status,
+                       idle_timeout=args.live_timeout)
+        if args.inputs:
+            split_videos(args.inputs, args.output_dir, options, status=status)
+        if args.watch:
+            watch_folders(args.watch, args.output_dir, options, status=status,
+                          interval=args.watch_interval, settle=args.settle)
+    except Exception as e:
+        print(f"错误: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def enqueue(queue, args):
+    """把输入视频（目录中的视频）加入队列，时长用于排序"""
+    importer = FileImporter(probe_cache=args.probe_cache, probe_cache_path=args.probe_cache_path)
+    importer.run(args.inputs, recursive=True)
+    found, probed, _, _ = importer.drain()
+    durations = {path: duration for path, duration, _ in probed}
+    added = queue.add(found, args.output_dir, args.priority, [durations.get(p) for p in found])
+    print(f"加入队列: {len(added)} 个视频 (优先级 {args.priority})", file=sys.stderr)
+
+
+def run_queue(args, options, status):
+    try:
+        queue = JobQueue.open(args.queue_file)
+    except Exception as e:
+        print(f"错误: 无法打开队列: {str(e)}", file=sys.stderr)
+        return 1
+    try:
+        if args.inputs:
+            enqueue(queue, args)
+        if args.queue:
+            process_queue(queue, options, status=status)
+        counts = queue.counts()
+    except Exception as e:
+        print(f"错误: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        queue.close()
+    print(f"队列: {counts.get(STATUS_QUEUED, 0)} 个排队, {counts.get(STATUS_DONE, 0)} 个完成, "
+          f"{counts.get(STATUS_FAILED, 0)} 个失败, {counts.get(STATUS_CANCELLED, 0)} 个已取消",
+          file=sys.stderr)
+    return 0
@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+"""直接解析 MP4/MOV 和 Matroska/WebM 的文件头，获取时长、流列表和关键帧时间
+
+只通过内存映射读取需要的结构（MP4 的 moov，Matroska 的 Info/Tracks/Cues），
+不读取音视频数据，也不启动子进程。不支持的格式或无法解析时返回 None，
+调用方改用FFprobe。
+"""
+import mmap
+import struct
+
+# MP4 采样描述中的编码 -> FFmpeg编码名称
+MP4_CODECS = {
+    b"avc1": "h264", b"avc3": "h264",
+    b"hvc1": "hevc", b"hev1": "hevc",
+    b"vp09": "vp9", b"av01": "av1",
+    b"mp4v": "mpeg4", b"mp4a": "aac",
+    b"Opus": "opus", b"fLaC": "flac",
+    b"ac-3": "ac3", b"ec-3": "eac3",
+}
+
+MP4_HANDLERS = {b"vide": "video", b"soun": "audio"}
+
+# Matroska CodecID -> FFmpeg编码名称
+MATROSKA_CODECS = {
+    "V_MPEG4/ISO/AVC": "h264",
+    "V_MPEGH/ISO/HEVC": "hevc",
+    "V_VP8": "vp8",
+    "V_VP9": "vp9",
+    "V_AV1": "av1",
+    "A_AAC": "aac",
+    "A_OPUS": "opus",
+    "A_VORBIS": "vorbis",
+    "A_FLAC": "flac",
+    "A_AC3": "ac3",
+}
+
+MATROSKA_TRACK_TYPES = {1: "video", 2: "audio", 17: "subtitle"}
+
+# Matroska 元素ID
+EBML_HEADER = 0x1A45DFA3
+DOC_TYPE = 0x4282
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+CUES = 0x1C53BB6B
+CUE_POINT = 0xBB
+CUE_TIME = 0xB3
+CUE_TRACK_POSITIONS = 0xB7
+CUE_TRACK = 0xF7
+CLUSTER = 0x1F43B675
+
+
+class ContainerError(Exception):
+    """文件结构不完整或无法识别"""
+
+
+def parse_container(path):
+    """返回 {"format", "duration", "streams", "keyframes"}，不支持或无法解析时返回 None
+    
+    streams 是 [{"type": "video"/"audio"/..., "codec": 名称}]；
+    keyframes 是第一个视频流的关键帧时间（秒，已排序），文件中没有索引时为 None
+    """
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                if buf[:4] == struct.pack(">I", EBML_HEADER):
+                    return parse_matroska(buf)
+                if buf[4:8] in (b"ftyp", b"moov", b"free", b"skip", b"wide", b"mdat"):
+                    return parse_mp4(buf)
+    except (OSError, ValueError, ContainerError, struct.error):
+        # 空文件无法映射（ValueError），结构损坏或被截断
+        pass
+    return None
+
+
+# ---------------------------------------------------------------- MP4 / MOV
+
+def iter_boxes(buf, start, end):
+    """依次返回 [start, end) 中的 (类型, 内容开始, 结束)"""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise ContainerError(f"box {kind!r} 被截断")
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def find_box(buf, start, end, *path):
+    """按路径查找子box，返回 (内容开始, 结束)，找不到时返回 None"""
+    for name in path:
+        for kind, child_start, child_end in iter_boxes(buf, start, end):
+            if kind == name:
+                start, end = child_start, child_end
+                break
+        else:
+            return None
+    return start, end
+
+
+def full_box_entries(buf, box, fmt):
+    """读取 stts/stss/ctts 这类“版本+标志+数量+表项”的box"""
+    start, end = box
+    count = struct.unpack_from(">I", buf, start + 4)[0]
+    size = struct.calcsize(fmt)
+    data_start = start + 8
+    if data_start + count * size > end:
+        raise ContainerError("表项数量超出box范围")
+    return struct.iter_unpack(fmt, buf[data_start:data_start + count * size])
+
+
+def parse_mp4(buf):
+    moov = None
+    for kind, start, end in iter_boxes(buf, 0, len(buf)):
+        if kind == b"moov":
+            moov = (start, end)
+    if moov is None:
+        return None
+    
+    mvhd = find_box(buf, *moov, b"mvhd")
+    if mvhd is None:
+        return None
+    movie_timescale, movie_duration = read_time_header(buf, mvhd[0])
+    
+    streams = []
+    keyframes = None
+    for kind, start, end in iter_boxes(buf, *moov):
+        if kind != b"trak":
+            continue
+        track = parse_mp4_track(buf, start, end, movie_timescale)
+        if track is None:
+            continue
+        streams.append({"type": track["type"], "codec": track["codec"]})
+        if track["type"] == "video" and keyframes is None:
+            keyframes = track["keyframes"]
+    
+    if movie_timescale == 0 or movie_duration == 0:
+        # 分片MP4 (fMP4) 的 moov 中没有时长和采样表
+        return None
+    return {
+        "format": "mp4",
+        "duration": movie_duration / movie_timescale,
+        "streams": streams,
+        "keyframes": keyframes,
+    }
+
+
+def read_time_header(buf, start):
+    """读取 mvhd/mdhd 中的 (timescale, duration)"""
+    version = buf[start]
+    if version == 1:
+        return struct.unpack_from(">IQ", buf, start + 20)
+    return struct.unpack_from(">II", buf, start + 12)
+
+
+def parse_mp4_track(buf, start, end, movie_timescale):
+    mdia = find_box(buf, start, end, b"mdia")
+    if mdia is None:
+        return None
+    hdlr = find_box(buf, *mdia, b"hdlr")
+    mdhd = find_box(buf, *mdia, b"mdhd")
+    stbl = find_box(buf, *mdia, b"minf", b"stbl")
+    if hdlr is None or mdhd is None or stbl is None:
+        return None
+    
+    handler = bytes(buf[hdlr[0] + 8:hdlr[0] + 12])
+    track_type = MP4_HANDLERS.get(handler, handler.decode("latin-1"))
+    timescale, _ = read_time_header(buf, mdhd[0])
+    
+    codec = None
+    stsd = find_box(buf, *stbl, b"stsd")
+    if stsd is not None and stsd[0] + 16 <= stsd[1]:
+        fourcc = bytes(buf[stsd[0] + 12:stsd[0] + 16])
+        codec = MP4_CODECS.get(fourcc, fourcc.decode("latin-1").strip())
+    
+    keyframes = None
+    if track_type == "video" and timescale:
+        keyframes = mp4_keyframes(buf, start, end, stbl, timescale, movie_timescale)
+    return {"type": track_type, "codec": codec, "keyframes": keyframes}
+
+
+def mp4_keyframes(buf, trak_start, trak_end, stbl, timescale, movie_timescale):
+    """由 stss（关键帧编号）、stts（解码时间）、ctts（显示时间偏移）和 elst（编辑列表）计算关键帧的显示时间"""
+    stts = find_box(buf, *stbl, b"stts")
+    if stts is None:
+        return None
+    runs = list(full_box_entries(buf, stts, ">II"))
+    total_samples = sum(count for count, _ in runs)
+    if total_samples == 0:
+        return None
+    
+    stss = find_box(buf, *stbl, b"stss")
+    if stss is None:
+        # 没有 stss 表示每一帧都是关键帧
+        sync = range(1, total_samples + 1)
+    else:
+        sync = sorted(number for number, in full_box_entries(buf, stss, ">I"))
+    
+    ctts = find_box(buf, *stbl, b"ctts")
+    offsets = None
+    if ctts is not None:
+        # 版本0的偏移是无符号数，版本1是有符号数
+        fmt = ">Ii" if buf[ctts[0]] == 1 else ">II"
+        offsets = list(full_box_entries(buf, ctts, fmt))
+    
+    media_time, delay = mp4_edit_shift(buf, trak_start, trak_end, movie_timescale)
+    
+    keyframes = []
+    run_index = 0
+    run_first = 1          # 当前 stts 段第一个采样的编号
+    run_dts = 0            # 当前 stts 段第一个采样的解码时间
+    offset_index = 0
+    offset_first = 1
+    for number in sync:
+        while run_index < len(runs) and number >= run_first + runs[run_index][0]:
+            count, delta = runs[run_index]
+            run_first += count
+            run_dts += count * delta
+            run_index += 1
+        if run_index >= len(runs):
+            break
+        dts = run_dts + (number - run_first) * runs[run_index][1]
+        
+        composition = 0
+        if offsets:
+            while (offset_index < len(offsets)
+                   and number >= offset_first + offsets[offset_index][0]):
+                offset_first += offsets[offset_index][0]
+                offset_index += 1
+            if offset_index < len(offsets):
+                composition = offsets[offset_index][1]
+        
+        time = (dts + composition - media_time) / timescale + delay
+        keyframes.append(round(time, 6))
+    
+    keyframes.sort()
+    return keyframes
+
+
+def mp4_edit_shift(buf, trak_start, trak_end, movie_timescale):
+    """编辑列表: 返回 (媒体时间起点, 开头空白编辑的时长（秒）)"""
+    elst = find_box(buf, trak_start, trak_end, b"edts", b"elst")
+    if elst is None:
+        return 0, 0.0
+    start, end = elst
+    version = buf[start]
+    fmt = ">Qqi" if version == 1 else ">Iii"
+    delay = 0.0
+    for segment_duration, media_time, _ in full_box_entries(buf, elst, fmt):
+        if media_time == -1:
+            if movie_timescale:
+                delay += segment_duration / movie_timescale
+            continue
+        return media_time, delay
+    return 0, delay
+
+
+# ---------------------------------------------------------------- Matroska / WebM
+
+def read_vint(buf, pos, keep_marker=False):
+    """读取EBML变长整数，返回 (值, 长度)；大小字段全为1时表示未知大小，返回值 None"""
+    first = buf[pos]
+    if first == 0:
+        raise ContainerError("无效的EBML变长整数")
+    length = 1
+    mask = 0x80
+    while not first & mask:
+        mask >>= 1
+        length += 1
+    value = first if keep_marker else first & (mask - 1)
+    for byte in buf[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    if len(buf[pos:pos + length]) < length:
+        raise ContainerError("EBML变长整数被截断")
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return None, length
+    return value, length
+
+
+def iter_elements(buf, start, end):
+    """依次返回 [start, end) 中的 (元素ID, 内容开始, 内容结束)；未知大小的元素结束位置为 None"""
+    pos = start
+    while pos < end:
+        element_id, id_length = read_vint(buf, pos, keep_marker=True)
+        size, size_length = read_vint(buf, pos + id_length)
+        data_start = pos + id_length + size_length
+        if size is None:
+            yield element_id, data_start, None
+            return
+        data_end = data_start + size
+        if data_end > len(buf):
+            raise ContainerError(f"元素 {element_id:#x} 被截断")
+        yield element_id, data_start, data_end
+        pos = data_end
+
+
+def read_uint(buf, start, end):
+    return int.from_bytes(buf[start:end], "big")
+
+
+def read_float(buf, start, end):
+    if end - start == 4:
+        return struct.unpack_from(">f", buf, start)[0]
+    if end - start == 8:
+        return struct.unpack_from(">d", buf, start)[0]
+    return 0.0
+
+
+def parse_matroska(buf):
+    header = next(iter_elements(buf, 0, len(buf)))
+    doc_type = None
+    for element_id, start, end in iter_elements(buf, header[1], header[2]):
+        if element_id == DOC_TYPE:
+            doc_type = bytes(buf[start:end]).rstrip(b"\0").decode("ascii", "replace")
+    if doc_type not in ("matroska", "webm"):
+        return None
+    
+    segment = None
+    for element_id, start, end in iter_elements(buf, header[2], len(buf)):
+        if element_id == SEGMENT:
+            segment = (start, end if end is not None else len(buf))
+            break
+    if segment is None:
+        return None
+    
+    # 顶层元素在文件中的位置：先按顺序读取，遇到Cluster后按SeekHead跳转
+    positions = {}
+    found = {}
+    for element_id, start, end in iter_elements(buf, *segment):
+        if element_id == SEEK_HEAD:
+            positions.update(read_seek_head(buf, start, end, segment[0]))
+        elif element_id in (INFO, TRACKS, CUES):
+            found[element_id] = (start, end)
+        elif element_id == CLUSTER:
+            break
+    for element_id in (INFO, TRACKS, CUES):
+        if element_id not in found and element_id in positions:
+            pos = positions[element_id]
+            found_id, start, end = next(iter_elements(buf, pos, len(buf)))
+            if found_id == element_id and end is not None:
+                found[element_id] = (start, end)
+    
+    if INFO not in found:
+        return None
+    timecode_scale = 1000000
+    duration = None
+    for element_id, start, end in iter_elements(buf, *found[INFO]):
+        if element_id == TIMECODE_SCALE:
+            timecode_scale = read_uint(buf, start, end)
+        elif element_id == DURATION:
+            duration = read_float(buf, start, end)
+    if not duration:
+        # 直播录制等没有写入时长的文件
+        return None
+    
+    streams = []
+    video_track = None
+    if TRACKS in found:
+        for element_id, start, end in iter_elements(buf, *found[TRACKS]):
+            if element_id != TRACK_ENTRY:
+                continue
+            track = {}
+            for child_id, child_start, child_end in iter_elements(buf, start, end):
+                if child_id == TRACK_NUMBER:
+                    track["number"] = read_uint(buf, child_start, child_end)
+                elif child_id == TRACK_TYPE:
+                    track["type"] = read_uint(buf, child_start, child_end)
+                elif child_id == CODEC_ID:
+                    track["codec"] = bytes(buf[child_start:child_end]).rstrip(b"\0").decode(
+                        "ascii", "replace"
+                    )
+            track_type = MATROSKA_TRACK_TYPES.get(track.get("type"), "unknown")
+            codec_id = track.get("codec")
+            streams.append({"type": track_type, "codec": MATROSKA_CODECS.get(codec_id, codec_id)})
+            if track_type == "video" and video_track is None:
+                video_track = track.get("number")
+    
+    keyframes = None
+    if CUES in found and video_track is not None:
+        keyframes = matroska_keyframes(buf, found[CUES], video_track, timecode_scale)
+    
+    return {
+        "format": doc_type,
+        "duration": duration * timecode_scale / 1e9,
+        "streams": streams,
+        "keyframes": keyframes,
+    }
+
+
+def read_seek_head(buf, start, end, segment_start):
+    """SeekHead: 元素ID -> 文件中的位置"""
+    positions = {}
+    for element_id, seek_start, seek_end in iter_elements(buf, start, end):
+        if element_id != SEEK:
+            continue
+        target = position = None
+        for child_id, child_start, child_end in iter_elements(buf, seek_start, seek_end):
+            if child_id == SEEK_ID:
+                target = read_uint(buf, child_start, child_end)
+            elif child_id == SEEK_POSITION:
+                position = read_uint(buf, child_start, child_end)
+        if target is not None and position is not None:
+            positions[target] = segment_start + position
+    return positions
+
+
+def matroska_keyframes(buf, cues, video_track, timecode_scale):
+    """Cues 中视频轨道的索引点（Matroska只对关键帧建立索引）"""
+    times = set()
+    for element_id, start, end in iter_elements(buf, *cues):
+        if element_id != CUE_POINT:
+            continue
+        cue_time = None
+        tracks = []
+        for child_id, child_start, child_end in iter_elements(buf, start, end):
+            if child_id == CUE_TIME:
+                cue_time = read_uint(buf, child_start, child_end)
+            elif child_id == CUE_TRACK_POSITIONS:
+                for grand_id, grand_start, grand_end in iter_elements(buf, child_start, child_end):
+                    if grand_id == CUE_TRACK:
+                        tracks.append(read_uint(buf, grand_start, grand_end))
+        if cue_time is not None and video_track in tracks:
+            times.add(round(cue_time * timecode_scale / 1e9, 6))
+    return sorted(times) or None
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""工作线程 -> 界面线程的事件队列
+
+分割引擎在工作线程中调用 log/progress/status，这里只把事件放入队列；
+界面线程用 after() 定时调用 drain()，一次取出所有积压的事件并合并：
+进度和状态只保留最新值，日志行数超过屏幕上保留的行数时只取最后的部分。
+完整日志可以同时写入文件。
+"""
+import threading
+from collections import deque
+
+# 界面刷新间隔（毫秒）
+UI_INTERVAL_MS = 100
+
+# 日志区最多保留的行数，更早的行从屏幕上移除
+LOG_LINES = 2000
+
+
+class EventSink:
+    def __init__(self, max_lines=LOG_LINES):
+        self.lock = threading.Lock()
+        self.lines = deque(maxlen=max_lines)
+        self.dropped = 0
+        self.progress_value = None
+        self.status_text = None
+        self.calls = []
+        self.log_file = None
+    
+    def open_log_file(self, path):
+        """之后的每一行日志都追加写入 path，直到 close_log_file()"""
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.close()
+            self.log_file = open(path, "a", encoding="utf-8")
+    
+    def close_log_file(self):
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
+    
+    def log(self, line):
+        """添加一行已格式化（带换行）的日志，可以从任何线程调用"""
+        with self.lock:
+            if len(self.lines) == self.lines.maxlen:
+                self.dropped += 1
+            self.lines.append(line)
+            if self.log_file is not None:
+                self.log_file.write(line)
+    
+    def progress(self, value):
+        with self.lock:
+            self.progress_value = value
+    
+    def status(self, text):
+        with self.lock:
+            self.status_text = text
+    
+    def call(self, func):
+        """在下一次 drain() 时由界面线程调用 func（例如处理完成后恢复按钮、弹出对话框）"""
+        with self.lock:
+            self.calls.append(func)
+    
+    def drain(self):
+        """取出积压的事件: (日志行, 未显示而丢弃的行数, 最新进度, 最新状态, 待调用的函数)
+        
+        进度和状态没有更新时为 None
+        """
+        with self.lock:
+            lines = list(self.lines)
+            self.lines.clear()
+            dropped, self.dropped = self.dropped, 0
+            progress, self.progress_value = self.progress_value, None
+            status, self.status_text = self.status_text, None
+            calls, self.calls = self.calls, []
+            if self.log_file is not None:
+                self.log_file.flush()
+        return lines, dropped, progress, status, calls
@@ -0,0 +1,1021 @@
+# -*- coding: utf-8 -*-
+"""FFmpeg分割引擎"""
+import bisect
+import csv
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from functools import partial
+
+from .base import BaseSplitter, segment_filename, segment_pattern, unlink_shared_outputs
+from .calibrate import (CalibrationCache, calibration_key, choose_preset, measure_preset,
+                        sample_windows)
+from .ffmpeg_progress import run_ffmpeg
+from .hls import (hls_segment_pattern, init_filename, parse_playlist, playlist_filename,
+                  single_filename)
+from .live import DEFAULT_IDLE_TIMEOUT, STDIN_SOURCE, source_feed, source_name
+from .manifest import SegmentManifest
+from .options import rate_bits
+from .probe import probe_duration, probe_keyframes, probe_resolution, probe_video_stream
+
+# 实时分割时segment复用器写入的片段列表
+LIVE_LIST_NAME = ".segments.csv"
+
+# 智能剪切时与源视频编码格式对应的编码器
+SMART_CUT_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+}
+
+# 判断时间点是否重合的误差（秒），小于一帧
+TIME_EPSILON = 0.001
+
+
+def check_ffmpeg():
+    """检查FFmpeg是否可用"""
+    try:
+        subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
+        return True
+    except (subprocess.SubprocessError, FileNotFoundError):
+        return False
+
+
+def snap_boundaries(keyframes, duration, targets):
+    """将名义分割点 targets 对齐到最近的关键帧，返回 [(开始, 结束), ...]"""
+    cuts = []
+    for target in targets:
+        k = bisect.bisect_left(keyframes, target)
+        candidates = keyframes[max(k - 1, 0):k + 1]
+        if not candidates:
+            break
+        cut = min(candidates, key=lambda t: abs(t - target))
+        
+        # 多个分割点对齐到同一关键帧时合并
+        if cut <= (cuts[-1] if cuts else 0.0) or cut >= duration:
+            continue
+        cuts.append(cut)
+    
+    bounds = [0.0] + cuts + [duration]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def plan_smart_cut(keyframes, start_time, end_time):
+    """规划一个片段的智能剪切，返回可直接复制的关键帧区间 (开始, 结束)
+    
+    开始之前和结束之后不完整的GOP需要重新编码；
+    片段内少于两个关键帧时没有可复制的区间，返回None
+    """
+    first = bisect.bisect_left(keyframes, start_time - TIME_EPSILON)
+    last = bisect.bisect_right(keyframes, end_time + TIME_EPSILON) - 1
+    if first >= len(keyframes) or last < 0 or keyframes[first] >= keyframes[last]:
+        return None
+    return keyframes[first], keyframes[last]
+
+
+class FFmpegSplitter(BaseSplitter):
+    def track_progress(self, duration, start=0.0, span=1.0):
+        """返回FFmpeg进度回调：把输出时间换算为当前任务中 [start, start + span] 范围内的进度"""
+        def on_progress(info):
+            if info["out_time"] is not None and duration > 0:
+                fraction = min(max(info["out_time"] / duration, 0.0), 1.0)
+                self.runner.set_progress(start + span * fraction)
+            self.runner.set_speed(info["speed"], info["fps"])
+        return on_progress
+    
+    def output_params(self, rendition=None):
+        mode = self.options.mode
+        if mode == "copy":
+            return {"engine": "ffmpeg", "mode": mode, "codec": "copy"}
+        if rendition is not None:
+            return {"engine": "ffmpeg", "mode": mode, "codec": "libx264/aac",
+                    "crf": rendition.crf, "preset": self.options.preset,
+                    "height": rendition.height, "maxrate": rendition.maxrate}
+        # 智能剪切重新编码部分的编码器由源视频决定，输入内容已经是缓存键的一部分
+        return {"engine": "ffmpeg", "mode": mode, "codec": "libx264/aac",
+                "crf": self.options.crf, "preset": self.options.preset}
+    
+    def restores_prefix_only(self):
+        return self.options.mode in ("single_pass", "copy")
+    
+    def prepare_batch(self, video_files):
+        """按目标速度或完成时限选择编码预设，没有保存的测量结果时先从本批视频中取样试编码"""
+        options = self.options
+        if not options.auto_tune:
+            return
+        files = []
+        for video_file in video_files:
+            try:
+                files.append((video_file, self.probe(video_file, "duration", self.read_duration)))
+            except Exception as e:
+                self.log(f"警告: 无法获取时长，校准时跳过 {os.path.basename(video_file)}: {str(e)}")
+        windows = sample_windows(files)
+        if not windows:
+            self.log(f"警告: 没有可以试编码的视频，使用预设 {options.preset}")
+            return
+        
+        # 同时编码的进程平分合计速度；任务数少于并行任务数时同时编码的进程也更少
+        total = sum(duration for _, duration in files)
+        targets = []
+        if options.target_speed is not None:
+            targets.append(options.target_speed)
+        if options.deadline is not None:
+            targets.append(total / options.deadline)
+        parallel = self.parallel_encodes(files)
+        required = max(targets) / parallel
+        
+        # 混合分辨率时按取样窗口中最大的分辨率
+        resolutions = []
+        for video_file, _, _ in windows:
+            try:
+                resolutions.append(self.probe(video_file, "resolution", probe_resolution))
+            except (OSError, subprocess.SubprocessError, ValueError):
+                continue
+        resolution = max(resolutions, key=lambda r: r[0] * r[1], default=[0, 0])
+        key = calibration_key(options.crf, options.threads, resolution)
+        cache = CalibrationCache()
+        measured = {} if options.recalibrate else cache.load(key)
+        
+        self.log(f"自动选择预设: 每个任务需要 {required:.2f}x 实时 "
+                 f"(共 {len(files)} 个视频, {total:.0f}秒, 同时编码 {parallel} 个)")
+        measure = partial(measure_preset, windows, crf=options.crf, threads=options.threads)
+        with self.metrics.stage("calibrate"):
+            preset, new = choose_preset(measure, required, measured, self.log)
+        if new:
+            try:
+                cache.store(key, new, replace=options.recalibrate)
+            except OSError as e:
+                self.log(f"警告: 无法保存校准结果: {str(e)}")
+        elif preset is not None:
+            self.log("使用保存的校准结果")
+        if preset is None:
+            self.log(f"警告: 所有预设都无法试编码，使用预设 {options.preset}")
+            return
+        result = dict(measured, **new)[preset]
+        options.preset = preset
+        
+        if result["speed"] < required:
+            self.log(f"警告: 最快的预设也只有 {result['speed']:.2f}x 实时，可能无法达到目标")
+        estimate = total / (result["speed"] * parallel)
+        self.log(f"选择预设 {preset}: {result['speed']:.2f}x 实时, "
+                 f"{result['bitrate'] / 1000:.0f} kb/s, 预计编码用时 {estimate:.0f}秒")
+    
+    def parallel_encodes(self, files):
+        """同时编码的进程数：并行任务数，但不超过任务数（与 create_jobs 的划分一致）
+        
+        files 是 [(视频文件, 时长)]；逐段编码时按固定间隔估计片段数
+        """
+        if self.options.mode == "per_segment" and self.options.output_format == "mp4":
+            jobs = sum(max(1, int(math.ceil(duration / self.segment_duration)))
+                       for _, duration in files)
+        else:
+            jobs = len(files)
+        return max(1, min(self.options.workers, jobs))
+    
+    def create_jobs(self, video_file, file_index, total_files, output_directory):
+        mode = self.options.mode
+        if mode != "per_segment" or self.options.output_format != "mp4":
+            # 单次编码、无损复制、智能剪切、HLS输出：每个视频是一个任务
+            return [partial(
+                self.process_video, video_file, file_index, total_files, output_directory
+            )]
+        
+        if self.options.renditions:
+            # 多规格逐段编码：每个片段是一个任务，解码一次输出所有规格
+            base_name, _, segments, outputs = self.prepare_renditions(
+                video_file, file_index, total_files, output_directory
+            )
+            pending = sorted({index for _, _, manifest in outputs
+                              for index in manifest.pending(len(segments))})
+            # 所有规格的画面相同，缩略图保存在第一种规格的输出目录中
+            thumbnails = self.open_thumbnails(outputs[0][1], base_name, segments,
+                                              max(len(pending), 1))
+            jobs = [
+                partial(self.encode_renditions, video_file, base_name, segments, index - 1,
+                        outputs, thumbnails)
+                for index in pending
+            ]
+            return self.thumbnail_jobs(thumbnails, video_file, jobs)
+        
+        # 逐段编码：每个片段都是一个独立任务
+        video_output_dir, base_name, duration = self.prepare_video(
+            video_file, file_index, total_files, output_directory
+        )
+        segments = self.segment_ranges(video_file, duration)
+        self.log(f"将分割为 {len(segments)} 个片段")
+        manifest = self.open_manifest(video_file, video_output_dir, segments)
+        pending = manifest.pending(len(segments))
+        thumbnails = self.open_thumbnails(video_output_dir, base_name, segments,
+                                          max(len(pending), 1))
+        jobs = [
+            partial(self.encode_segment, video_file, video_output_dir, base_name,
+                    segments, index - 1, manifest, thumbnails=thumbnails)
+            for index in pending
+        ]
+        return self.thumbnail_jobs(thumbnails, video_file, jobs)
+    
+    def thumbnail_jobs(self, thumbnails, video_file, jobs):
+        """最后结束的任务拼接雪碧图；没有需要处理的片段时直接用之前保存的帧拼接"""
+        if thumbnails is None:
+            return jobs
+        if not jobs:
+            self.finish_thumbnails(thumbnails, video_file)
+            return jobs
+        return [partial(self.run_with_thumbnails, thumbnails, video_file, job) for job in jobs]
+    
+    def capture_thumbnails(self, thumbnails, raw_path, first_time, indices, video_file):
+        """读取FFmpeg同时输出的取样帧，保存到各片段"""
+        try:
+            with self.metrics.stage("thumbnail", video_file):
+                thumbnails.add_raw(raw_path, first_time, indices)
+        except (OSError, ValueError) as e:
+            self.log(f"警告: 无法保存缩略图: {str(e)}")
+    
+    def prepare_video(self, video_file, file_index, total_files, output_directory):
+        """创建输出子目录并获取视频时长，返回 (输出目录, 文件名主干, 时长)"""
+        filename = os.path.basename(video_file)
+        self.log(f"处理 ({file_index}/{total_files}): {filename}")
+        
+        video_output_dir, base_name = self.prepare_output(video_file, output_directory)
+        duration = self.probe_video(video_file)
+        return video_output_dir, base_name, duration
+    
+    def probe_video(self, video_file):
+        """获取视频时长"""
+        self.log(f"分析视频: {os.path.basename(video_file)}")
+        with self.metrics.stage("probe", video_file):
+            duration = self.probe(video_file, "duration", self.read_duration)
+        self.log(f"视频时长: {duration:.2f}秒")
+        self.metrics.add_file(video_file, duration)
+        return duration
+    
+    def prepare_renditions(self, video_file, file_index, total_files, output_directory):
+        """多规格输出：获取时长，为每种规格创建输出目录（输出目录/规格名称/文件名主干）并打开清单
+        
+        返回 (文件名主干, 时长, 各片段的 (开始, 结束), [(规格, 输出目录, 清单)])
+        """
+        self.log(f"处理 ({file_index}/{total_files}): {os.path.basename(video_file)}")
+        duration = self.probe_video(video_file)
+        segments = self.segment_ranges(video_file, duration)
+        renditions = self.options.renditions
+        self.log(f"将分割为 {len(segments)} 个片段，输出 {len(renditions)} 种规格: "
+                 f"{', '.join(rendition.name for rendition in renditions)}")
+        outputs = []
+        for rendition in renditions:
+            video_output_dir, base_name = self.prepare_output(
+                video_file, os.path.join(output_directory, rendition.name)
+            )
+            manifest = self.open_manifest(video_file, video_output_dir, segments, rendition)
+            outputs.append((rendition, video_output_dir, manifest))
+        return base_name, duration, segments, outputs
+    
+    def rendition_args(self, renditions):
+        """解码后的视频用split滤镜分成多路并各自缩放，返回 (滤镜图参数, 每种规格的映射和编码参数)"""
+        count = len(renditions)
+        # 所有编码器在同一个进程中，分配给当前任务的线程由它们平分
+        threads = str(max(1, self.options.threads // count))
+        graph = [f"[0:v]split={count}" + "".join(f"[s{k}]" for k in range(count))]
+        output_args = []
+        for k, rendition in enumerate(renditions):
+            if rendition.height is None:
+                graph.append(f"[s{k}]null[v{k}]")
+            else:
+                # 只缩小不放大，宽度按比例取偶数
+                graph.append(f"[s{k}]scale=-2:'min({rendition.height},ih)'[v{k}]")
+            args = [
+                "-map", f"[v{k}]", "-map", "0:a:0?",
+                "-c:v", "libx264", "-crf", rendition.crf, "-preset", self.options.preset,
+                "-threads", threads,
+            ]
+            if rendition.maxrate is not None:
+                args += ["-maxrate", rendition.maxrate,
+                         "-bufsize", str(2 * rate_bits(rendition.maxrate))]
+            args += ["-c:a", "aac", "-b:a", "128k"]
+            output_args.append(args)
+        return ["-filter_complex", ";".join(graph)], output_args
+    
+    def read_duration(self, video_file):
+        try:
+            return probe_duration(video_file)
+        except Exception:
+            # 如果FFprobe失败，则尝试使用moviepy
+            self.log("使用备用方法获取视频时长...")
+            from moviepy.editor import VideoFileClip
+            video = VideoFileClip(video_file)
+            duration = video.duration
+            video.close()
+            return duration
+    
+    def process_video(self, video_file, file_index, total_files, output_directory):
+        """按整个视频为单位处理（单次编码、无损复制、智能剪切、HLS输出）"""
+        if self.options.renditions:
+            self.split_renditions_single_pass(video_file, file_index, total_files,
+                                              output_directory)
+            self.log(f"完成处理: {os.path.basename(video_file)}")
+            return
+        
+        video_output_dir, base_name, duration = self.prepare_video(
+            video_file, file_index, total_files, output_directory
+        )
+        
+        # 分割视频
+        mode = self.options.mode
+        if self.options.output_format != "mp4":
+            self.split_hls(video_file, video_output_dir, base_name, duration)
+        elif mode == "single_pass":
+            self.split_single_pass(video_file, video_output_dir, base_name, duration)
+        elif mode == "copy":
+            self.split_stream_copy(video_file, video_output_dir, base_name, duration)
+        elif mode == "smart":
+            self.split_smart_cut(video_file, video_output_dir, base_name, duration)
+        else:
+            self.split_per_segment(video_file, video_output_dir, base_name, duration)
+        
+        self.log(f"完成处理: {os.path.basename(video_file)}")
+    
+    def split_per_segment(self, video_file, video_output_dir, base_name, duration):
+        """逐段分割：每个片段单独运行一次FFmpeg"""
+        segments = self.segment_ranges(video_file, duration)
+        self.log(f"将分割为 {len(segments)} 个片段")
+        manifest = self.open_manifest(video_file, video_output_dir, segments)
+        thumbnails = self.open_thumbnails(video_output_dir, base_name, segments)
+        
+        pending = manifest.pending(len(segments))
+        try:
+            for n, index in enumerate(pending):
+                self.encode_segment(
+                    video_file, video_output_dir, base_name, segments, index - 1, manifest,
+                    progress_start=n / len(pending), progress_span=1 / len(pending),
+                    thumbnails=thumbnails
+                )
+        finally:
+            self.finish_thumbnails(thumbnails, video_file)
+    
+    def encode_segment(self, video_file, video_output_dir, base_name, segments, j, manifest,
+                       progress_start=0.0, progress_span=1.0, thumbnails=None):
+        """运行一次FFmpeg，编码第 j 个片段；thumbnails 不为None时同时输出取样帧"""
+        start_time, end_time = segments[j]
+        num_segments = len(segments)
+        segment_duration = end_time - start_time
+        
+        # 输出文件名
+        output_filename = segment_filename(base_name, j + 1)
+        output_path = os.path.join(video_output_dir, output_filename)
+        
+        # 构建FFmpeg命令
+        cmd = [
+            "ffmpeg", "-y", "-ss", str(start_time), "-i", video_file,
+            "-t", str(segment_duration), "-c:v", "libx264", "-crf", self.options.crf,
+            "-preset", self.options.preset, "-threads", str(self.options.threads),
+            "-c:a", "aac", "-b:a", "128k",
+            "-movflags", "+faststart", output_path
+        ]
+        if thumbnails is not None:
+            raw_path = thumbnails.raw_path(j + 1)
+            cmd += thumbnails.ffmpeg_args(raw_path, segment_duration)
+        
+        # 执行FFmpeg命令，边运行边读取进度
+        # 定位、解码、编码和封装都在同一个FFmpeg进程中，整体记为编码时间
+        self.log(f"处理片段 {j+1}/{num_segments} (时间: {start_time:.2f}s - {end_time:.2f}s)")
+        started = time.perf_counter()
+        with self.metrics.stage("encode", video_file):
+            result = run_ffmpeg(
+                cmd, self.track_progress(segment_duration, progress_start, progress_span)
+            )
+        seconds = time.perf_counter() - started
+        if thumbnails is not None:
+            self.capture_thumbnails(thumbnails, raw_path, start_time, [j + 1], video_file)
+        
+        # 检查结果并记录到清单
+        if result.returncode != 0:
+            manifest.mark_failed(j + 1, start_time, end_time, seconds)
+            self.log(f"警告: 处理片段 {j+1} 时出错: {result.stderr[-300:]}")
+        elif not manifest.mark_done(j + 1, output_path, start_time, end_time, seconds):
+            self.log(f"警告: 片段 {j+1} 不完整: {output_filename}")
+        else:
+            self.log(f"完成片段 {j+1}/{num_segments}: {output_filename}")
+    
+    def encode_renditions(self, video_file, base_name, segments, j, outputs, thumbnails=None):
+        """运行一次FFmpeg：第 j 个片段只解码一次，编码为所有尚未完成该片段的规格"""
+        start_time, end_time = segments[j]
+        num_segments = len(segments)
+        segment_duration = end_time - start_time
+        output_filename = segment_filename(base_name, j + 1)
+        outputs = [output for output in outputs if not output[2].is_done(j + 1)]
+        
+        filter_args, output_args = self.rendition_args([rendition for rendition, _, _ in outputs])
+        cmd = [
+            "ffmpeg", "-y", "-ss", str(start_time), "-t", str(segment_duration),
+            "-i", video_file, *filter_args
+        ]
+        for (_, video_output_dir, _), args in zip(outputs, output_args):
+            cmd += [*args, "-movflags", "+faststart",
+                    os.path.join(video_output_dir, output_filename)]
+        if thumbnails is not None:
+            raw_path = thumbnails.raw_path(j + 1)
+            cmd += thumbnails.ffmpeg_args(raw_path)
+        
+        names = ", ".join(rendition.name for rendition, _, _ in outputs)
+        self.log(f"处理片段 {j+1}/{num_segments} (时间: {start_time:.2f}s - {end_time:.2f}s, "
+                 f"规格: {names})")
+        started = time.perf_counter()
+        with self.metrics.stage("encode", video_file):
+            result = run_ffmpeg(cmd, self.track_progress(segment_duration))
+        seconds = time.perf_counter() - started
+        if thumbnails is not None:
+            self.capture_thumbnails(thumbnails, raw_path, start_time, [j + 1], video_file)
+        
+        if result.returncode != 0:
+            self.log(f"警告: 处理片段 {j+1} 时出错: {result.stderr[-300:]}")
+        complete = result.returncode == 0
+        for rendition, video_output_dir, manifest in outputs:
+            output_path = os.path.join(video_output_dir, output_filename)
+            if result.returncode != 0:
+                manifest.mark_failed(j + 1, start_time, end_time, seconds)
+            elif not manifest.mark_done(j + 1, output_path, start_time, end_time, seconds):
+                self.log(f"警告: 片段 {j+1} 不完整: {rendition.name}/{output_filename}")
+                complete = False
+        if complete:
+            self.log(f"完成片段 {j+1}/{num_segments}: {output_filename}")
+    
+    def split_renditions_single_pass(self, video_file, file_index, total_files, output_directory):
+        """多规格单次编码：输入只解码一次，每种规格由各自的segment复用器输出所有片段"""
+        base_name, duration, segments, outputs = self.prepare_renditions(
+            video_file, file_index, total_files, output_directory
+        )
+        num_segments = len(segments)
+        thumbnails = self.open_thumbnails(outputs[0][1], base_name, segments)
+        
+        # 续传时只编码还有未完成片段的规格，从其中最早的未完成片段开始
+        outputs = [output for output in outputs if output[2].pending(num_segments)]
+        if not outputs:
+            self.finish_thumbnails(thumbnails, video_file)
+            return
+        first_index = min(manifest.pending(num_segments)[0] for _, _, manifest in outputs)
+        offset = segments[first_index - 1][0]
+        seek_args = ["-ss", str(offset)] if offset > 0 else []
+        
+        key_args, split_args = self.single_pass_args(segments, first_index, duration)
+        filter_args, output_args = self.rendition_args([rendition for rendition, _, _ in outputs])
+        cmd = ["ffmpeg", "-y", *seek_args, "-i", video_file, *filter_args]
+        for (_, video_output_dir, _), args in zip(outputs, output_args):
+            # 之后的片段（包括已完成的）都会被重新写入
+            unlink_shared_outputs(video_output_dir, base_name, range(first_index, num_segments + 1))
+            cmd += [
+                *args, *key_args,
+                "-f", "segment", *split_args,
+                "-segment_start_number", str(first_index), "-reset_timestamps", "1",
+                "-segment_format", "mp4",
+                "-segment_format_options", "movflags=+faststart",
+                os.path.join(video_output_dir, segment_pattern(base_name))
+            ]
+        if thumbnails is not None:
+            raw_path = thumbnails.raw_path(first_index)
+            cmd += thumbnails.ffmpeg_args(raw_path)
+        
+        names = ", ".join(rendition.name for rendition, _, _ in outputs)
+        self.log(f"单次编码片段 {first_index}-{num_segments} (时间: {offset:.2f}s - "
+                 f"{duration:.2f}s, 规格: {names})")
+        with self.metrics.stage("encode", video_file):
+            result = run_ffmpeg(cmd, self.track_progress(duration - offset))
+        if result.returncode != 0:
+            self.log(f"警告: 单次编码时出错: {result.stderr[-300:]}")
+        
+        for rendition, video_output_dir, manifest in outputs:
+            produced = self.record_outputs(manifest, video_output_dir, base_name, segments,
+                                           first_index)
+            self.log(f"{rendition.name}: 完成 {first_index - 1 + produced}/{num_segments} 个片段")
+        if thumbnails is not None:
+            self.capture_thumbnails(thumbnails, raw_path, offset,
+                                    range(first_index, num_segments + 1), video_file)
+            self.finish_thumbnails(thumbnails, video_file)
+    
+    def record_outputs(self, manifest, video_output_dir, base_name, segments, first_index=1):
+        """检查一次FFmpeg运行输出的各个片段并记录到清单，返回有效片段数"""
+        produced = 0
+        for index in range(first_index, len(segments) + 1):
+            start_time, end_time = segments[index - 1]
+            output_path = os.path.join(video_output_dir, segment_filename(base_name, index))
+            if not os.path.exists(output_path):
+                manifest.mark_failed(index, start_time, end_time)
+            elif manifest.mark_done(index, output_path, start_time, end_time):
+                produced += 1
+        return produced
+    
+    def single_pass_args(self, segments, first_index, duration):
+        """单次编码从第 first_index 个片段开始时的强制关键帧参数和segment复用器的切分参数"""
+        offset = segments[first_index - 1][0]
+        # 在每个分割点强制关键帧，保证片段边界精确（定位后输出时间从0开始）
+        if self.options.boundaries == "fixed":
+            # 分割点仍是片段长度的整数倍，用表达式代替很长的时间列表
+            segment_time = str(self.segment_duration)
+            return (["-force_key_frames", f"expr:gte(t,n_forced*{segment_time})"],
+                    ["-segment_time", segment_time])
+        if len(segments) > first_index:
+            # 与无损复制相同，切分时间略早于强制的关键帧，避免舍入误差导致跳到下一个关键帧
+            starts = [start - offset for start, _ in segments[first_index:]]
+            return (["-force_key_frames", ",".join(f"{t:.6f}" for t in starts)],
+                    ["-segment_times",
+                     ",".join(f"{max(t - TIME_EPSILON, 0.0):.6f}" for t in starts)])
+        return [], ["-segment_time", str(duration + 1)]
+    
+    def split_single_pass(self, video_file, video_output_dir, base_name, duration):
+        """单次编码：输入只解码/编码一次，由segment复用器输出所有片段"""
+        segments = self.segment_ranges(video_file, duration)
+        num_segments = len(segments)
+        self.log(f"将分割为 {num_segments} 个片段 (单次编码)")
+        manifest = self.open_manifest(video_file, video_output_dir, segments)
+        thumbnails = self.open_thumbnails(video_output_dir, base_name, segments)
+        
+        # 续传时从第一个未完成的片段开始编码
+        pending = manifest.pending(num_segments)
+        if not pending:
+            self.finish_thumbnails(thumbnails, video_file)
+            return
+        first_index = pending[0]
+        offset = segments[first_index - 1][0]
+        seek_args = ["-ss", str(offset)] if offset > 0 else []
+        
+        # 输出文件名与逐段模式相同：{base_name}_segment_001.mp4 ...
+        # 之后的片段（包括已完成的）都会被重新写入
+        output_pattern = os.path.join(video_output_dir, segment_pattern(base_name))
+        unlink_shared_outputs(video_output_dir, base_name, range(first_index, num_segments + 1))
+        
+        key_args, split_args = self.single_pass_args(segments, first_index, duration)
+        cmd = [
+            "ffmpeg", "-y", *seek_args, "-i", video_file,
+            "-c:v", "libx264", "-crf", self.options.crf, "-preset", self.options.preset,
+            "-threads", str(self.options.threads), *key_args,
+            "-c:a", "aac", "-b:a", "128k",
+            "-f", "segment", *split_args,
+            "-segment_start_number", str(first_index), "-reset_timestamps", "1",
+            "-segment_format", "mp4",
+            "-segment_format_options", "movflags=+faststart",
+            output_pattern
+        ]
+        if thumbnails is not None:
+            raw_path = thumbnails.raw_path(first_index)
+            cmd += thumbnails.ffmpeg_args(raw_path)
+        
+        self.log(f"单次编码片段 {first_index}-{num_segments} (时间: {offset:.2f}s - {duration:.2f}s)")
+        with self.metrics.stage("encode", video_file):
+            result = run_ffmpeg(cmd, self.track_progress(duration - offset))
+        
+        # 检查结果
+        if result.returncode != 0:
+            self.log(f"警告: 单次编码时出错: {result.stderr[-300:]}")
+        
+        produced = self.record_outputs(manifest, video_output_dir, base_name, segments, first_index)
+        self.log(f"完成 {first_index - 1 + produced}/{num_segments} 个片段")
+        if thumbnails is not None:
+            self.capture_thumbnails(thumbnails, raw_path, offset,
+                                    range(first_index, num_segments + 1), video_file)
+            self.finish_thumbnails(thumbnails, video_file)
+    
+    def split_hls(self, video_file, video_output_dir, base_name, duration):
+        """HLS输出：hls复用器一次输出播放列表和fMP4片段；无损复制模式只重新封装，其他模式单次编码
+        
+        播放列表不能只补写一部分，续传时已完成的视频整个跳过，未完成的从头处理
+        """
+        single = self.options.output_format == "hls_single"
+        playlist_path = os.path.join(video_output_dir, playlist_filename(base_name))
+        manifest, resumed = SegmentManifest.open(
+            video_output_dir, video_file, self.manifest_params(), self.options.resume
+        )
+        manifest.metrics = self.metrics
+        self.manifests.append(manifest)
+        count = manifest.count()
+        if resumed and count and not manifest.pending(count):
+            try:
+                complete = parse_playlist(playlist_path)[1]
+            except (OSError, ValueError):
+                complete = False
+            if complete:
+                self.log(f"续传: HLS输出已完成，跳过 ({count} 个片段)")
+                return
+        manifest.clear()
+        manifest.save(force=True)
+        
+        segment_time = str(self.segment_duration)
+        if self.options.mode == "copy":
+            # 复用器在 hls_time 的整数倍之后的第一个关键帧处切分
+            codec_args = ["-c", "copy"]
+            hls_time = segment_time
+            stage = "mux"
+            self.log("HLS输出 (无损复制，在关键帧处切分)")
+        else:
+            codec_args = [
+                "-c:v", "libx264", "-crf", self.options.crf, "-preset", self.options.preset,
+                "-threads", str(self.options.threads),
+            ]
+            segments = self.segment_ranges(video_file, duration)
+            num_segments = len(segments)
+            if self.options.boundaries == "fixed":
+                codec_args += ["-force_key_frames", f"expr:gte(t,n_forced*{segment_time})"]
+                hls_time = segment_time
+            else:
+                # 分割点不是固定间隔：只在分割点产生关键帧，并让复用器在每个关键帧处切分
+                codec_args += ["-x264-params", "keyint=infinite:scenecut=0"]
+                if num_segments > 1:
+                    codec_args += ["-force_key_frames",
+                                   ",".join(f"{start:.6f}" for start, _ in segments[1:])]
+                    hls_time = str(TIME_EPSILON)
+                else:
+                    hls_time = str(duration + 1)
+            codec_args += ["-c:a", "aac", "-b:a", "128k"]
+            stage = "encode"
+            self.log(f"HLS输出 {num_segments} 个片段 (单次编码)")
+        
+        hls_args = [
+            "-f", "hls", "-hls_time", hls_time, "-hls_playlist_type", "vod",
+            "-hls_list_size", "0", "-hls_segment_type", "fmp4",
+        ]
+        if single:
+            hls_args += [
+                "-hls_flags", "single_file",
+                "-hls_segment_filename", os.path.join(video_output_dir, single_filename(base_name)),
+            ]
+        else:
+            hls_args += [
+                "-start_number", "1",
+                "-hls_fmp4_init_filename", init_filename(base_name),
+                "-hls_segment_filename",
+                os.path.join(video_output_dir, hls_segment_pattern(base_name)),
+            ]
+        cmd = ["ffmpeg", "-y", "-i", video_file, *codec_args, *hls_args, playlist_path]
+        thumbnails = None
+        if stage == "encode":
+            # 无损复制不解码，选项检查已经排除了这种组合
+            thumbnails = self.open_thumbnails(video_output_dir, base_name, segments)
+        if thumbnails is not None:
+            raw_path = thumbnails.raw_path(1)
+            cmd += thumbnails.ffmpeg_args(raw_path)
+        
+        with self.metrics.stage(stage, video_file):
+            result = run_ffmpeg(cmd, self.track_progress(duration))
+        if result.returncode != 0:
+            self.log(f"警告: HLS输出时出错: {result.stderr[-300:]}")
+        if thumbnails is not None:
+            self.capture_thumbnails(thumbnails, raw_path, 0.0, range(1, num_segments + 1),
+                                    video_file)
+            self.finish_thumbnails(thumbnails, video_file)
+        
+        try:
+            entries, complete = parse_playlist(playlist_path)
+        except (OSError, ValueError) as e:
+            self.log(f"警告: 无法读取播放列表: {str(e)}")
+            return
+        start_time = 0.0
+        for index, (length, output_path, byte_range) in enumerate(entries, 1):
+            end_time = start_time + length
+            if os.path.exists(output_path):
+                manifest.mark_packaged(index, output_path, start_time, end_time, byte_range)
+            else:
+                manifest.mark_failed(index, start_time, end_time)
+            start_time = end_time
+        if not complete:
+            self.log(f"警告: 播放列表不完整: {os.path.basename(playlist_path)}")
+        else:
+            self.log(f"完成 {len(entries)} 个片段: {os.path.basename(playlist_path)}")
+    
+    def split_live(self, source, output_directory, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """实时分割标准输入（source 为 "-"）或仍在写入的文件，不需要事先知道时长
+        
+        每个片段结束后立即检查并从 .part 改为正式文件名、记录到清单，不必等输入结束；
+        输入结束时输出最后一个不完整的片段。只支持固定间隔的分割点，无损复制模式在分割点之后的
+        第一个关键帧处切分，其他模式按单次编码处理。输入无法重新读取，不续传也不使用输出缓存
+        """
+        if self.options.boundaries != "fixed":
+            raise ValueError("实时分割只支持固定间隔的分割点")
+        if self.options.output_format != "mp4" or self.options.renditions:
+            raise ValueError("实时分割只支持单一规格的MP4片段输出")
+        if self.options.thumbnails:
+            raise ValueError("实时分割不支持生成缩略图")
+        if self.options.auto_tune:
+            raise ValueError("实时分割的输入时长未知，不能按目标速度或完成时限选择预设")
+        try:
+            return self.run_live(source, output_directory, idle_timeout)
+        finally:
+            self.close()
+    
+    def run_live(self, source, output_directory, idle_timeout):
+        mode = self.options.mode
+        base_name = source_name(source)
+        video_output_dir = os.path.join(output_directory, base_name)
+        os.makedirs(video_output_dir, exist_ok=True)
+        input_name = source if source == STDIN_SOURCE else os.path.abspath(source)
+        params = {
+            "engine": self.options.engine,
+            "mode": mode,
+            "segment_duration": self.segment_duration,
+            "quality": self.options.quality,
+            "live": True,
+        }
+        manifest = SegmentManifest.create(video_output_dir, input_name, params)
+        manifest.metrics = self.metrics
+        self.manifests.append(manifest)
+        manifest.save(force=True)
+        
+        segment_time = str(self.segment_duration)
+        if mode == "copy":
+            codec_args = ["-c", "copy"]
+            stage = "mux"
+        else:
+            if mode != "single_pass":
+                self.log("实时分割使用单次编码")
+            codec_args = [
+                "-c:v", "libx264", "-crf", self.options.crf, "-preset", self.options.preset,
+                "-threads", str(self.options.threads),
+                "-force_key_frames", f"expr:gte(t,n_forced*{segment_time})",
+                "-c:a", "aac", "-b:a", "128k",
+            ]
+            stage = "encode"
+        
+        # segment复用器每关闭一个片段就在列表中追加一行：文件名,开始时间,结束时间
+        list_path = os.path.join(video_output_dir, LIVE_LIST_NAME)
+        output_pattern = os.path.join(video_output_dir, segment_pattern(base_name)) + ".part"
+        cmd = [
+            "ffmpeg", "-y", "-i", "pipe:0",
+            # 输出文件名以 .part 结尾，复用器无法按扩展名选择默认的流
+            "-map", "0:v:0", "-map", "0:a:0?", *codec_args,
+            "-f", "segment", "-segment_time", segment_time,
+            "-segment_list", list_path, "-segment_list_type", "csv",
+            "-segment_start_number", "1", "-reset_timestamps", "1",
+            "-segment_format", "mp4",
+            "-segment_format_options", "movflags=+faststart",
+            output_pattern
+        ]
+        
+        finished = []
+        
+        def collect():
+            """处理列表中新增的片段"""
+            try:
+                with open(list_path, "r", encoding="utf-8", newline="") as f:
+                    rows = [row for row in csv.reader(f) if len(row) >= 3]
+            except OSError:
+                return
+            for name, start, end in (row[:3] for row in rows[len(finished):]):
+                index = len(finished) + 1
+                start_time, end_time = float(start), float(end)
+                part_path = os.path.join(video_output_dir, name)
+                output_path = part_path[:-len(".part")]
+                output_filename = os.path.basename(output_path)
+                try:
+                    os.replace(part_path, output_path)
+                except OSError as e:
+                    self.log(f"警告: 无法重命名片段 {index}: {str(e)}")
+                    manifest.mark_failed(index, start_time, end_time)
+                else:
+                    if manifest.mark_done(index, output_path, start_time, end_time):
+                        self.log(f"完成片段 {index}: {output_filename} "
+                                 f"(时间: {start_time:.2f}s - {end_time:.2f}s)")
+                    else:
+                        self.log(f"警告: 片段 {index} 不完整: {output_filename}")
+                finished.append(index)
+        
+        track = self.track_progress(0)
+        
+        def on_progress(info):
+            track(info)
+            collect()
+        
+        source_label = "标准输入" if source == STDIN_SOURCE else source
+        self.log(f"实时分割: {source_label} (每 {segment_time} 秒一个片段)")
+        with self.metrics.stage(stage, input_name):
+            result = run_ffmpeg(cmd, on_progress, feed=source_feed(source, idle_timeout))
+        collect()
+        
+        if result.returncode != 0:
+            self.log(f"警告: 实时分割时出错: {result.stderr[-300:]}")
+        self.log(f"输入结束，共输出 {len(finished)} 个片段")
+        return self.metrics
+    
+    def split_stream_copy(self, video_file, video_output_dir, base_name, duration):
+        """无损复制：分割点对齐到最近的关键帧，只重新封装 (-c copy)，不重新编码"""
+        self.log("建立关键帧索引...")
+        with self.metrics.stage("probe", video_file):
+            keyframes = self.probe(video_file, "keyframes", probe_keyframes)
+        targets = [start for start, _ in self.segment_ranges(video_file, duration)[1:]]
+        segments = snap_boundaries(keyframes, duration, targets)
+        self.log(f"找到 {len(keyframes)} 个关键帧，将分割为 {len(segments)} 个片段 (无损复制)")
+        manifest = self.open_manifest(video_file, video_output_dir, segments)
+        
+        # 续传时从第一个未完成的片段（一定从关键帧开始）开始复制；
+        # 复制时定位到该时间之前最近的关键帧，所以稍微往后定位
+        pending = manifest.pending(len(segments))
+        if not pending:
+            return
+        first_index = pending[0]
+        offset = segments[first_index - 1][0]
+        seek_args = ["-ss", f"{offset + TIME_EPSILON:.6f}"] if offset > 0 else []
+        
+        # 之后的片段（包括已完成的）都会被重新写入
+        output_pattern = os.path.join(video_output_dir, segment_pattern(base_name))
+        unlink_shared_outputs(video_output_dir, base_name, range(first_index, len(segments) + 1))
+        
+        # segment复用器在指定时间之后的第一个关键帧处切分，时间从第一个视频包算起
+        # （视频不从0秒开始时第一个关键帧的时间不为0）；
+        # 时间略早于关键帧，避免浮点舍入导致跳到下一个关键帧
+        origin = offset if offset > 0 or not keyframes else keyframes[0]
+        if len(segments) > first_index:
+            times = ",".join(
+                f"{max(start - origin - TIME_EPSILON, 0.0):.6f}"
+                for start, _ in segments[first_index:]
+            )
+            split_args = ["-segment_times", times]
+        else:
+            split_args = ["-segment_time", str(duration + 1)]
+        
+        cmd = [
+            "ffmpeg", "-y", *seek_args, "-i", video_file, "-c", "copy",
+            "-f", "segment", *split_args,
+            "-segment_start_number", str(first_index), "-reset_timestamps", "1",
+            "-segment_format", "mp4",
+            "-segment_format_options", "movflags=+faststart",
+            output_pattern
+        ]
+        
+        with self.metrics.stage("mux", video_file):
+            result = run_ffmpeg(cmd, self.track_progress(duration - offset))
+        
+        if result.returncode != 0:
+            self.log(f"警告: 无损复制时出错: {result.stderr[-300:]}")
+        
+        self.record_outputs(manifest, video_output_dir, base_name, segments, first_index)
+        
+        # 报告每个片段的实际起止时间
+        for j, (start_time, end_time) in enumerate(segments[first_index - 1:], first_index - 1):
+            output_filename = segment_filename(base_name, j + 1)
+            if manifest.is_done(j + 1):
+                self.log(f"完成片段 {j+1}/{len(segments)}: {output_filename} "
+                         f"(实际时间: {start_time:.3f}s - {end_time:.3f}s)")
+            else:
+                self.log(f"警告: 未生成片段 {j+1}: {output_filename}")
+    
+    def split_smart_cut(self, video_file, video_output_dir, base_name, duration):
+        """智能剪切：只重新编码分割点到下一个关键帧之间的帧，其余部分直接复制后无损拼接"""
+        with self.metrics.stage("probe", video_file):
+            info = self.probe(video_file, "video_stream", probe_video_stream)
+        encoder = SMART_CUT_ENCODERS.get(info.get("codec_name"))
+        if encoder is None:
+            self.log(f"智能剪切不支持编码格式 {info.get('codec_name')}，改用逐段编码")
+            self.split_per_segment(video_file, video_output_dir, base_name, duration)
+            return
+        
+        self.log("建立关键帧索引...")
+        with self.metrics.stage("probe", video_file):
+            keyframes = self.probe(video_file, "keyframes", probe_keyframes)
+        segments = self.segment_ranges(video_file, duration)
+        num_segments = len(segments)
+        self.log(f"找到 {len(keyframes)} 个关键帧，将分割为 {num_segments} 个片段 (智能剪切)")
+        
+        manifest = self.open_manifest(video_file, video_output_dir, segments)
+        
+        # 已完成的片段不需要规划，也不需要复制其中的关键帧区间
+        plans = [
+            plan_smart_cut(keyframes, start, end) if not manifest.is_done(j + 1) else None
+            for j, (start, end) in enumerate(segments)
+        ]
+        
+        # 所有可复制区间的边界，复制时在这些关键帧处切开
+        cut_times = sorted({t for plan in plans if plan for t in plan if t > TIME_EPSILON})
+        # 关键帧 -> 以该关键帧开始的复制块编号（第0块从视频开头开始）
+        chunk_index = {t: n + 1 for n, t in enumerate(cut_times)}
+        
+        # 重新编码不完整GOP时使用与源视频一致的编码格式和像素格式
+        encode_part = partial(
+            self.encode_smart_cut_part, video_file,
+            encoder=encoder, pix_fmt=info.get("pix_fmt")
+        )
+        
+        work_dir = tempfile.mkdtemp(prefix=".smartcut_", dir=video_output_dir)
+        try:
+            # 一次读取整个视频，按关键帧切成复制块（MPEG-TS带有内嵌的参数集，便于拼接）
+            if any(plans):
+                self.log("复制关键帧对齐的区间...")
+                cmd = [
+                    "ffmpeg", "-y", "-i", video_file, "-map", "0:v:0", "-c", "copy",
+                    "-f", "segment", "-segment_format", "mpegts"
+                ]
+                # 与无损复制相同：segment复用器的时间从第一个视频包（第一个关键帧）算起
+                origin = keyframes[0] if keyframes else 0.0
+                if cut_times:
+                    times = ",".join(f"{max(t - origin - TIME_EPSILON, 0.0):.6f}"
+                                     for t in cut_times)
+                    cmd += ["-segment_times", times]
+                else:
+                    cmd += ["-segment_time", str(duration + 1)]
+                cmd.append(os.path.join(work_dir, "copy_%05d.ts"))
+                
+                # 复制算作一步，之后每个片段各算一步
+                with self.metrics.stage("mux", video_file):
+                    result = run_ffmpeg(
+                        cmd, self.track_progress(duration, 0.0, 1 / (num_segments + 1))
+                    )
+                if result.returncode != 0:
+                    raise RuntimeError(f"复制关键帧区间失败: {result.stderr[-300:]}")
+            
+            for j, ((start_time, end_time), plan) in enumerate(zip(segments, plans)):
+                if manifest.is_done(j + 1):
+                    continue
+                
+                output_filename = segment_filename(base_name, j + 1)
+                output_path = os.path.join(video_output_dir, output_filename)
+                started = time.perf_counter()
+                
+                # (文件, 时长) 列表：头部重新编码 + 中间直接复制 + 尾部重新编码
+                parts = []
+                if plan is None:
+                    parts.append(encode_part(
+                        start_time, end_time, os.path.join(work_dir, f"full_{j:05d}.ts")
+                    ))
+                else:
+                    copy_start, copy_end = plan
+                    if copy_start - start_time > TIME_EPSILON:
+                        parts.append(encode_part(
+                            start_time, copy_start, os.path.join(work_dir, f"head_{j:05d}.ts")
+                        ))
+                    index = chunk_index.get(copy_start, 0)
+                    parts.append((
+                        os.path.join(work_dir, f"copy_{index:05d}.ts"),
+                        copy_end - copy_start
+                    ))
+                    if end_time - copy_end > TIME_EPSILON:
+                        parts.append(encode_part(
+                            copy_end, end_time, os.path.join(work_dir, f"tail_{j:05d}.ts")
+                        ))
+                
+                copied = plan[1] - plan[0] if plan else 0.0
+                self.log(f"处理片段 {j+1}/{num_segments} (时间: {start_time:.2f}s - {end_time:.2f}s，"
+                         f"复制 {copied:.2f}s)")
+                
+                # 缺少重新编码的部分时拼接出的视频中间有空缺，而音频仍覆盖整个片段，
+                # 时长检查发现不了，直接记为失败
+                if None in parts:
+                    manifest.mark_failed(j + 1, start_time, end_time,
+                                         time.perf_counter() - started)
+                    self.log(f"警告: 片段 {j+1} 的部分区间重新编码失败: {output_filename}")
+                else:
+                    result = self.concat_smart_cut_parts(video_file, work_dir, j, parts,
+                                                         start_time, end_time, output_path)
+                    seconds = time.perf_counter() - started
+                    
+                    if result.returncode != 0:
+                        manifest.mark_failed(j + 1, start_time, end_time, seconds)
+                        self.log(f"警告: 处理片段 {j+1} 时出错: {result.stderr[-300:]}")
+                    elif not manifest.mark_done(j + 1, output_path, start_time, end_time, seconds):
+                        self.log(f"警告: 片段 {j+1} 不完整: {output_filename}")
+                    else:
+                        self.log(f"完成片段 {j+1}/{num_segments}: {output_filename}")
+                
+                # 重新编码的部分只用一次，及时删除
+                for part in parts:
+                    if part is not None and not os.path.basename(part[0]).startswith("copy_"):
+                        os.remove(part[0])
+                
+                # 更新进度
+                self.runner.set_progress((j + 2) / (num_segments + 1))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def concat_smart_cut_parts(self, video_file, work_dir, j, parts, start_time, end_time,
+                               output_path):
+        """拼接第 j+1 个片段的视频部分，并重新编码该片段的音频"""
+        # 列表中的相对路径以列表文件所在目录为准；显式写出时长，保证时间戳连续
+        list_path = os.path.join(work_dir, f"concat_{j:05d}.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for part_path, part_duration in parts:
+                f.write(f"file '{os.path.basename(part_path)}'\nduration {part_duration:.6f}\n")
+        
+        cmd = [
+            "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+            "-ss", str(start_time), "-t", str(end_time - start_time), "-i", video_file,
+            "-map", "0:v:0", "-map", "1:a:0?", "-c:v", "copy",
+            "-c:a", "aac", "-b:a", "128k",
+            "-movflags", "+faststart", output_path
+        ]
+        with self.metrics.stage("mux", video_file):
+            return run_ffmpeg(cmd)
+    
+    def encode_smart_cut_part(self, video_file, start_time, end_time, output_path,
+                              encoder, pix_fmt):
+        """重新编码智能剪切中不完整的GOP（只含视频），返回 (文件, 时长)，失败时返回None"""
+        cmd = [
+            "ffmpeg", "-y", "-ss", str(start_time), "-i", video_file,
+            "-t", str(end_time - start_time), "-map", "0:v:0", "-an",
+            "-c:v", encoder, "-crf", self.options.crf, "-preset", self.options.preset,
+            "-threads", str(self.options.threads)
+        ]
+        if pix_fmt:
+            cmd += ["-pix_fmt", pix_fmt]
+        cmd += ["-f", "mpegts", output_path]
+        
+        with self.metrics.stage("encode", video_file):
+            result = run_ffmpeg(cmd)
+        if result.returncode != 0 or not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+            self.log(f"警告: 重新编码 {start_time:.2f}s - {end_time:.2f}s 时出错: {result.stderr[-100:]}")
+            return None
+        return output_path, end_time - start_time
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""运行FFmpeg并逐行读取其机器可读的 -progress 输出"""
+import subprocess
+import threading
+from collections import deque
+
+from .processes import checkpoint, raise_if_cancelled, tracked
+
+# 出错时保留的stderr末尾行数，避免长任务的输出占用过多内存
+STDERR_TAIL_LINES = 50
+
+
+def parse_number(value, suffix=""):
+    """解析 -progress 中的数值，N/A 等无法解析的值返回None"""
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_progress_block(block):
+    """把一组 key=value 进度信息转换为 {out_time, fps, speed, frame, total_size, done}"""
+    # out_time_ms 实际上也是微秒（FFmpeg的历史遗留问题）
+    out_time_us = parse_number(block.get("out_time_us", block.get("out_time_ms", "N/A")))
+    frame = parse_number(block.get("frame", "N/A"))
+    total_size = parse_number(block.get("total_size", "N/A"))
+    return {
+        "out_time": out_time_us / 1000000.0 if out_time_us is not None else None,
+        "fps": parse_number(block.get("fps", "N/A")),
+        "speed": parse_number(block.get("speed", "N/A"), suffix="x"),
+        "frame": int(frame) if frame is not None else None,
+        "total_size": int(total_size) if total_size is not None else None,
+        "done": block.get("progress") == "end",
+    }
+
+
+def drain_stderr(stream, tail):
+    for line in stream:
+        tail.append(line)
+
+
+def feed_stdin(feed, stream):
+    """在单独的线程中把输入数据写入FFmpeg的标准输入，写完（或FFmpeg提前退出）后关闭"""
+    try:
+        feed(stream)
+    except (BrokenPipeError, ValueError):
+        pass
+    finally:
+        try:
+            stream.close()
+        except BrokenPipeError:
+            pass
+
+
+def run_ffmpeg(cmd, on_progress=None, feed=None):
+    """运行FFmpeg命令并等待结束，返回CompletedProcess（stderr为最后几行错误输出）
+    
+    进度通过 -progress pipe:1 逐块读取，每块调用一次 on_progress(dict)；
+    stderr在单独的线程中持续读取，不会因为管道写满而卡住FFmpeg。
+    feed(stream) 可选，用于 -i pipe:0 输入：在单独的线程中向二进制流 stream 写入输入数据。
+    所在任务被取消时FFmpeg立即被终止，并抛出 Cancelled；暂停时FFmpeg被挂起
+    """
+    checkpoint()
+    cmd = [
+        cmd[0], "-hide_banner", "-nostdin", "-loglevel", "error",
+        "-nostats", "-progress", "pipe:1", *cmd[1:]
+    ]
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if feed is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        encoding="utf-8",
+        errors="replace"
+    )
+    
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    with tracked(process):
+        stderr_reader = threading.Thread(
+            target=drain_stderr, args=(process.stderr, stderr_tail), daemon=True
+        )
+        stderr_reader.start()
+        if feed is not None:
+            # 文本模式的 process.stdin 包装着二进制流，输入数据直接写入二进制流
+            threading.Thread(
+                target=feed_stdin, args=(feed, process.stdin.buffer), daemon=True
+            ).start()
+        
+        block = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            if not key:
+                continue
+            block[key] = value
+            # 每块进度信息以 progress=continue/end 结尾
+            if key == "progress":
+                if on_progress is not None:
+                    on_progress(parse_progress_block(block))
+                block = {}
+        
+        process.wait()
+        stderr_reader.join()
+    raise_if_cancelled()
+    return subprocess.CompletedProcess(cmd, process.returncode, None, "".join(stderr_tail))
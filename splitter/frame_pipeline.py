@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""解码/编码流水线：解码线程把帧复制到预分配的缓冲区，编码线程从队列中取出写入
+
+缓冲区数量由内存预算决定，全部缓冲区都在使用时解码线程等待，
+因此无论视频分辨率多大，排队的帧占用的内存都不会超过预算
+"""
+import queue
+import threading
+
+import numpy as np
+
+# 内存预算很小时也至少保留的缓冲区数量
+MIN_BUFFERS = 2
+
+# 等待空闲缓冲区时检查中止标志的间隔（秒）
+POLL_INTERVAL = 0.1
+
+
+class PipelineAborted(Exception):
+    """编码线程出错后，解码线程不再继续读取"""
+
+
+class FramePool:
+    def __init__(self, shape, max_bytes, max_frames=None, dtype=np.uint8):
+        """max_frames: 流水线最多能用到的帧数，预算更大时也不多分配"""
+        frame_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        self.size = max(MIN_BUFFERS, int(max_bytes // frame_bytes))
+        if max_frames is not None:
+            self.size = max(MIN_BUFFERS, min(self.size, max_frames))
+        self.frame_bytes = frame_bytes
+        self.free = queue.Queue()
+        for _ in range(self.size):
+            self.free.put(np.empty(shape, dtype=dtype))
+    
+    def acquire(self, abort):
+        while True:
+            try:
+                return self.free.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if abort.is_set():
+                    raise PipelineAborted()
+    
+    def release(self, buffer):
+        self.free.put(buffer)
+
+
+class FramePipeline:
+    """按键（片段编号）把帧分配给编码线程：同一个键的帧由同一个线程按顺序处理
+    
+    begin(key) 在某个键的第一帧之前调用，write(key, frame) 处理一帧，
+    end(key) 在该键的最后一帧之后调用；三者都在编码线程中运行
+    """
+    
+    def __init__(self, pool, num_encoders, begin, write, end, start_thread=None):
+        self.pool = pool
+        self.begin = begin
+        self.write = write
+        self.end = end
+        
+        self.abort_event = threading.Event()
+        self.error = None
+        self.error_lock = threading.Lock()
+        
+        # 帧数量已由缓冲池限制，队列本身不需要限制长度
+        self.queues = [queue.Queue() for _ in range(num_encoders)]
+        start_thread = start_thread or self.start_daemon
+        self.threads = [start_thread(self.encode_loop, q) for q in self.queues]
+    
+    @staticmethod
+    def start_daemon(target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
+    
+    def put(self, key, frame):
+        """在解码线程中调用：把帧复制到空闲缓冲区后交给负责该键的编码线程"""
+        if self.abort_event.is_set():
+            raise PipelineAborted()
+        buffer = self.pool.acquire(self.abort_event)
+        np.copyto(buffer, frame)
+        self.queues[key % len(self.queues)].put((key, buffer))
+    
+    def encode_loop(self, frames):
+        current = None
+        while True:
+            item = frames.get()
+            if item is None:
+                break
+            key, buffer = item
+            try:
+                if self.abort_event.is_set():
+                    continue
+                if key != current:
+                    if current is not None:
+                        self.end(current)
+                    current = None
+                    self.begin(key)
+                    current = key
+                self.write(key, buffer)
+            except Exception as e:
+                self.fail(e)
+            finally:
+                self.pool.release(buffer)
+        
+        if current is not None and not self.abort_event.is_set():
+            try:
+                self.end(current)
+            except Exception as e:
+                self.fail(e)
+    
+    def fail(self, error):
+        with self.error_lock:
+            if self.error is None:
+                self.error = error
+        self.abort_event.set()
+    
+    def close(self, abort=False):
+        """通知编码线程结束并等待；abort 为 False 时抛出编码线程中的第一个错误"""
+        if abort:
+            self.abort_event.set()
+        for frames in self.queues:
+            frames.put(None)
+        for thread in self.threads:
+            thread.join()
+        if not abort and self.error is not None:
+            raise self.error
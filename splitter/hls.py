@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""HLS输出：一次FFmpeg运行由hls复用器输出播放列表和fMP4片段
+    
+    hls         {文件名}.m3u8 + {文件名}_init.mp4 + {文件名}_segment_001.m4s ...
+    hls_single  {文件名}.m3u8 + {文件名}.mp4（分片MP4，播放列表用 EXT-X-BYTERANGE 引用各片段）
+
+每个片段不再是带 faststart 的独立MP4，不需要结束时重写moov；hls_single 每个视频只有两个文件。
+"""
+import os
+
+
+def playlist_filename(base_name):
+    return f"{base_name}.m3u8"
+
+
+def init_filename(base_name):
+    return f"{base_name}_init.mp4"
+
+
+def hls_segment_pattern(base_name):
+    """FFmpeg的片段文件名模板（文件名中的%需转义）"""
+    return base_name.replace("%", "%%") + "_segment_%03d.m4s"
+
+
+def single_filename(base_name):
+    return f"{base_name}.mp4"
+
+
+def parse_playlist(path):
+    """读取媒体播放列表，返回 ([(片段时长, 文件路径, 字节范围)], 是否有 EXT-X-ENDLIST)
+    
+    字节范围为 (长度, 偏移)，没有 EXT-X-BYTERANGE 时为None；文件路径相对于播放列表所在目录
+    """
+    directory = os.path.dirname(path)
+    entries = []
+    ended = False
+    duration = None
+    byte_range = None
+    next_offset = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",", 1)[0])
+            elif line.startswith("#EXT-X-BYTERANGE:"):
+                # 长度[@偏移]，省略偏移时紧接上一个片段
+                length, _, offset = line[len("#EXT-X-BYTERANGE:"):].partition("@")
+                offset = int(offset) if offset else next_offset
+                byte_range = (int(length), offset)
+                next_offset = offset + int(length)
+            elif line == "#EXT-X-ENDLIST":
+                ended = True
+            elif line and not line.startswith("#") and duration is not None:
+                entries.append((duration, os.path.join(directory, line), byte_range))
+                duration = None
+                byte_range = None
+    return entries, ended
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""导入视频文件：递归扫描目录，并行获取时长
+
+扫描使用 os.scandir，文件类型随目录项一起返回，不需要对每个文件单独调用 stat，
+每个目录的结果分批交给界面，几万个文件的目录树也能边扫描边显示。
+时长在线程池中并行获取（主要在等待磁盘和FFprobe），结果保存在探测缓存中，之后分割时不再重复探测。
+
+后台线程只把结果放入队列，界面线程定时调用 drain() 取出，与 EventSink 相同。
+"""
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .probe import probe_duration
+from .probe_cache import ProbeCache
+from .watch import is_video_file
+
+# 并行获取时长的线程数
+PROBE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# 扫描结果每批最多的文件数
+SCAN_BATCH = 500
+
+
+def scan_videos(directory, recursive=True):
+    """逐批返回 directory 中的视频文件路径（每个目录按名称排序，先文件后子目录）
+    
+    跳过隐藏文件、隐藏目录、符号链接的目录和无法读取的目录
+    """
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        files = []
+        subdirectories = []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and not entry.name.startswith("."):
+                                subdirectories.append(entry.path)
+                        elif is_video_file(entry.name) and entry.is_file():
+                            files.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        files.sort()
+        for first in range(0, len(files), SCAN_BATCH):
+            yield files[first:first + SCAN_BATCH]
+        # 后进先出：按名称顺序深度优先
+        pending.extend(sorted(subdirectories, reverse=True))
+
+
+class FileImporter:
+    """在后台线程中扫描文件和目录，并行获取每个文件的时长
+    
+    probe(video_file) 返回时长（秒），默认先解析文件头、再使用FFprobe
+    """
+    
+    def __init__(self, probe=probe_duration, probe_cache=True, probe_cache_path=None,
+                 workers=PROBE_WORKERS):
+        self.probe = probe
+        self.probe_cache = probe_cache
+        self.probe_cache_path = probe_cache_path
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        # 尚未被 drain() 取出的结果
+        self.found = []
+        self.probed = []
+        self.scanned = False
+        self.finished = False
+    
+    def start(self, paths, recursive=True):
+        """开始导入 paths（文件或目录），立即返回"""
+        threading.Thread(target=self.run, args=(list(paths), recursive), daemon=True).start()
+    
+    def cancel(self):
+        """停止扫描和探测（正在进行的探测完成后结束），之后的结果不再需要"""
+        self.cancelled.set()
+    
+    def run(self, paths, recursive):
+        cache = None
+        if self.probe_cache:
+            try:
+                cache = ProbeCache.open(self.probe_cache_path)
+            except (OSError, sqlite3.Error):
+                cache = None
+        try:
+            with ThreadPoolExecutor(self.workers) as pool:
+                for batch in self.iter_files(paths, recursive):
+                    if self.cancelled.is_set():
+                        break
+                    with self.lock:
+                        self.found.extend(batch)
+                    for video_file in batch:
+                        pool.submit(self.probe_file, cache, video_file)
+                with self.lock:
+                    self.scanned = True
+        finally:
+            if cache is not None:
+                cache.close()
+            with self.lock:
+                self.scanned = True
+                self.finished = True
+    
+    def iter_files(self, paths, recursive):
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                yield from scan_videos(path, recursive)
+            else:
+                files.append(path)
+        if files:
+            yield files
+    
+    def probe_file(self, cache, video_file):
+        if self.cancelled.is_set():
+            return
+        try:
+            if cache is not None:
+                duration = cache.get(video_file, "duration", self.probe)
+            else:
+                duration = self.probe(video_file)
+            error = None
+        except Exception as e:
+            duration = None
+            error = str(e) or type(e).__name__
+        with self.lock:
+            self.probed.append((video_file, duration, error))
+    
+    def drain(self):
+        """取出积压的结果: (新发现的文件, [(文件, 时长, 错误信息)], 是否扫描完毕, 是否全部完成)
+        
+        无法获取时长时时长为None，错误信息为字符串
+        """
+        with self.lock:
+            found, self.found = self.found, []
+            probed, self.probed = self.probed, []
+            return found, probed, self.scanned, self.finished
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""持久化的视频处理队列（SQLite）
+
+队列保存要处理的视频、输出目录、优先级和时长，程序退出（或崩溃）后仍然保留，处理可以随时加入新视频。
+处理顺序：优先级高的先处理；优先级相同时时长短的先处理（平均等待第一个输出的时间最短），
+时长未知的排在最后；其余按加入顺序。分割参数由处理队列时的设置 (SplitOptions) 决定，不保存在队列中。
+
+处理方定时更新正在处理的条目的心跳时间；处理方退出或崩溃后，心跳超过 STALE_SECONDS 秒未更新的条目
+回到队列，下次根据输出目录中的清单从第一个未完成的片段继续。多个进程可以同时处理同一个队列。
+"""
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from .probe_cache import user_cache_dir
+
+QUEUE_NAME = "queue.sqlite"
+
+# 处理方更新心跳的间隔，以及心跳多久未更新视为处理方已退出（秒）
+HEARTBEAT_INTERVAL = 5.0
+STALE_SECONDS = 30.0
+
+# 条目状态
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    output_directory TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    duration REAL,
+    status TEXT NOT NULL,
+    error TEXT,
+    added REAL NOT NULL,
+    finished REAL,
+    owner TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS entries_order
+    ON entries (status, priority DESC, duration IS NULL, duration, id);
+"""
+
+# 与 QueueEntry.sort_key 相同的顺序
+ORDER = "priority DESC, duration IS NULL, duration, id"
+
+COLUMNS = "id, path, output_directory, priority, duration, status, error"
+
+
+@dataclass
+class QueueEntry:
+    id: int
+    path: str
+    output_directory: str
+    priority: int = 0
+    duration: float = None  # 秒，None 表示未知
+    status: str = STATUS_QUEUED
+    error: str = None
+    
+    def sort_key(self):
+        """越小越先处理"""
+        unknown = self.duration is None
+        return (-self.priority, unknown, 0.0 if unknown else self.duration, self.id)
+
+
+class JobQueue:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 界面线程、调度线程和工作线程共用一个连接，由 self.lock 串行化
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+    
+    @classmethod
+    def open(cls, path=None):
+        """打开队列，path 为 None 时使用用户缓存目录"""
+        return cls(path or os.path.join(user_cache_dir(), QUEUE_NAME))
+    
+    def close(self):
+        with self.lock:
+            self.connection.close()
+    
+    def query(self, sql, params=()):
+        with self.lock:
+            rows = self.connection.execute(sql, params).fetchall()
+        return [QueueEntry(*row) for row in rows]
+    
+    def update(self, sql, params=()):
+        """执行修改，返回修改的行数"""
+        with self.lock, self.connection:
+            return self.connection.execute(sql, params).rowcount
+    
+    def add(self, video_files, output_directory, priority=0, durations=None):
+        """加入视频，返回新加入的条目；同一输出目录中尚未处理完的同一视频不重复加入
+        
+        durations 是与 video_files 对应的时长（秒），用于按时长排序
+        """
+        durations = durations or [None] * len(video_files)
+        output_directory = os.path.abspath(output_directory)
+        added = []
+        with self.lock, self.connection:
+            for video_file, duration in zip(video_files, durations):
+                path = os.path.abspath(video_file)
+                if self.connection.execute(
+                    "SELECT 1 FROM entries WHERE path = ? AND output_directory = ? "
+                    "AND status IN (?, ?)",
+                    (path, output_directory, STATUS_QUEUED, STATUS_RUNNING)
+                ).fetchone():
+                    continue
+                cursor = self.connection.execute(
+                    "INSERT INTO entries "
+                    "(path, output_directory, priority, duration, status, added) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (path, output_directory, priority, duration, STATUS_QUEUED, time.time())
+                )
+                added.append(QueueEntry(cursor.lastrowid, path, output_directory, priority,
+                                        duration))
+        return added
+    
+    def entries(self, statuses=None):
+        """按处理顺序返回条目，statuses 为 None 时返回所有条目"""
+        if statuses is None:
+            return self.query(f"SELECT {COLUMNS} FROM entries ORDER BY {ORDER}")
+        marks = ", ".join("?" * len(statuses))
+        return self.query(
+            f"SELECT {COLUMNS} FROM entries WHERE status IN ({marks}) ORDER BY {ORDER}",
+            tuple(statuses)
+        )
+    
+    def next_entry(self):
+        """下一个要处理的条目，没有时返回None"""
+        rows = self.query(
+            f"SELECT {COLUMNS} FROM entries WHERE status = ? ORDER BY {ORDER} LIMIT 1",
+            (STATUS_QUEUED,)
+        )
+        return rows[0] if rows else None
+    
+    def counts(self):
+        """状态 -> 条目数"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT status, COUNT(*) FROM entries GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+    
+    def start(self, entry_id, owner):
+        """处理方 owner 开始处理条目；条目已不在排队（被取消或被其他进程取走）时返回False"""
+        return self.update(
+            "UPDATE entries SET status = ?, owner = ?, heartbeat = ? "
+            "WHERE id = ? AND status = ?",
+            (STATUS_RUNNING, owner, time.time(), entry_id, STATUS_QUEUED)
+        ) > 0
+    
+    def heartbeat(self, owner):
+        """更新处理方 owner 正在处理的条目的心跳时间"""
+        self.update(
+            "UPDATE entries SET heartbeat = ? WHERE status = ? AND owner = ?",
+            (time.time(), STATUS_RUNNING, owner)
+        )
+    
+    def finish(self, entry_id, status, error=None):
+        """记录处理结果；status 为 STATUS_QUEUED 时条目回到队列（处理被中断）"""
+        finished = None if status == STATUS_QUEUED else time.time()
+        self.update(
+            "UPDATE entries SET status = ?, error = ?, finished = ? WHERE id = ?",
+            (status, error, finished, entry_id)
+        )
+    
+    def set_priority(self, entry_id, priority):
+        """修改排队中条目的优先级（已开始的视频不再调整）"""
+        return self.update(
+            "UPDATE entries SET priority = ? WHERE id = ? AND status = ?",
+            (priority, entry_id, STATUS_QUEUED)
+        ) > 0
+    
+    def cancel(self, entry_id=None):
+        """取消排队中的条目（entry_id 为 None 时取消所有排队中的条目），返回取消的条目数
+        
+        正在处理的视频由处理方（BaseSplitter.cancel）终止并记录为已取消
+        """
+        if entry_id is None:
+            return self.update(
+                "UPDATE entries SET status = ?, finished = ? WHERE status = ?",
+                (STATUS_CANCELLED, time.time(), STATUS_QUEUED)
+            )
+        return self.update(
+            "UPDATE entries SET status = ?, finished = ? WHERE id = ? AND status = ?",
+            (STATUS_CANCELLED, time.time(), entry_id, STATUS_QUEUED)
+        )
+    
+    def requeue_interrupted(self):
+        """处理方已退出（心跳超时）但仍记为处理中的条目回到队列，返回条目数"""
+        return self.update(
+            "UPDATE entries SET status = ?, owner = NULL "
+            "WHERE status = ? AND (heartbeat IS NULL OR heartbeat < ?)",
+            (STATUS_QUEUED, STATUS_RUNNING, time.time() - STALE_SECONDS)
+        )
+    
+    def clear_finished(self):
+        """删除已完成、失败和已取消的条目"""
+        return self.update(
+            "DELETE FROM entries WHERE status IN (?, ?, ?)",
+            (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+        )
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""实时分割的输入：标准输入（管道）或仍在写入的文件
+
+输入数据原样写入FFmpeg的标准输入，不需要事先知道时长。
+正在写入的文件读到末尾后继续等待新数据，idle_timeout 秒没有增长时视为录制结束。
+输入需要是可以流式读取的格式（MPEG-TS、Matroska、FLV、分片MP4）；
+普通MP4的索引 (moov) 在录制结束时才写入，无法边写边读。
+"""
+import os
+import sys
+import time
+
+# 标准输入的写法
+STDIN_SOURCE = "-"
+
+# 每次读取的字节数
+CHUNK_BYTES = 1024 * 1024
+
+# 文件读到末尾后检查新数据的间隔（秒）
+FOLLOW_INTERVAL = 0.2
+
+# 文件多少秒没有增长时视为录制结束
+DEFAULT_IDLE_TIMEOUT = 10.0
+
+
+def source_name(source):
+    """输出子目录和文件名主干：文件名去掉扩展名，标准输入为 stream"""
+    if source == STDIN_SOURCE:
+        return "stream"
+    return os.path.splitext(os.path.basename(source))[0]
+
+
+def copy_stdin(stream):
+    """把标准输入复制到 stream，直到写入方关闭管道"""
+    stdin = sys.stdin.buffer
+    while True:
+        chunk = stdin.read1(CHUNK_BYTES)
+        if not chunk:
+            return
+        stream.write(chunk)
+        stream.flush()
+
+
+def follow_file(path, stream, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """把文件复制到 stream，读到末尾后继续等待新数据，idle_timeout 秒没有新数据时结束"""
+    with open(path, "rb") as f:
+        last_data = time.monotonic()
+        while True:
+            chunk = f.read(CHUNK_BYTES)
+            if chunk:
+                stream.write(chunk)
+                stream.flush()
+                last_data = time.monotonic()
+                continue
+            if time.monotonic() - last_data >= idle_timeout:
+                return
+            time.sleep(FOLLOW_INTERVAL)
+
+
+def source_feed(source, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """返回把 source 写入FFmpeg标准输入的函数 feed(stream)"""
+    if source == STDIN_SOURCE:
+        return copy_stdin
+    return lambda stream: follow_file(source, stream, idle_timeout)
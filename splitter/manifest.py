@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""片段清单：记录每个输入视频的分割参数和各片段状态，中断后重新运行时跳过已完成的片段"""
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import nullcontext
+
+from .probe import probe_duration
+
+MANIFEST_NAME = ".manifest.json"
+MANIFEST_VERSION = 1
+
+# 清单的最短写入间隔（秒）；片段很多时避免每完成一个片段就重写整个文件
+SAVE_INTERVAL = 1.0
+
+# 片段实际时长与预期时长的允许误差（秒）
+DURATION_TOLERANCE = 0.5
+
+
+def file_identity(path):
+    """用大小和修改时间标识输入文件，文件被替换或修改后清单失效"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def measure_duration(path):
+    """读取输出片段的时长；没有FFprobe时返回None，文件损坏（例如写到一半）时抛出异常"""
+    try:
+        return probe_duration(path)
+    except FileNotFoundError:
+        return None
+
+
+class SegmentManifest:
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self.lock = threading.Lock()
+        self.last_save = 0.0
+        # 可选的运行统计 (RunMetrics)：记录检查/写入耗时和每个片段的结果
+        self.metrics = None
+        # 可选回调 on_done(index, output_path, record)：片段检查通过后调用（例如保存到输出缓存）
+        self.on_done = None
+    
+    @classmethod
+    def open(cls, video_output_dir, video_file, params, resume=True):
+        """打开输出目录中的清单；输入文件或参数变化（或不续传）时从头开始，返回 (清单, 是否续传)"""
+        path = os.path.join(video_output_dir, MANIFEST_NAME)
+        data = {
+            "version": MANIFEST_VERSION,
+            "input": os.path.abspath(video_file),
+            "input_identity": file_identity(video_file),
+            "params": params,
+            "segments": {},
+        }
+        
+        if resume and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = None
+            if (saved and saved.get("version") == MANIFEST_VERSION
+                    and saved.get("input_identity") == data["input_identity"]
+                    and saved.get("params") == params):
+                data["segments"] = saved.get("segments", {})
+                return cls(path, data), True
+        
+        return cls(path, data), False
+    
+    @classmethod
+    def load(cls, video_output_dir):
+        """读取输出目录中保存的清单（不检查输入文件和参数），没有或无法读取时返回None"""
+        path = os.path.join(video_output_dir, MANIFEST_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(path, data)
+    
+    @classmethod
+    def create(cls, video_output_dir, source, params):
+        """新建清单，不续传（实时分割的输入无法重新读取）；source 是输入文件路径或 "-"（标准输入）"""
+        data = {
+            "version": MANIFEST_VERSION,
+            "input": source,
+            "input_identity": None,
+            "params": params,
+            "segments": {},
+        }
+        return cls(os.path.join(video_output_dir, MANIFEST_NAME), data)
+    
+    def is_done(self, index):
+        """第 index 个片段（从1开始）已完成，且输出文件仍然存在、大小未变；跳过的片段也算完成"""
+        with self.lock:
+            record = self.data["segments"].get(str(index))
+        if record and record.get("status") == "skipped":
+            return True
+        if not record or record.get("status") != "done":
+            return False
+        try:
+            return os.path.getsize(record["path"]) == record["size"]
+        except OSError:
+            return False
+    
+    def pending(self, count):
+        """返回尚未完成的片段编号（从1开始）"""
+        return [index for index in range(1, count + 1) if not self.is_done(index)]
+    
+    def timed(self, stage):
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.stage(stage, self.data["input"])
+    
+    def record(self, index, record):
+        with self.lock:
+            self.data["segments"][str(index)] = record
+        if self.metrics is not None:
+            self.metrics.add_segment(self.data["input"], index, record)
+        self.save()
+    
+    def mark_done(self, index, output_path, start_time, end_time, seconds=None):
+        """检查输出片段并记录结果；文件缺失、损坏或时长不对时记为失败，返回是否有效
+        
+        seconds 是生成该片段所用的时间（能单独统计时）
+        """
+        expected = end_time - start_time
+        record = {"path": os.path.abspath(output_path), "start": start_time, "end": end_time}
+        if seconds is not None:
+            record["seconds"] = round(seconds, 3)
+        try:
+            size = os.path.getsize(output_path)
+            with self.timed("verify"):
+                duration = measure_duration(output_path)
+        except (OSError, subprocess.SubprocessError, ValueError):
+            size, duration = 0, None
+            valid = False
+        else:
+            valid = size > 0 and (duration is None or abs(duration - expected) <= DURATION_TOLERANCE)
+        
+        record.update({
+            "status": "done" if valid else "failed",
+            "size": size,
+            "duration": duration,
+        })
+        self.record(index, record)
+        if valid and self.on_done is not None:
+            self.on_done(index, output_path, record)
+        return valid
+    
+    def mark_cached(self, index, output_path, cached):
+        """记录从输出缓存复用的片段；cached 是生成该片段时的记录（已检查过，不再检查）"""
+        self.record(index, {
+            "path": os.path.abspath(output_path),
+            "start": cached["start"],
+            "end": cached["end"],
+            "status": "done",
+            "size": os.path.getsize(output_path),
+            "duration": cached.get("duration"),
+            "cached": True,
+        })
+    
+    def mark_packaged(self, index, output_path, start_time, end_time, byte_range=None):
+        """记录HLS播放列表中的片段（时长由复用器写入播放列表，fMP4片段不能单独检查）
+        
+        byte_range 是单文件输出中片段的 (长度, 偏移)；size 仍记录整个文件的大小，用于判断文件是否变化
+        """
+        record = {
+            "path": os.path.abspath(output_path),
+            "start": start_time,
+            "end": end_time,
+            "status": "done",
+            "size": os.path.getsize(output_path),
+            "duration": round(end_time - start_time, 6),
+        }
+        if byte_range is not None:
+            record["range"] = list(byte_range)
+        self.record(index, record)
+    
+    def done_paths(self):
+        """已完成片段的输出文件（绝对路径）"""
+        with self.lock:
+            return {record.get("path") for record in self.data.get("segments", {}).values()
+                    if record.get("status") == "done"}
+    
+    def clear(self):
+        """删除所有片段记录（整个视频重新处理）"""
+        with self.lock:
+            self.data["segments"] = {}
+    
+    def count(self):
+        """清单中记录的片段数"""
+        with self.lock:
+            return len(self.data["segments"])
+    
+    def mark_failed(self, index, start_time, end_time, seconds=None):
+        record = {"status": "failed", "start": start_time, "end": end_time}
+        if seconds is not None:
+            record["seconds"] = round(seconds, 3)
+        self.record(index, record)
+    
+    def mark_skipped(self, index, start_time, end_time):
+        """片段中没有帧（分割点之间不足一帧，或视频实际的帧比时长少），不生成输出，续传时不再处理"""
+        self.record(index, {"status": "skipped", "start": start_time, "end": end_time})
+    
+    def save(self, force=False):
+        """原子地写入清单（先写临时文件再替换）"""
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.last_save < SAVE_INTERVAL:
+                return
+            self.last_save = now
+            
+            with self.timed("write"):
+                temp_path = self.path + ".tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.data, f, ensure_ascii=False, indent=1)
+                os.replace(temp_path, self.path)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""运行统计：各阶段耗时、每个片段的耗时和大小、读写字节数
+
+阶段名称:
+    probe   获取时长、关键帧、流信息，打开视频
+    analyze 分析场景切换或静音，选择分割点
+    decode  解码（moviepy单次解码模式中读取帧和音频）
+    encode  编码；由一个FFmpeg进程完成定位/解码/编码/封装时，整个进程的时间都记在这里
+    mux     只封装不编码（无损复制、智能剪切中的复制和拼接、关闭输出文件）
+    verify  检查输出片段的时长
+    write   写入片段清单
+    thumbnail 保存封面、拼接雪碧图
+
+从输出缓存复用的片段记为 cached，不计入各阶段耗时。
+
+报告可以保存为JSON（完整内容）、CSV（每个片段一行）和Prometheus文本格式
+（供 node_exporter 的 textfile collector 读取）。
+"""
+import csv
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from .live import STDIN_SOURCE
+
+STAGES = ("probe", "analyze", "calibrate", "decode", "encode", "mux", "verify", "write",
+          "thumbnail")
+
+SEGMENT_FIELDS = ("file", "index", "status", "cached", "start", "end", "seconds", "bytes", "path")
+
+
+def write_atomic(path, write):
+    """先写入临时文件再替换，读取方不会看到写了一半的文件"""
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8", newline="") as f:
+        write(f)
+    os.replace(temp_path, path)
+
+
+def file_key(video_file):
+    """统计中视频文件的键：与片段清单相同的绝对路径，调用方传入相对路径时也能对应起来"""
+    if not video_file or video_file == STDIN_SOURCE:
+        return video_file or ""
+    return os.path.abspath(video_file)
+
+
+class RunMetrics:
+    def __init__(self, options=None):
+        self.lock = threading.Lock()
+        self.options = options
+        self.started = time.time()
+        self.start_clock = time.perf_counter()
+        self.finished_clock = None
+        # 视频文件 -> 阶段 -> 秒
+        self.stages = defaultdict(lambda: defaultdict(float))
+        # 视频文件 -> {"input_bytes", "duration"}
+        self.files = {}
+        self.segments = []
+    
+    @contextmanager
+    def stage(self, name, video_file=None):
+        """统计 with 块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start, video_file)
+    
+    def add_stage(self, name, seconds, video_file=None):
+        with self.lock:
+            self.stages[file_key(video_file)][name] += seconds
+    
+    def add_file(self, video_file, duration):
+        try:
+            size = os.path.getsize(video_file)
+        except OSError:
+            size = None
+        with self.lock:
+            self.files[file_key(video_file)] = {"input_bytes": size, "duration": duration}
+    
+    def add_segment(self, video_file, index, record):
+        """记录片段结果（片段清单中的一条记录）"""
+        with self.lock:
+            self.segments.append({
+                "file": file_key(video_file),
+                "index": index,
+                "status": record.get("status"),
+                "cached": bool(record.get("cached")),
+                "start": record.get("start"),
+                "end": record.get("end"),
+                "seconds": record.get("seconds"),
+                # 单文件HLS输出中的片段只占文件的一个字节范围
+                "bytes": record["range"][0] if "range" in record else record.get("size"),
+                "path": record.get("path"),
+            })
+    
+    def finish(self):
+        self.finished_clock = time.perf_counter()
+    
+    def totals(self):
+        with self.lock:
+            stages = defaultdict(float)
+            for file_stages in self.stages.values():
+                for name, seconds in file_stages.items():
+                    stages[name] += seconds
+            segments = list(self.segments)
+            input_bytes = sum(info["input_bytes"] or 0 for info in self.files.values())
+        
+        statuses = defaultdict(int)
+        for segment in segments:
+            statuses[segment["status"]] += 1
+        cached = [s for s in segments if s["cached"]]
+        end_clock = self.finished_clock or time.perf_counter()
+        return {
+            "run_seconds": end_clock - self.start_clock,
+            "stages": {name: stages.get(name, 0.0) for name in STAGES},
+            "segments": dict(statuses),
+            "input_bytes": input_bytes,
+            "output_bytes": sum(s["bytes"] or 0 for s in segments if s["status"] == "done"),
+            "cache_hits": len(cached),
+            "cache_bytes": sum(s["bytes"] or 0 for s in cached),
+        }
+    
+    def report(self):
+        options = None
+        if self.options is not None:
+            options = {
+                "engine": self.options.engine,
+                "mode": self.options.mode,
+                "segment_duration": self.options.segment_duration,
+                "boundaries": self.options.boundaries,
+                "quality": self.options.quality,
+                "preset": self.options.preset,
+                "workers": self.options.workers,
+            }
+        with self.lock:
+            files = [
+                dict(file=video_file, **info,
+                     stages=dict(self.stages.get(video_file, {})))
+                for video_file, info in self.files.items()
+            ]
+            segments = sorted(self.segments, key=lambda s: (s["file"], s["index"]))
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "options": options,
+            "totals": self.totals(),
+            "files": files,
+            "segments": segments,
+        }
+    
+    def write_json(self, path):
+        report = self.report()
+        write_atomic(path, lambda f: json.dump(report, f, ensure_ascii=False, indent=1))
+    
+    def write_csv(self, path):
+        segments = self.report()["segments"]
+        
+        def write(f):
+            writer = csv.DictWriter(f, fieldnames=SEGMENT_FIELDS)
+            writer.writeheader()
+            writer.writerows(segments)
+        write_atomic(path, write)
+    
+    def write_prometheus(self, path):
+        totals = self.totals()
+        lines = [
+            "# HELP splitter_stage_seconds Time spent in each stage during the last run.",
+            "# TYPE splitter_stage_seconds gauge",
+        ]
+        for name, seconds in totals["stages"].items():
+            lines.append(f'splitter_stage_seconds{{stage="{name}"}} {seconds:.6f}')
+        lines += [
+            "# HELP splitter_segments Segments processed during the last run by status.",
+            "# TYPE splitter_segments gauge",
+        ]
+        for status, count in sorted(totals["segments"].items()):
+            lines.append(f'splitter_segments{{status="{status}"}} {count}')
+        lines += [
+            "# HELP splitter_input_bytes Size of the input files of the last run.",
+            "# TYPE splitter_input_bytes gauge",
+            f"splitter_input_bytes {totals['input_bytes']}",
+            "# HELP splitter_output_bytes Size of the segments written during the last run.",
+            "# TYPE splitter_output_bytes gauge",
+            f"splitter_output_bytes {totals['output_bytes']}",
+            "# HELP splitter_cache_hits Segments reused from the output cache during the last run.",
+            "# TYPE splitter_cache_hits gauge",
+            f"splitter_cache_hits {totals['cache_hits']}",
+            "# HELP splitter_cache_bytes Size of the segments reused from the output cache.",
+            "# TYPE splitter_cache_bytes gauge",
+            f"splitter_cache_bytes {totals['cache_bytes']}",
+            "# HELP splitter_run_seconds Wall time of the last run.",
+            "# TYPE splitter_run_seconds gauge",
+            f"splitter_run_seconds {totals['run_seconds']:.6f}",
+            "# HELP splitter_last_run_timestamp_seconds Start time of the last run.",
+            "# TYPE splitter_last_run_timestamp_seconds gauge",
+            f"splitter_last_run_timestamp_seconds {self.started:.0f}",
+        ]
+        write_atomic(path, lambda f: f.write("\n".join(lines) + "\n"))
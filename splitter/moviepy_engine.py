@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""moviepy分割引擎（不需要单独安装FFmpeg）"""
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import wave
+from functools import partial
+
+import numpy as np
+from moviepy.editor import VideoFileClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+from .base import BaseSplitter, segment_filename
+from .container import parse_container
+from .frame_pipeline import FramePipeline, FramePool, PipelineAborted
+from .processes import checkpoint, kill_process, raise_if_cancelled, track
+from .thumbnails import fit_tile
+
+# 共享音频解码的采样率
+AUDIO_FPS = 44100
+
+# 单次解码模式中同时写入片段的编码线程数
+ENCODER_THREADS = 2
+
+# 复制WAV数据时每次读取的采样帧数
+AUDIO_CHUNK_FRAMES = 1 << 20
+
+
+def write_audio_slice(source, start_time, end_time, output_path):
+    """从共享解码得到的WAV中截取一段（只复制PCM数据，不重新解码）"""
+    rate = source.getframerate()
+    total = source.getnframes()
+    start = min(int(round(start_time * rate)), total)
+    end = min(int(round(end_time * rate)), total)
+    
+    source.setpos(start)
+    with wave.open(output_path, "wb") as output:
+        output.setparams(source.getparams())
+        remaining = max(end - start, 0)
+        while remaining > 0:
+            data = source.readframes(min(remaining, AUDIO_CHUNK_FRAMES))
+            if not data:
+                break
+            output.writeframes(data)
+            remaining -= min(remaining, AUDIO_CHUNK_FRAMES)
+
+
+def checkpoint_frame(get_frame, t):
+    """clip.fl 的滤镜：write_videofile 每取一帧检查一次，暂停时等待，取消时停止写入"""
+    checkpoint()
+    return get_frame(t)
+
+
+class MoviepySplitter(BaseSplitter):
+    def __init__(self, options, log=None, progress=None, status=None):
+        super().__init__(options, log, progress, status)
+        
+        # 每个工作线程各自打开的视频（moviepy的读取器不能在线程间共享）
+        self.worker_local = threading.local()
+        self.open_clips = []
+        self.clips_lock = threading.Lock()
+    
+    def create_jobs(self, video_file, file_index, total_files, output_directory):
+        filename = os.path.basename(video_file)
+        self.log(f"处理 ({file_index}/{total_files}): {filename}")
+        
+        video_output_dir, base_name = self.prepare_output(video_file, output_directory)
+        
+        # 加载视频
+        self.log(f"加载视频: {filename}")
+        with self.metrics.stage("probe", video_file):
+            duration = self.probe(video_file, "duration", self.read_duration)
+        self.log(f"视频时长: {duration:.2f}秒")
+        self.metrics.add_file(video_file, duration)
+        
+        # 计算分割数量
+        segments = self.segment_ranges(video_file, duration)
+        self.log(f"将分割为 {len(segments)} 个片段")
+        manifest = self.open_manifest(video_file, video_output_dir, segments)
+        
+        if self.options.mode == "stream":
+            # 单次解码：每个视频是一个任务
+            thumbnails = self.open_thumbnails(video_output_dir, base_name, segments)
+            if not manifest.pending(len(segments)):
+                self.finish_thumbnails(thumbnails, video_file)
+                return []
+            return [partial(
+                self.stream_video, video_file, video_output_dir, base_name, segments, manifest,
+                thumbnails
+            )]
+        
+        # 每个未完成的片段是一个独立任务
+        return [
+            partial(self.write_segment, video_file, video_output_dir, base_name,
+                    segments, index - 1, manifest)
+            for index in manifest.pending(len(segments))
+        ]
+    
+    def output_params(self, rendition=None):
+        # moviepy使用libx264的默认CRF和预设
+        return {"engine": "moviepy", "mode": self.options.mode, "codec": "libx264/aac",
+                "crf": None, "preset": "medium"}
+    
+    @staticmethod
+    def read_duration(video_file):
+        # 常见格式直接解析文件头，不需要打开读取器
+        info = parse_container(video_file)
+        if info is not None:
+            return info["duration"]
+        video = VideoFileClip(video_file)
+        duration = video.duration
+        video.close()
+        return duration
+    
+    def run_jobs(self, jobs):
+        try:
+            super().run_jobs(jobs)
+        finally:
+            self.close_worker_clips()
+    
+    def run_queue(self, *args, **kwargs):
+        try:
+            return super().run_queue(*args, **kwargs)
+        finally:
+            self.close_worker_clips()
+    
+    def get_worker_clip(self, video_file):
+        """返回当前工作线程打开的视频，同一线程处理同一视频的连续片段时复用"""
+        current = getattr(self.worker_local, "clip", None)
+        if current is not None:
+            if current[0] == video_file:
+                return current[1]
+            # 切换到下一个视频时关闭之前打开的视频
+            with self.clips_lock:
+                self.open_clips.remove(current[1])
+            current[1].close()
+        
+        with self.metrics.stage("probe", video_file):
+            video = VideoFileClip(video_file)
+        self.worker_local.clip = (video_file, video)
+        with self.clips_lock:
+            self.open_clips.append(video)
+        return video
+    
+    def close_worker_clips(self):
+        with self.clips_lock:
+            for video in self.open_clips:
+                video.close()
+            self.open_clips = []
+        self.worker_local = threading.local()
+    
+    def write_segment(self, video_file, video_output_dir, base_name, segments, j, manifest):
+        """提取并保存第 j 个片段"""
+        video = self.get_worker_clip(video_file)
+        start_time, end_time = segments[j]
+        num_segments = len(segments)
+        
+        # 提取片段；moviepy启动的编码进程不经过 run_ffmpeg，由每帧的检查响应暂停和取消
+        segment = video.subclip(start_time, end_time).fl(checkpoint_frame)
+        
+        # 保存片段
+        output_filename = segment_filename(base_name, j + 1)
+        output_path = os.path.join(video_output_dir, output_filename)
+        
+        # moviepy先把音频写入临时文件，只在成功时删除；放在输出目录中，出错或取消时由这里删除
+        temp_audio = os.path.join(video_output_dir, f".{output_filename}.audio.m4a")
+        
+        # moviepy在一次调用中完成定位、解码和编码，整体记为编码时间
+        started = time.perf_counter()
+        try:
+            with self.metrics.stage("encode", video_file):
+                segment.write_videofile(
+                    output_path,
+                    codec="libx264",
+                    audio_codec="aac",
+                    temp_audiofile=temp_audio,
+                    threads=self.options.threads,
+                    verbose=False,
+                    logger=None
+                )
+        except Exception:
+            manifest.mark_failed(j + 1, start_time, end_time, time.perf_counter() - started)
+            raise
+        finally:
+            if os.path.exists(temp_audio):
+                os.remove(temp_audio)
+        
+        seconds = time.perf_counter() - started
+        if manifest.mark_done(j + 1, output_path, start_time, end_time, seconds):
+            self.log(f"保存片段 {j+1}/{num_segments}: {output_filename}")
+        else:
+            self.log(f"警告: 片段 {j+1} 不完整: {output_filename}")
+
+    def stream_video(self, video_file, video_output_dir, base_name, segments, manifest,
+                     thumbnails=None):
+        """单次解码：按顺序读取所有帧，在分割点关闭当前输出并打开下一个片段的输出
+        
+        音频只解码一次到临时WAV文件，各片段的音频直接从中截取；
+        thumbnails 不为None时每隔取样间隔从解码的帧中取一帧缩小，已完成的片段也取样
+        """
+        with self.metrics.stage("probe", video_file):
+            video = VideoFileClip(video_file)
+        work_dir = tempfile.mkdtemp(prefix=".stream_", dir=video_output_dir)
+        num_segments = len(segments)
+        try:
+            fps = video.fps
+            total_frames = int(math.ceil(video.duration * fps - 1e-6))
+            
+            # 每个片段的第一帧；片段的实际起止时间按帧计算，保证音视频对齐
+            boundaries = [
+                min(int(math.ceil(start * fps - 1e-6)), total_frames)
+                for start, _ in segments
+            ] + [total_frames]
+            
+            audio_source = None
+            if video.audio is not None:
+                self.log("解码音频...")
+                audio_path = os.path.join(work_dir, "audio.wav")
+                with self.metrics.stage("decode", video_file):
+                    video.audio.write_audiofile(
+                        audio_path, fps=AUDIO_FPS, nbytes=2, codec="pcm_s16le",
+                        verbose=False, logger=None
+                    )
+                audio_source = wave.open(audio_path, "rb")
+            
+            self.log(f"单次解码 {total_frames} 帧 ({num_segments} 个片段)")
+            
+            # 解码在当前线程进行，编码在流水线的编码线程中进行；
+            # 相邻片段分配给不同的编码线程，缓冲区足够时可以同时编码
+            writers = {}
+            # 收到过帧（打开过输出）的片段
+            begun = set()
+            audio_lock = threading.Lock()
+            
+            def begin(segment):
+                begun.add(segment)
+                writers[segment] = self.open_stream_writer(
+                    video, segment, boundaries, fps, video_output_dir, base_name,
+                    work_dir, audio_source, audio_lock
+                )
+            
+            def write(segment, frame):
+                writer = writers[segment]
+                started = time.perf_counter()
+                writer.write_frame(frame)
+                writer.encode_seconds += time.perf_counter() - started
+            
+            def end(segment):
+                self.finish_stream_segment(writers.pop(segment), segment, boundaries, fps,
+                                           video_file, base_name, num_segments, manifest)
+            
+            width, height = video.size
+            # 解码最多领先编码 ENCODER_THREADS 个（最长的）片段，更多的缓冲区用不到
+            segment_frames = max([b - a for a, b in zip(boundaries[:-1], boundaries[1:])] + [1])
+            pool = FramePool((height, width, 3), self.options.buffer_mb * 1024 * 1024,
+                             max_frames=segment_frames * ENCODER_THREADS)
+            self.log(f"帧缓冲区: {pool.size} 帧 "
+                     f"({pool.size * pool.frame_bytes / (1024 * 1024):.0f} MB)")
+            pipeline = FramePipeline(pool, ENCODER_THREADS, begin, write, end,
+                                     start_thread=self.runner.start_thread)
+            
+            segment = 0
+            start_clock = time.monotonic()
+            frames = video.iter_frames(fps=fps, dtype="uint8")
+            decode_seconds = 0.0
+            tiles = []
+            tile_times = []
+            thumbnail_seconds = 0.0
+            try:
+                try:
+                    for i in range(total_frames):
+                        started = time.perf_counter()
+                        frame = next(frames, None)
+                        decode_seconds += time.perf_counter() - started
+                        if frame is None:
+                            break
+                        
+                        while segment + 1 < num_segments and i >= boundaries[segment + 1]:
+                            segment += 1
+                        if not manifest.is_done(segment + 1):
+                            pipeline.put(segment, frame)
+                        if (thumbnails is not None
+                                and i / fps >= len(tiles) * thumbnails.interval - 1e-6):
+                            started = time.perf_counter()
+                            tiles.append(fit_tile(frame, thumbnails.width, thumbnails.height))
+                            tile_times.append(i / fps)
+                            thumbnail_seconds += time.perf_counter() - started
+                        
+                        # 暂停时在这里等待，取消时停止解码
+                        checkpoint()
+                        # 大约每秒视频更新一次进度和速度
+                        if i % max(int(round(fps)), 1) == 0:
+                            self.runner.set_progress(i / max(total_frames, 1))
+                            elapsed = time.monotonic() - start_clock
+                            if elapsed > 0:
+                                self.runner.set_speed(i / fps / elapsed, i / elapsed)
+                except PipelineAborted:
+                    pass
+                except BaseException:
+                    pipeline.close(abort=True)
+                    raise
+                try:
+                    pipeline.close()
+                except Exception:
+                    # 编码进程因取消被终止时报告取消，而不是编码错误
+                    raise_if_cancelled()
+                    raise
+                self.skip_empty_segments(segments, begun, boundaries, fps, base_name, manifest)
+                if thumbnails is not None:
+                    started = time.perf_counter()
+                    tile_array = np.zeros((0, thumbnails.height, thumbnails.width, 3), np.uint8)
+                    if tiles:
+                        tile_array = np.stack(tiles)
+                    try:
+                        thumbnails.add_frames(tile_array, tile_times, range(1, num_segments + 1))
+                    except (OSError, ValueError) as e:
+                        self.log(f"警告: 无法保存缩略图: {str(e)}")
+                    thumbnail_seconds += time.perf_counter() - started
+            finally:
+                self.metrics.add_stage("decode", decode_seconds, video_file)
+                if thumbnails is not None:
+                    self.metrics.add_stage("thumbnail", thumbnail_seconds, video_file)
+                for writer in writers.values():
+                    self.close_stream_writer(writer, discard=True)
+                if audio_source is not None:
+                    audio_source.close()
+        finally:
+            video.close()
+            shutil.rmtree(work_dir, ignore_errors=True)
+            self.finish_thumbnails(thumbnails, video_file)
+        
+        self.log(f"完成处理: {os.path.basename(video_file)}")
+    
+    def open_stream_writer(self, video, segment, boundaries, fps, video_output_dir, base_name,
+                           work_dir, audio_source, audio_lock):
+        """为第 segment 个片段打开输出（先从共享的WAV中截取该片段的音频）"""
+        start_time = boundaries[segment] / fps
+        end_time = boundaries[segment + 1] / fps
+        
+        audio_path = None
+        ffmpeg_params = None
+        if audio_source is not None:
+            audio_path = os.path.join(work_dir, f"audio_{segment + 1:05d}.wav")
+            with audio_lock:
+                write_audio_slice(audio_source, start_time, end_time, audio_path)
+            # FFMPEG_VideoWriter 默认直接复制音频，MP4中需要编码为AAC
+            ffmpeg_params = ["-c:a", "aac"]
+        
+        output_path = os.path.join(video_output_dir, segment_filename(base_name, segment + 1))
+        writer = FFMPEG_VideoWriter(
+            output_path, video.size, fps,
+            codec="libx264",
+            audiofile=audio_path,
+            threads=max(1, self.options.threads // ENCODER_THREADS),
+            ffmpeg_params=ffmpeg_params
+        )
+        writer.audio_path = audio_path
+        # 登记编码进程：取消时立即终止，暂停时挂起（close() 之后 writer.proc 为None）
+        writer.process = writer.proc
+        writer.tracker = track(writer.process)
+        writer.started = time.perf_counter()
+        writer.encode_seconds = 0.0
+        return writer
+    
+    def skip_empty_segments(self, segments, begun, boundaries, fps, base_name, manifest):
+        """解码正常结束后，没有收到任何帧的片段记为跳过，续传时不再重试"""
+        for segment in range(len(segments)):
+            if segment in begun or manifest.is_done(segment + 1):
+                continue
+            start_time = boundaries[segment] / fps
+            end_time = boundaries[segment + 1] / fps
+            output_filename = segment_filename(base_name, segment + 1)
+            manifest.mark_skipped(segment + 1, start_time, end_time)
+            self.log(f"警告: 片段 {segment + 1} 没有帧，跳过: {output_filename} "
+                     f"(时间: {start_time:.2f}s - {end_time:.2f}s)")
+    
+    def close_stream_writer(self, writer, discard=False):
+        """等待编码器处理完剩余的帧并完成封装；discard 为真时（出错或取消后清理）忽略编码器的错误"""
+        try:
+            writer.close()
+        except OSError:
+            # 编码进程已退出（例如被取消终止），管道已断开
+            kill_process(writer.process)
+            writer.process.wait()
+            if not discard:
+                raise
+        finally:
+            if writer.tracker is not None:
+                writer.tracker.remove(writer.process)
+    
+    def finish_stream_segment(self, writer, segment, boundaries, fps, video_file, base_name,
+                              num_segments, manifest):
+        # 关闭时等待编码器处理完剩余的帧并写入音频、完成封装
+        with self.metrics.stage("mux", video_file):
+            self.close_stream_writer(writer)
+        if writer.audio_path:
+            os.remove(writer.audio_path)
+        self.metrics.add_stage("encode", writer.encode_seconds, video_file)
+        seconds = time.perf_counter() - writer.started
+        
+        start_time = boundaries[segment] / fps
+        end_time = boundaries[segment + 1] / fps
+        output_filename = segment_filename(base_name, segment + 1)
+        if manifest.mark_done(segment + 1, writer.filename, start_time, end_time, seconds):
+            self.log(f"保存片段 {segment + 1}/{num_segments}: {output_filename} "
+                     f"(时间: {start_time:.2f}s - {end_time:.2f}s)")
+        else:
+            self.log(f"警告: 片段 {segment + 1} 不完整: {output_filename}")
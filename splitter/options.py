@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""分割参数"""
+import os
+import re
+from dataclasses import dataclass
+
+# 编码质量 -> libx264 CRF
+QUALITY_CRF = {
+    "low": "28",
+    "medium": "23",
+    "high": "18",
+}
+
+# libx264 预设，从快到慢；相同CRF下越慢的预设输出越小
+PRESETS = ("ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower",
+           "veryslow")
+
+# 分割点的选择方式
+BOUNDARIES = (
+    "fixed",    # 每 segment_duration 秒一个分割点
+    "scene",    # 在场景切换处分割，片段长度在 min_segment ~ max_segment 之间
+    "silence",  # 把固定间隔的分割点移到前后 silence_window 秒内的静音处
+)
+
+# 分割引擎
+ENGINES = ("ffmpeg", "moviepy")
+
+# FFmpeg引擎的分割模式
+MODES = (
+    "per_segment",  # 每个片段启动一个FFmpeg进程
+    "single_pass",  # 解码/编码一次，由segment复用器输出所有片段
+    "copy",         # 不重新编码，分割点对齐到关键帧
+    "smart",        # 只重新编码分割点附近不完整的GOP，其余直接复制
+)
+
+# 输出格式
+OUTPUT_FORMATS = (
+    "mp4",         # 每个片段一个独立的MP4文件
+    "hls",         # HLS播放列表 + 初始化段 + 每个片段一个fMP4 (.m4s) 文件（仅FFmpeg引擎）
+    "hls_single",  # HLS播放列表 + 单个分片MP4文件，播放列表按字节范围引用各片段（仅FFmpeg引擎）
+)
+
+# moviepy引擎的分割模式
+MOVIEPY_MODES = (
+    "per_segment",  # 每个片段单独定位、提取并写入
+    "stream",       # 按顺序解码一次，在分割点切换到下一个输出文件
+)
+
+
+@dataclass
+class Rendition:
+    """多规格输出中的一种规格：解码一次，同时编码为多种分辨率/质量"""
+    name: str            # 输出子目录名，例如 720p
+    height: int = None   # 输出高度（像素），None 表示保持原分辨率；不会放大
+    crf: str = "23"      # libx264 CRF
+    maxrate: str = None  # 码率上限（例如 3M、800k），None 表示不限制
+    
+    def __post_init__(self):
+        if not self.name or re.search(r'[\\/:*?"<>|]', self.name):
+            raise ValueError(f"规格名称不能为空或包含路径字符: {self.name!r}")
+        if self.height is not None and self.height < 2:
+            raise ValueError(f"输出高度无效: {self.height}")
+        if not (self.crf.isdigit() and 0 <= int(self.crf) <= 51):
+            raise ValueError(f"CRF必须是0~51的整数: {self.crf}")
+        if self.maxrate is not None:
+            rate_bits(self.maxrate)
+
+
+def rate_bits(text):
+    """把 3M、800k、500000 这样的码率换算为每秒比特数"""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([kKmM]?)", text.strip())
+    if not match:
+        raise ValueError(f"码率格式无效: {text}")
+    scale = {"": 1, "k": 1000, "m": 1000000}[match.group(2).lower()]
+    return int(float(match.group(1)) * scale)
+
+
+def parse_rendition(text):
+    """解析命令行中的规格：名称:高度:CRF[:码率上限]，高度为空或 source 表示保持原分辨率
+    
+    例如 720p:720:23:3M、source::18
+    """
+    parts = text.split(":")
+    if not 3 <= len(parts) <= 4:
+        raise ValueError(f"规格格式应为 名称:高度:CRF[:码率上限]: {text}")
+    name, height, crf = parts[:3]
+    maxrate = parts[3] if len(parts) == 4 and parts[3] else None
+    if height in ("", "source"):
+        height = None
+    elif height.isdigit():
+        height = int(height)
+    else:
+        raise ValueError(f"输出高度无效: {height}")
+    return Rendition(name, height, crf, maxrate)
+
+
+@dataclass
+class SplitOptions:
+    segment_duration: float = 3.0  # 片段时长（秒）
+    boundaries: str = "fixed"      # 见 BOUNDARIES
+    min_segment: float = None      # 按场景分割时的最短片段（秒），默认 segment_duration 的一半
+    max_segment: float = None      # 按场景分割时的最长片段（秒），默认 segment_duration 的两倍
+    scene_threshold: float = 0.3   # 场景切换阈值（0~1），越小分割点越多
+    silence_window: float = 1.0    # 按静音分割时分割点最多移动的秒数（不超过片段长度的一半）
+    silence_db: float = -40.0      # 低于该音量（dBFS）视为静音
+    quality: str = "medium"        # low / medium / high
+    engine: str = "ffmpeg"         # ffmpeg / moviepy
+    mode: str = "per_segment"      # 见 MODES / MOVIEPY_MODES
+    output_format: str = "mp4"     # 见 OUTPUT_FORMATS
+    renditions: tuple = ()         # 多规格输出 (Rendition)：解码一次，每种规格输出到 输出目录/规格名称/ 下
+    preset: str = "fast"           # libx264 预设（FFmpeg引擎），见 PRESETS
+    target_speed: float = None     # 自动选择预设：整批编码至少达到的实时倍数（所有并行任务合计）
+    deadline: float = None         # 自动选择预设：整批编码需要在多少秒内完成
+    recalibrate: bool = False      # 忽略保存的校准结果，重新试编码
+    thumbnails: bool = False       # 在同一次解码中生成每个片段的封面和雪碧图（输出到 thumbnails/ 下）
+    thumbnail_interval: float = 2.0  # 雪碧图中缩略图的取样间隔（秒）
+    thumbnail_width: int = 160     # 缩略图宽度（像素），高度按16:9计算
+    workers: int = 1               # 并行任务数
+    resume: bool = True            # 根据输出目录中的清单跳过已完成的片段
+    buffer_mb: int = 512           # 单次解码模式中排队帧的内存上限（MB）
+    report_json: str = None        # 运行结束后保存JSON报告（各阶段耗时、每个片段）
+    report_csv: str = None         # 运行结束后保存CSV报告（每个片段一行）
+    metrics_file: str = None       # 运行结束后保存Prometheus文本格式的指标
+    probe_cache: bool = True       # 缓存视频时长、流信息和关键帧，重复处理时不再探测
+    probe_cache_path: str = None   # 探测缓存文件，默认在用户缓存目录中
+    output_cache: bool = False     # 复用之前用相同参数生成的片段，不再重新编码
+    output_cache_dir: str = None   # 输出缓存目录，默认在用户缓存目录中
+    output_cache_mb: int = 2048    # 输出缓存的总大小上限（MB），超过时删除最久未使用的片段
+    
+    def __post_init__(self):
+        if self.segment_duration <= 0:
+            raise ValueError(f"片段时长必须大于0: {self.segment_duration}")
+        if self.boundaries not in BOUNDARIES:
+            raise ValueError(f"未知的分割点选择方式: {self.boundaries}")
+        if self.min_segment is None:
+            self.min_segment = self.segment_duration / 2
+        if self.max_segment is None:
+            self.max_segment = self.segment_duration * 2
+        if not 0 < self.min_segment <= self.max_segment:
+            raise ValueError(f"片段长度范围无效: {self.min_segment} ~ {self.max_segment}")
+        if not 0 < self.scene_threshold < 1:
+            raise ValueError(f"场景切换阈值必须在0和1之间: {self.scene_threshold}")
+        if self.silence_window <= 0:
+            raise ValueError(f"静音分割点的移动范围必须大于0: {self.silence_window}")
+        if self.silence_db >= 0:
+            raise ValueError(f"静音阈值必须小于0 dBFS: {self.silence_db}")
+        if self.quality not in QUALITY_CRF:
+            raise ValueError(f"未知的编码质量: {self.quality}")
+        if self.preset not in PRESETS:
+            raise ValueError(f"未知的编码预设: {self.preset}")
+        if self.target_speed is not None and self.target_speed <= 0:
+            raise ValueError(f"目标速度必须大于0: {self.target_speed}")
+        if self.deadline is not None and self.deadline <= 0:
+            raise ValueError(f"完成时限必须大于0: {self.deadline}")
+        if self.engine not in ENGINES:
+            raise ValueError(f"未知的分割引擎: {self.engine}")
+        if self.mode not in (MODES if self.engine == "ffmpeg" else MOVIEPY_MODES):
+            raise ValueError(f"{self.engine} 引擎不支持分割模式: {self.mode}")
+        if self.preset != "fast" and self.engine != "ffmpeg":
+            raise ValueError("只有FFmpeg引擎可以选择编码预设")
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"未知的输出格式: {self.output_format}")
+        if self.output_format != "mp4" and self.engine != "ffmpeg":
+            raise ValueError(f"{self.output_format} 输出只支持FFmpeg引擎")
+        if self.output_format != "mp4" and self.mode == "copy" and self.boundaries != "fixed":
+            raise ValueError("HLS输出的无损复制模式只支持固定间隔的分割点")
+        self.renditions = tuple(self.renditions)
+        if self.renditions:
+            if self.engine != "ffmpeg" or self.mode not in ("per_segment", "single_pass"):
+                raise ValueError("多规格输出只支持FFmpeg引擎的逐段编码和单次编码模式")
+            if self.output_format != "mp4":
+                raise ValueError("多规格输出只支持MP4片段输出")
+            names = [rendition.name for rendition in self.renditions]
+            if len(set(names)) != len(names):
+                raise ValueError(f"规格名称重复: {', '.join(names)}")
+        if self.auto_tune:
+            if self.engine != "ffmpeg" or self.mode not in ("per_segment", "single_pass"):
+                raise ValueError("自动选择预设只支持FFmpeg引擎的逐段编码和单次编码模式")
+            if self.renditions:
+                raise ValueError("多规格输出不支持自动选择预设")
+        if self.thumbnails:
+            if self.mode in ("copy", "smart"):
+                raise ValueError("无损复制和智能剪切模式不解码视频，不能在同一次解码中生成缩略图")
+            if self.engine == "moviepy" and self.mode != "stream":
+                raise ValueError("moviepy引擎只有单次解码 (stream) 模式支持生成缩略图")
+        if self.thumbnail_interval <= 0:
+            raise ValueError(f"缩略图取样间隔必须大于0: {self.thumbnail_interval}")
+        if self.thumbnail_width < 16:
+            raise ValueError(f"缩略图宽度至少为16: {self.thumbnail_width}")
+        if self.workers < 1:
+            raise ValueError(f"并行任务数必须至少为1: {self.workers}")
+        if self.buffer_mb <= 0:
+            raise ValueError(f"帧缓冲区内存上限必须大于0: {self.buffer_mb}")
+        if self.output_cache_mb <= 0:
+            raise ValueError(f"输出缓存大小上限必须大于0: {self.output_cache_mb}")
+    
+    @property
+    def auto_tune(self):
+        """按目标速度或完成时限自动选择预设"""
+        return self.target_speed is not None or self.deadline is not None
+    
+    @property
+    def crf(self):
+        return QUALITY_CRF[self.quality]
+    
+    @property
+    def threads(self):
+        """把CPU核心平均分配给并行任务，作为每个编码进程的线程数"""
+        return max(1, (os.cpu_count() or 1) // self.workers)
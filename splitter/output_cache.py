@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""输出缓存：保存已生成的片段，用相同参数再次分割同一视频时直接复用，不再重新编码
+
+缓存项以 (输入内容, 片段起止时间, 引擎, 模式, 编码器, CRF, 预设) 的哈希为键。
+片段文件保存在缓存目录中，复用时优先建立硬链接（不占用额外空间），
+不在同一文件系统上时复制。缓存文件总大小超过上限时删除最久未使用的片段。
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from .probe_cache import sample_hash, user_cache_dir
+
+CACHE_DIR_NAME = "segments"
+INDEX_NAME = "index.sqlite"
+
+# 缓存片段的默认总大小上限（MB）
+DEFAULT_MAX_MB = 2048
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    key TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_last_used ON segments (last_used);
+"""
+
+
+def content_id(video_file):
+    """输入视频的内容标识（大小和抽样哈希），与文件路径无关，移动或重命名后不变"""
+    size = os.path.getsize(video_file)
+    return f"{size}:{sample_hash(video_file, size)}"
+
+
+def segment_key(input_id, start_time, end_time, params):
+    """片段的缓存键"""
+    text = json.dumps([input_id, round(start_time, 6), round(end_time, 6), params],
+                      sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def link_or_copy(source, destination):
+    """在 destination 建立 source 的硬链接，不支持时复制；先写入临时文件再替换"""
+    temp_path = destination + ".part"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(source, temp_path)
+        linked = True
+    except OSError:
+        shutil.copyfile(source, temp_path)
+        linked = False
+    os.replace(temp_path, destination)
+    return linked
+
+
+class OutputCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        
+        os.makedirs(directory, exist_ok=True)
+        # 多个工作线程共用一个连接，由 self.lock 串行化
+        self.connection = sqlite3.connect(
+            os.path.join(directory, INDEX_NAME), timeout=30, check_same_thread=False
+        )
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+    
+    @classmethod
+    def open(cls, directory=None, max_mb=DEFAULT_MAX_MB):
+        """打开缓存，directory 为 None 时使用用户缓存目录"""
+        return cls(directory or os.path.join(user_cache_dir(), CACHE_DIR_NAME),
+                   max_mb * 1024 * 1024)
+    
+    def close(self):
+        with self.lock:
+            self.connection.close()
+    
+    def file_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".mp4")
+    
+    def restore(self, key, output_path):
+        """把缓存的片段放到 output_path，返回生成时记录的片段信息；没有缓存时返回None
+        
+        缓存文件被删除或修改（大小、修改时间变化）时删除该缓存项
+        """
+        path = self.file_path(key)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT bytes, mtime_ns, record FROM segments WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                stat = os.stat(path)
+                valid = (stat.st_size, stat.st_mtime_ns) == tuple(row[:2])
+            except OSError:
+                valid = False
+            if not valid:
+                with self.connection:
+                    self.connection.execute("DELETE FROM segments WHERE key = ?", (key,))
+                return None
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE segments SET last_used = ? WHERE key = ?", (time.time(), key)
+                )
+        
+        link_or_copy(path, output_path)
+        return json.loads(row[2])
+    
+    def store(self, key, output_path, record):
+        """把刚生成的片段加入缓存（硬链接或复制），record 是片段清单中的记录"""
+        path = self.file_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        link_or_copy(output_path, path)
+        stat = os.stat(path)
+        text = json.dumps(record, separators=(",", ":"))
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO segments (key, bytes, mtime_ns, record, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, stat.st_size, stat.st_mtime_ns, text, time.time())
+            )
+            self.evict()
+    
+    def evict(self):
+        """删除最久未使用的片段，直到总大小不超过上限（调用时已持有锁）"""
+        total = self.connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM segments").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.connection.execute("SELECT key, bytes FROM segments ORDER BY last_used")
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self.connection.executemany("DELETE FROM segments WHERE key = ?", doomed)
+        for (key,) in doomed:
+            try:
+                os.remove(self.file_path(key))
+            except OSError:
+                pass
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""读取视频信息：MP4/MOV/Matroska/WebM 直接解析文件头，其他格式使用FFprobe"""
+import subprocess
+
+from .container import parse_container
+
+
+def probe_duration(video_file):
+    """获取视频时长（秒）"""
+    info = parse_container(video_file)
+    if info is not None:
+        return info["duration"]
+    
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", 
+          "default=noprint_wrappers=1:nokey=1", video_file]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+
+def probe_keyframes(video_file):
+    """建立视频关键帧索引，返回排序后的时间列表
+    
+    优先使用文件头中的索引（MP4的stss、Matroska的Cues），否则用FFprobe读取数据包（不解码）
+    """
+    info = parse_container(video_file)
+    if info is not None and info["keyframes"]:
+        return info["keyframes"]
+    
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_file
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(",")
+        if len(parts) < 2 or "K" not in parts[1]:
+            continue
+        try:
+            keyframes.append(float(parts[0]))
+        except ValueError:
+            continue  # pts_time 为 N/A
+    
+    # 数据包按解码顺序输出（B帧），需要重新排序
+    keyframes.sort()
+    return keyframes
+
+
+def probe_video_stream(video_file):
+    """读取第一个视频流的编码格式和像素格式"""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,pix_fmt",
+        "-of", "default=noprint_wrappers=1", video_file
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    
+    info = {}
+    for line in result.stdout.splitlines():
+        key, _, value = line.partition("=")
+        if key:
+            info[key.strip()] = value.strip()
+    return info
+
+
+def probe_resolution(video_file):
+    """第一个视频流的 [宽, 高]"""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height", "-of", "csv=p=0", video_file
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    width, height = result.stdout.strip().split(",")[:2]
+    return [int(width), int(height)]
+
+
+def probe_streams(video_file):
+    """返回流列表 [{"type": "video"/"audio"/..., "codec": 编码名称}]"""
+    info = parse_container(video_file)
+    if info is not None:
+        return info["streams"]
+    
+    cmd = [
+        "ffprobe", "-v", "error", "-show_entries", "stream=codec_type,codec_name",
+        "-of", "csv=p=0", video_file
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    
+    streams = []
+    for line in result.stdout.splitlines():
+        codec, _, codec_type = line.strip().partition(",")
+        if codec_type:
+            streams.append({"type": codec_type, "codec": codec})
+    return streams
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""持久化的视频信息缓存（SQLite），重复处理同一批文件时不再运行FFprobe
+
+缓存项以文件路径、大小、修改时间和抽样内容哈希为键，保存时长、流信息、关键帧等探测结果。
+文件被修改（大小、修改时间或抽样内容变化）后旧的缓存项自动失效；文件被移动或重命名后
+仍能按大小和抽样哈希找到原来的缓存项。缓存总大小超过上限时删除最久未使用的项。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_NAME = "probe_cache.sqlite"
+
+# 缓存数据的默认大小上限（字节）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# 抽样哈希：读取文件开头、中间和结尾各一块
+SAMPLE_SIZE = 64 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sample_hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS probes_content ON probes (size, sample_hash);
+CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used);
+"""
+
+
+def user_cache_dir():
+    """本程序的用户缓存目录（Windows: %LOCALAPPDATA%，其他系统: $XDG_CACHE_HOME 或 ~/.cache）"""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "video_splitter")
+
+
+def sample_hash(path, size):
+    """读取文件开头、中间和结尾各 SAMPLE_SIZE 字节计算哈希，不读取整个文件"""
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    offsets = sorted({0, max(size // 2 - SAMPLE_SIZE // 2, 0), max(size - SAMPLE_SIZE, 0)})
+    with open(path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+class ProbeCache:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # 每个文件只计算一次抽样哈希
+        self.identities = {}
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 多个工作线程共用一个连接，由 self.lock 串行化
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # 预写日志：每次提交不需要同步整个数据库文件，导入上万个文件时每个文件一次提交也很快
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        # 缓存数据的总大小，保存时增减，不必每次重新统计
+        self.total_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM probes"
+        ).fetchone()[0]
+    
+    @classmethod
+    def open(cls, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        """打开缓存，path 为 None 时使用用户缓存目录"""
+        return cls(path or os.path.join(user_cache_dir(), CACHE_NAME), max_bytes)
+    
+    def close(self):
+        with self.lock:
+            self.connection.close()
+    
+    def identity(self, video_file):
+        """(绝对路径, 大小, 修改时间, 抽样哈希)"""
+        path = os.path.abspath(video_file)
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            digest = self.identities.get(key)
+        if digest is None:
+            digest = sample_hash(path, stat.st_size)
+            with self.lock:
+                self.identities[key] = digest
+        return key + (digest,)
+    
+    def load(self, identity):
+        """读取文件的缓存数据，返回 (字典, 是否按路径命中)
+        
+        路径不匹配时按大小和抽样哈希查找（文件被移动或重命名）
+        """
+        path, size, mtime_ns, digest = identity
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size, mtime_ns, sample_hash, data FROM probes WHERE path = ?", (path,)
+            ).fetchone()
+            exact = row is not None and tuple(row[:3]) == (size, mtime_ns, digest)
+            if not exact:
+                row = self.connection.execute(
+                    "SELECT size, mtime_ns, sample_hash, data FROM probes "
+                    "WHERE size = ? AND sample_hash = ? ORDER BY last_used DESC LIMIT 1",
+                    (size, digest)
+                ).fetchone()
+        if row is None:
+            return {}, False
+        try:
+            return json.loads(row[3]), exact
+        except ValueError:
+            return {}, False
+    
+    def store(self, identity, data):
+        path, size, mtime_ns, digest = identity
+        text = json.dumps(data, separators=(",", ":"))
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT bytes FROM probes WHERE path = ?", (path,)
+            ).fetchone()
+            self.total_bytes += len(text) - (row[0] if row else 0)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO probes "
+                "(path, size, mtime_ns, sample_hash, data, bytes, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, digest, text, len(text), time.time())
+            )
+            self.evict()
+    
+    def evict(self):
+        """删除最久未使用的项，直到总大小不超过上限（调用时已持有锁）"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        rows = self.connection.execute("SELECT path, bytes FROM probes ORDER BY last_used")
+        doomed = []
+        for path, size in rows:
+            if self.total_bytes <= self.max_bytes:
+                break
+            doomed.append((path,))
+            self.total_bytes -= size
+        self.connection.executemany("DELETE FROM probes WHERE path = ?", doomed)
+    
+    def get(self, video_file, name, probe):
+        """返回缓存的 name 信息；没有时调用 probe(video_file) 并保存结果"""
+        identity = self.identity(video_file)
+        data, exact = self.load(identity)
+        if name in data:
+            if exact:
+                with self.lock, self.connection:
+                    self.connection.execute(
+                        "UPDATE probes SET last_used = ? WHERE path = ?",
+                        (time.time(), identity[0])
+                    )
+            else:
+                # 移动或重命名后的文件：以新的路径保存
+                self.store(identity, data)
+            return data[name]
+        
+        value = probe(video_file)
+        # 重新读取，合并其他线程同时保存的信息
+        data, _ = self.load(identity)
+        data[name] = value
+        self.store(identity, data)
+        return value
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""跟踪任务启动的子进程：取消时立即终止，暂停时挂起，继续时恢复
+
+任务在 ProcessTracker.task(tag) 中运行（JobRunner 为每个任务设置），启动FFmpeg的地方用
+tracked(process) 登记进程；不在任务中运行时（例如直接调用分析函数）这些调用不做任何事。
+tag 标识一组任务（例如队列中的一个视频），可以单独取消。
+
+暂停时POSIX系统发送 SIGSTOP/SIGCONT，Windows调用 NtSuspendProcess/NtResumeProcess，
+正在编码的FFmpeg立即停下，继续后从原处接着编码；没有子进程的计算（moviepy的解码循环）
+在 checkpoint() 处等待。moviepy 自己启动的编码进程：单次解码模式中用 track() 登记，
+逐段写入模式中每取一帧调用一次 checkpoint()。
+"""
+import ctypes
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+# 暂停时检查是否被取消的间隔（秒）
+CHECK_INTERVAL = 0.2
+
+# 当前线程所在任务的跟踪器和标签
+context = threading.local()
+
+
+class Cancelled(Exception):
+    """任务被取消"""
+    
+    def __init__(self, message="已取消"):
+        super().__init__(message)
+
+
+def kill_process(process):
+    try:
+        process.kill()
+    except OSError:
+        pass  # 已经结束
+
+
+def suspend_process(process):
+    try:
+        if os.name == "nt":
+            ctypes.windll.ntdll.NtSuspendProcess(int(process._handle))
+        else:
+            process.send_signal(signal.SIGSTOP)
+    except OSError:
+        pass
+
+
+def resume_process(process):
+    try:
+        if os.name == "nt":
+            ctypes.windll.ntdll.NtResumeProcess(int(process._handle))
+        else:
+            process.send_signal(signal.SIGCONT)
+    except OSError:
+        pass
+
+
+class ProcessTracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # 正在运行的子进程 -> 所属任务的标签
+        self.processes = {}
+        self.cancelled = set()
+        self.cancelled_all = False
+        # 未暂停时设置
+        self.running = threading.Event()
+        self.running.set()
+        # 已结束的暂停的总时长，以及当前暂停开始的时间
+        self.paused_total = 0.0
+        self.paused_since = None
+    
+    @contextmanager
+    def task(self, tag=None):
+        """在 with 块中运行的代码（和它启动的辅助线程）属于标签为 tag 的任务"""
+        previous = getattr(context, "tracker", None), getattr(context, "tag", None)
+        context.tracker, context.tag = self, tag
+        try:
+            yield
+        finally:
+            context.tracker, context.tag = previous
+    
+    @property
+    def paused(self):
+        return not self.running.is_set()
+    
+    def paused_seconds(self):
+        """累计暂停的时间（秒），包括正在进行的暂停"""
+        with self.lock:
+            current = time.monotonic() - self.paused_since if self.paused_since else 0.0
+            return self.paused_total + current
+    
+    def is_cancelled(self, tag=None):
+        with self.lock:
+            return self.cancelled_all or (tag is not None and tag in self.cancelled)
+    
+    def cancel(self, tag=None):
+        """取消标签为 tag 的任务（None 表示所有任务），立即终止它们正在运行的子进程"""
+        with self.lock:
+            if tag is None:
+                self.cancelled_all = True
+            else:
+                self.cancelled.add(tag)
+            victims = [process for process, owner in self.processes.items()
+                       if tag is None or owner == tag]
+        for process in victims:
+            kill_process(process)
+    
+    def forget(self, tag):
+        """标签为 tag 的任务都已结束，不再记录其取消状态"""
+        with self.lock:
+            self.cancelled.discard(tag)
+    
+    def pause(self):
+        with self.lock:
+            if self.paused_since is None:
+                self.paused_since = time.monotonic()
+            self.running.clear()
+            processes = list(self.processes)
+        for process in processes:
+            suspend_process(process)
+    
+    def resume(self):
+        with self.lock:
+            if self.paused_since is not None:
+                self.paused_total += time.monotonic() - self.paused_since
+                self.paused_since = None
+            self.running.set()
+            processes = list(self.processes)
+        for process in processes:
+            resume_process(process)
+    
+    def add(self, process, tag):
+        with self.lock:
+            self.processes[process] = tag
+            cancelled = self.cancelled_all or (tag is not None and tag in self.cancelled)
+            paused = not self.running.is_set()
+        # 登记之前任务可能已被取消或暂停
+        if cancelled:
+            kill_process(process)
+        elif paused:
+            suspend_process(process)
+    
+    def remove(self, process):
+        with self.lock:
+            self.processes.pop(process, None)
+    
+    def checkpoint(self, tag):
+        """暂停时等待继续；任务已被取消时抛出 Cancelled"""
+        while not self.running.wait(CHECK_INTERVAL):
+            if self.is_cancelled(tag):
+                break
+        if self.is_cancelled(tag):
+            raise Cancelled()
+
+
+def track(process):
+    """在当前任务中登记子进程，返回跟踪器（不在任务中时返回None），进程退出后调用其 remove
+    
+    用于不在一个 with 块中结束的进程（例如 moviepy 的 FFMPEG_VideoWriter）
+    """
+    tracker = getattr(context, "tracker", None)
+    if tracker is not None:
+        tracker.add(process, context.tag)
+    return tracker
+
+
+@contextmanager
+def tracked(process):
+    """在当前任务中登记子进程，with 块结束（进程已退出）时注销"""
+    tracker = track(process)
+    try:
+        yield process
+    finally:
+        if tracker is not None:
+            tracker.remove(process)
+
+
+def checkpoint():
+    """在当前任务中：暂停时等待继续，已被取消时抛出 Cancelled"""
+    tracker = getattr(context, "tracker", None)
+    if tracker is not None:
+        tracker.checkpoint(context.tag)
+
+
+def paused_seconds():
+    """当前任务所在跟踪器累计暂停的时间（秒），用于从测量的用时中扣除；不在任务中时为0"""
+    tracker = getattr(context, "tracker", None)
+    return tracker.paused_seconds() if tracker is not None else 0.0
+
+
+def raise_if_cancelled():
+    """子进程退出后调用：进程是因为任务被取消而终止时抛出 Cancelled"""
+    tracker = getattr(context, "tracker", None)
+    if tracker is not None and tracker.is_cancelled(context.tag):
+        raise Cancelled()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""并行任务运行器：线程池、按任务顺序输出的日志和总进度"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .processes import Cancelled, ProcessTracker, context
+
+# 状态信息（速度、剩余时间）的最短更新间隔（秒）
+STATUS_INTERVAL = 0.5
+
+
+def print_log(line):
+    print(line, end="", flush=True)
+
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class JobRunner:
+    def __init__(self, workers=1, log=None, progress=None, status=None):
+        """log 接收带时间戳和换行的一行日志，progress 接收 0~1 的总进度，
+        status 接收一行状态文字（速度、剩余时间）；三者都会从工作线程调用
+        """
+        self.workers = workers
+        self.log_callback = log or print_log
+        self.progress_callback = progress
+        self.status_callback = status
+        
+        self.local = threading.local()
+        # 未完成的任务的进度：任务编号 -> 完成比例；完成的任务只计数，
+        # 监视目录和队列模式下运行器一直存在，不能为每个任务保留一项
+        self.job_progress = {}
+        self.finished_jobs = 0
+        self.next_index = 0
+        self.progress_lock = threading.Lock()
+        self.pool = None
+        self.futures = deque()
+        self.submit_lock = threading.Lock()
+        # 任务启动的子进程，用于取消和暂停
+        self.tracker = ProcessTracker()
+        
+        # 正在运行的任务的编码速度：任务编号 -> (实时倍速, fps)
+        self.job_speed = {}
+        self.speed_lock = threading.Lock()
+        self.start_time = time.monotonic()
+        self.last_status = 0.0
+    
+    def log(self, message):
+        """输出一条日志；并行任务中的消息先缓存，按任务顺序输出"""
+        timestamp = time.strftime("%H:%M:%S", time.localtime())
+        line = f"[{timestamp}] {message}\n"
+        
+        buffer = getattr(self.local, "buffer", None)
+        if buffer is not None:
+            buffer.append(line)
+            return
+        self.log_callback(line)
+    
+    def run(self, jobs):
+        """在线程池中并行运行任务，按提交顺序输出各任务的日志；有任务出错时在最后抛出第一个错误"""
+        self.clear_progress()
+        
+        self.start()
+        try:
+            self.submit(jobs)
+        finally:
+            errors = self.stop()
+        if errors:
+            raise errors[0]
+    
+    def start(self):
+        """启动线程池，之后可以随时用 submit 添加任务（例如监视目录时陆续发现的新文件）"""
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.futures = deque()
+    
+    def submit(self, jobs, tag=None):
+        """把任务加入线程池，不等待完成；可以在工作线程中调用（任务再提交后续任务）
+        
+        tag 标识任务所属的组（例如队列中的一个视频），可以用 tracker.cancel(tag) 单独取消
+        """
+        with self.submit_lock:
+            for job in jobs:
+                index = self.next_index
+                self.next_index += 1
+                with self.progress_lock:
+                    self.job_progress[index] = 0.0
+                self.futures.append(self.pool.submit(self.run_job, index, job, tag))
+    
+    def run_job(self, index, job, tag=None):
+        self.local.index = index
+        self.local.buffer = []
+        error = None
+        try:
+            with self.tracker.task(tag):
+                self.tracker.checkpoint(tag)
+                job()
+        except Cancelled as e:
+            self.log(str(e))
+            error = e
+        except Exception as e:
+            self.log(f"错误: {str(e)}")
+            error = e
+        finally:
+            lines = self.local.buffer
+            self.local.buffer = None
+            self.finish_progress(index)
+            with self.speed_lock:
+                self.job_speed.pop(index, None)
+            self.local.index = None
+        return lines, error
+    
+    def collect(self, wait=False):
+        """按提交顺序输出已完成任务的日志，返回其中出错任务的异常列表
+        
+        前面的任务未完成时，后面已完成任务的日志先保留；wait 为 True 时等待所有任务完成
+        """
+        errors = []
+        while True:
+            with self.submit_lock:
+                if not self.futures or not (wait or self.futures[0].done()):
+                    return errors
+                future = self.futures.popleft()
+            lines, error = future.result()
+            for line in lines:
+                self.log_callback(line)
+            if error is not None:
+                errors.append(error)
+    
+    def idle(self):
+        """所有已提交的任务都已完成并输出了日志"""
+        with self.submit_lock:
+            return not self.futures
+    
+    def reset_progress(self):
+        """空闲时清空各任务的进度，下一批任务的总进度从0开始"""
+        with self.submit_lock:
+            if not self.futures:
+                self.clear_progress()
+    
+    def clear_progress(self):
+        with self.progress_lock:
+            self.job_progress = {}
+            self.finished_jobs = 0
+        self.start_time = time.monotonic()
+    
+    def stop(self):
+        """等待所有任务完成并关闭线程池，返回出错任务的异常列表"""
+        errors = self.collect(wait=True)
+        self.pool.shutdown(wait=True)
+        return errors
+    
+    def start_thread(self, target, *args):
+        """在当前任务中启动辅助线程；线程中的日志和进度仍归属于当前任务"""
+        index = getattr(self.local, "index", None)
+        buffer = getattr(self.local, "buffer", None)
+        tag = getattr(context, "tag", None)
+        
+        def run():
+            self.local.index = index
+            self.local.buffer = buffer
+            with self.tracker.task(tag):
+                target(*args)
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+    
+    def set_progress(self, fraction):
+        """记录当前任务的完成比例，并更新总进度"""
+        index = getattr(self.local, "index", None)
+        if index is None:
+            return
+        with self.progress_lock:
+            # 任务完成后其辅助线程可能还会更新进度，忽略
+            if index not in self.job_progress:
+                return
+            self.job_progress[index] = fraction
+        self.emit_progress()
+    
+    def finish_progress(self, index):
+        """任务完成：不再保留它的进度，只计入完成的任务数"""
+        with self.progress_lock:
+            if self.job_progress.pop(index, None) is None:
+                return
+            self.finished_jobs += 1
+        self.emit_progress()
+    
+    def emit_progress(self):
+        if self.progress_callback is not None:
+            self.progress_callback(self.overall_progress())
+        self.emit_status()
+    
+    def overall_progress(self):
+        with self.progress_lock:
+            total = self.finished_jobs + len(self.job_progress)
+            if not total:
+                return 0.0
+            return (self.finished_jobs + sum(self.job_progress.values())) / total
+    
+    def set_speed(self, speed, fps=None):
+        """记录当前任务的编码速度（实时倍速，例如FFmpeg进度中的 speed=2.5x）"""
+        index = getattr(self.local, "index", None)
+        if index is None:
+            return
+        with self.speed_lock:
+            self.job_speed[index] = (speed, fps)
+        self.emit_status()
+    
+    def status_text(self):
+        """总速度（所有正在运行的任务之和）、帧率和按总进度估算的剩余时间"""
+        with self.speed_lock:
+            speeds = list(self.job_speed.values())
+        
+        parts = []
+        realtime = [speed for speed, _ in speeds if speed is not None]
+        if realtime:
+            parts.append(f"速度 {sum(realtime):.2f}x")
+        fps = [value for _, value in speeds if value is not None]
+        if fps:
+            parts.append(f"{sum(fps):.0f} fps")
+        
+        progress = self.overall_progress()
+        if 0 < progress < 1:
+            elapsed = time.monotonic() - self.start_time
+            parts.append(f"剩余 {format_eta(elapsed * (1 - progress) / progress)}")
+        return " · ".join(parts)
+    
+    def emit_status(self):
+        if self.status_callback is None:
+            return
+        now = time.monotonic()
+        if now - self.last_status < STATUS_INTERVAL:
+            return
+        self.last_status = now
+        self.status_callback(self.status_text())
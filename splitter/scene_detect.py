@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""场景切换检测：FFmpeg把视频缩小为很小的灰度图像，通过管道按批读入numpy计算相邻帧的差异
+
+每一帧的分数是两个指标的平均值（都在0~1之间）：
+    像素差   与前一帧逐像素差的平均绝对值
+    直方图差 与前一帧亮度直方图（16级）的差异（总变差距离）
+只有运动时像素差较大而直方图变化不大，镜头切换时两者都会突然变大。
+
+分割点放在分数超过阈值的位置，并满足片段长度的上下限：
+两个场景切换太近时跳过后一个；超过上限仍没有场景切换时，在允许范围内分数最高的位置切分。
+"""
+import math
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+from .processes import raise_if_cancelled, tracked
+
+# 分析用的图像大小和帧率；分割点的精度为 1 / ANALYSIS_FPS 秒
+ANALYSIS_WIDTH = 64
+ANALYSIS_HEIGHT = 36
+ANALYSIS_FPS = 25
+
+# 每次从管道读取并计算的帧数
+BATCH_FRAMES = 1024
+
+# 亮度直方图：灰度值右移 HISTOGRAM_SHIFT 位，得到 HISTOGRAM_BINS 级
+HISTOGRAM_SHIFT = 4
+HISTOGRAM_BINS = 256 >> HISTOGRAM_SHIFT
+
+
+def ffmpeg_executable():
+    """系统PATH中的FFmpeg；没有时使用moviepy附带的FFmpeg"""
+    if shutil.which("ffmpeg"):
+        return "ffmpeg"
+    try:
+        from moviepy.config import get_setting
+    except ImportError:
+        return "ffmpeg"
+    return get_setting("FFMPEG_BINARY")
+
+
+def read_batch(stream, buffer):
+    """从管道读取最多 len(buffer) 帧到 buffer 中，返回读到的完整帧数"""
+    view = memoryview(buffer).cast("B")
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled // buffer[0].nbytes
+
+
+def frame_scores(frames, previous):
+    """计算一批帧 (n, 高, 宽) 与各自前一帧相比的分数，previous 是上一批的最后一帧（没有时为None）"""
+    count = len(frames)
+    pixels = frames[0].size
+    
+    # 逐像素差：只有一帧时没有可比较的帧
+    if previous is None:
+        before = np.concatenate([frames[:1], frames[:-1]])
+    else:
+        before = np.concatenate([previous[None], frames[:-1]])
+    pixel_diff = np.abs(frames.astype(np.int16) - before).reshape(count, -1).mean(axis=1) / 255.0
+    
+    # 所有帧的直方图用一次 bincount 计算：第 i 帧的级数加上 i * HISTOGRAM_BINS
+    levels = (frames >> HISTOGRAM_SHIFT).reshape(count, -1).astype(np.int64)
+    levels += np.arange(count)[:, None] * HISTOGRAM_BINS
+    histograms = np.bincount(levels.ravel(), minlength=count * HISTOGRAM_BINS)
+    histograms = histograms.reshape(count, HISTOGRAM_BINS) / pixels
+    if previous is None:
+        previous_histogram = histograms[:1]
+    else:
+        previous_histogram = np.bincount(
+            previous.ravel() >> HISTOGRAM_SHIFT, minlength=HISTOGRAM_BINS
+        )[None] / pixels
+    before_histograms = np.concatenate([previous_histogram, histograms[:-1]])
+    histogram_diff = np.abs(histograms - before_histograms).sum(axis=1) / 2
+    
+    return (pixel_diff + histogram_diff) / 2
+
+
+def analyze_scenes(video_file):
+    """返回每个分析帧（间隔 1 / ANALYSIS_FPS 秒）相对前一帧的分数数组，第一帧为0"""
+    cmd = [
+        ffmpeg_executable(), "-v", "error", "-nostdin",
+        # 分析不需要精确的画面，跳过H.264/HEVC的环路滤波可以明显加快解码
+        "-skip_loop_filter", "all", "-i", video_file, "-an", "-sn", "-dn",
+        "-vf", f"fps={ANALYSIS_FPS},scale={ANALYSIS_WIDTH}:{ANALYSIS_HEIGHT}:flags=fast_bilinear",
+        "-pix_fmt", "gray", "-f", "rawvideo", "-"
+    ]
+    buffer = np.empty((BATCH_FRAMES, ANALYSIS_HEIGHT, ANALYSIS_WIDTH), dtype=np.uint8)
+    scores = []
+    previous = None
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        with tracked(process):
+            try:
+                while True:
+                    count = read_batch(process.stdout, buffer)
+                    if count == 0:
+                        break
+                    frames = buffer[:count]
+                    scores.append(frame_scores(frames, previous))
+                    previous = frames[-1].copy()
+            finally:
+                process.stdout.close()
+                returncode = process.wait()
+        # 被取消时不能把不完整的结果当作分析结果（会保存到探测缓存中）
+        raise_if_cancelled()
+        if returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode("utf-8", "replace").strip()
+            raise RuntimeError(f"场景分析失败: {message[-300:]}")
+    
+    if not scores:
+        return np.zeros(0)
+    scores = np.concatenate(scores)
+    scores[0] = 0.0
+    return scores
+
+
+def choose_cuts(scores, duration, threshold, min_length, max_length, target_length):
+    """按分数选择分割点，返回时间列表
+    
+    没有场景切换的画面（分数都很低）超过 max_length 时，按 target_length 切分
+    """
+    fps = ANALYSIS_FPS
+    target_length = min(max(target_length, min_length), max_length)
+    last_frame = len(scores) - 1
+    
+    def forced_cut(last):
+        """last 之后第一个必须切分的位置：允许范围内分数最高的帧"""
+        low = int(math.ceil((last + min_length) * fps))
+        high = int(math.floor((last + max_length) * fps))
+        # 尽量让最后一个片段也不短于 min_length
+        tail_limit = int(math.floor((duration - min_length) * fps))
+        if tail_limit >= low:
+            high = min(high, tail_limit)
+        high = min(high, last_frame)
+        if low > high:
+            return min(last + target_length, duration)
+        best = low + int(np.argmax(scores[low:high + 1]))
+        if scores[best] < threshold / 4:
+            return min(last + target_length, duration)
+        return best / fps
+    
+    cuts = []
+    last = 0.0
+    for frame in np.flatnonzero(scores >= threshold):
+        time = frame / fps
+        while time - last > max_length:
+            last = forced_cut(last)
+            cuts.append(last)
+        if time - last >= min_length and duration - time >= min_length:
+            cuts.append(time)
+            last = time
+    while duration - last > max_length:
+        last = forced_cut(last)
+        cuts.append(last)
+    return [round(cut, 6) for cut in cuts if 0 < cut < duration]
+
+
+def detect_scene_cuts(video_file, duration, threshold, min_length, max_length, target_length):
+    """分析视频并返回场景分割点（秒）"""
+    scores = analyze_scenes(video_file)
+    return choose_cuts(scores, duration, threshold, min_length, max_length, target_length)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""静音检测：FFmpeg把音轨解码为低采样率的单声道PCM，按块读入numpy计算短窗口的RMS
+
+每个名义分割点只需要其前后 tolerance 秒内的窗口，读到分割点之后的 tolerance 秒时就确定该分割点，
+不保存整条音轨的数据，几个小时的录音也只占用固定的内存。
+
+分割点移到容差范围内离名义位置最近的静音窗口（RMS低于阈值，且前后 SILENCE_MARGIN 个窗口也是静音）；
+范围内没有静音时保持名义位置。
+"""
+import subprocess
+import tempfile
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .processes import raise_if_cancelled, tracked
+from .scene_detect import ffmpeg_executable
+
+# 分析用的采样率和窗口长度
+ANALYSIS_RATE = 8000
+WINDOW_SAMPLES = 160  # 20毫秒
+
+# 分割点前后至少各有这么多个静音窗口（40毫秒），不会紧贴在声音的开头或结尾
+SILENCE_MARGIN = 2
+
+# 每次从管道读取的采样数（30秒）
+CHUNK_SAMPLES = ANALYSIS_RATE * 30
+
+# 16位PCM的满幅值，用于把阈值从dBFS换算为采样值
+FULL_SCALE = 32768.0
+
+
+class BoundarySnapper:
+    """按时间顺序接收各窗口的RMS，为每个名义分割点选择最近的静音位置"""
+    
+    def __init__(self, targets, tolerance, threshold):
+        self.targets = targets
+        self.tolerance = tolerance
+        self.threshold = threshold
+        self.cuts = []
+        # 判断一个窗口前后是否都是静音需要后面 SILENCE_MARGIN 个窗口，这些窗口先保留到下一块
+        self.held = np.zeros(0, dtype=np.float32)
+        # 保留的窗口之前 SILENCE_MARGIN 个窗口是否有声音（音轨开头按有声音处理）
+        self.context = np.ones(SILENCE_MARGIN, dtype=bool)
+        self.next_window = 0
+        self.reset()
+    
+    def reset(self):
+        # 当前分割点范围内最近的静音 (距离, 时间)
+        self.nearest = None
+    
+    def finish_target(self):
+        target = self.targets[len(self.cuts)]
+        if self.nearest is not None:
+            self.cuts.append(self.nearest[1])
+        else:
+            self.cuts.append(target)
+        self.reset()
+    
+    def feed(self, rms, final=False):
+        """按顺序送入各窗口的RMS；final 为 True 表示音轨已结束（结尾按有声音处理）"""
+        values = np.concatenate([self.held, rms])
+        loud = values > self.threshold
+        right = np.ones(SILENCE_MARGIN if final else 0, dtype=bool)
+        padded = np.concatenate([self.context, loud, right])
+        if len(padded) < 2 * SILENCE_MARGIN + 1:
+            self.held = values
+            return
+        near_loud = sliding_window_view(padded, 2 * SILENCE_MARGIN + 1).any(axis=1)
+        count = len(near_loud)
+        self.scan(values[:count], ~near_loud, self.next_window)
+        self.context = padded[count:count + SILENCE_MARGIN]
+        self.held = values[count:]
+        self.next_window += count
+    
+    def scan(self, rms, quiet, first_window):
+        """rms/quiet 是从第 first_window 个窗口开始的连续窗口的RMS和是否静音"""
+        window = WINDOW_SAMPLES / ANALYSIS_RATE
+        end_time = (first_window + len(rms)) * window
+        while len(self.cuts) < len(self.targets):
+            target = self.targets[len(self.cuts)]
+            # 范围内的窗口（按窗口中心时间）
+            low = max(int(np.ceil((target - self.tolerance) / window - 0.5)) - first_window, 0)
+            high = min(int(np.floor((target + self.tolerance) / window - 0.5)) - first_window + 1,
+                       len(rms))
+            if low < high:
+                times = (np.arange(low, high) + first_window + 0.5) * window
+                silent = np.flatnonzero(quiet[low:high])
+                if len(silent):
+                    distances = np.abs(times[silent] - target)
+                    i = int(np.argmin(distances))
+                    if self.nearest is None or distances[i] < self.nearest[0]:
+                        self.nearest = (float(distances[i]), float(times[silent[i]]))
+            
+            if end_time < target + self.tolerance:
+                break
+            self.finish_target()
+    
+    def finish(self):
+        """音轨结束：处理保留的窗口并确定剩下的分割点"""
+        self.feed(np.zeros(0, dtype=np.float32), final=True)
+        while len(self.cuts) < len(self.targets):
+            self.finish_target()
+        return [round(cut, 6) for cut in self.cuts]
+
+
+def window_rms(samples):
+    """把采样分成 WINDOW_SAMPLES 长的窗口，返回每个窗口的RMS"""
+    windows = samples[:len(samples) // WINDOW_SAMPLES * WINDOW_SAMPLES]
+    windows = windows.astype(np.float32).reshape(-1, WINDOW_SAMPLES)
+    return np.sqrt(np.mean(windows * windows, axis=1))
+
+
+def detect_silence_cuts(video_file, targets, tolerance, threshold_db):
+    """解码音轨并把名义分割点 targets 移到附近的静音处，返回分割点（秒）"""
+    cmd = [
+        ffmpeg_executable(), "-v", "error", "-nostdin", "-i", video_file,
+        "-vn", "-sn", "-dn", "-map", "0:a:0", "-ac", "1", "-ar", str(ANALYSIS_RATE),
+        "-f", "s16le", "-acodec", "pcm_s16le", "-"
+    ]
+    snapper = BoundarySnapper(targets, tolerance, FULL_SCALE * 10 ** (threshold_db / 20))
+    buffer = np.empty(CHUNK_SAMPLES, dtype="<i2")
+    view = memoryview(buffer).cast("B")
+    # 上一块末尾不足一个窗口的采样
+    leftover = np.zeros(0, dtype="<i2")
+    
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        with tracked(process):
+            try:
+                while True:
+                    filled = 0
+                    while filled < len(view):
+                        count = process.stdout.readinto(view[filled:])
+                        if not count:
+                            break
+                        filled += count
+                    if filled < 2:
+                        break
+                    samples = np.concatenate([leftover, buffer[:filled // 2]])
+                    rms = window_rms(samples)
+                    leftover = samples[len(rms) * WINDOW_SAMPLES:]
+                    snapper.feed(rms)
+                    if filled < len(view):
+                        break
+            finally:
+                process.stdout.close()
+                returncode = process.wait()
+        # 被取消时不能把不完整的结果当作分析结果（会保存到探测缓存中）
+        raise_if_cancelled()
+        if returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode("utf-8", "replace").strip()
+            raise RuntimeError(f"静音分析失败: {message[-300:]}")
+    
+    return snapper.finish()
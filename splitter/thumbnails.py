@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""缩略图：在分割的同一次解码中按固定间隔取缩小的帧，生成每个片段的封面和每个视频的雪碧图
+
+FFmpeg引擎在编码命令中增加一路输出，把 fps+scale 滤镜处理后的帧以原始RGB写入临时文件，
+视频只解码一次；moviepy的单次解码模式直接从解码循环中取帧。取到的帧用numpy整批拼接：
+    
+    thumbnails/{文件名}_segment_001.jpg   每个片段的封面（最接近片段中点的帧）
+    thumbnails/{文件名}_sprite_001.jpg    雪碧图，每张最多 SPRITE_COLUMNS x SPRITE_ROWS 个缩略图
+    thumbnails/{文件名}_sprite.vtt        WebVTT索引，播放器拖动进度条时的预览 (#xywh=x,y,宽,高)
+    thumbnails/{文件名}_sprite.json       JSON索引：每个缩略图的时间范围、所属片段和在雪碧图中的位置
+
+每个片段取到的帧保存在 thumbnails/.frames_001.npz 中，续传时跳过的片段不需要重新解码。
+"""
+import json
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+from .metrics import write_atomic
+
+# 输出子目录
+THUMBNAIL_DIR = "thumbnails"
+
+# 每张雪碧图的列数和行数
+SPRITE_COLUMNS = 10
+SPRITE_ROWS = 10
+
+JPEG_QUALITY = 85
+
+# 判断取样时间属于哪个片段时的误差（秒），小于一帧
+TIME_EPSILON = 0.001
+
+
+def thumbnail_size(width):
+    """16:9的缩略图尺寸，高度取偶数"""
+    return width, max(2, int(round(width * 9 / 16 / 2)) * 2)
+
+
+def fit_tile(frame, width, height):
+    """把一帧 (高, 宽, 3) 等比缩小到 width x height 以内，居中放在黑色背景上"""
+    image = Image.fromarray(frame)
+    image.thumbnail((width, height), Image.BILINEAR)
+    tile = np.zeros((height, width, 3), dtype=np.uint8)
+    x = (width - image.width) // 2
+    y = (height - image.height) // 2
+    tile[y:y + image.height, x:x + image.width] = np.asarray(image.convert("RGB"))
+    return tile
+
+
+def tile_sheet(frames, columns):
+    """把 (帧数, 高, 宽, 3) 的缩略图按行拼成一张图，最后一行不足时补黑色"""
+    count, height, width, _ = frames.shape
+    rows = -(-count // columns)
+    if count < rows * columns:
+        padding = np.zeros((rows * columns - count, height, width, 3), dtype=np.uint8)
+        frames = np.concatenate([frames, padding])
+    grid = frames.reshape(rows, columns, height, width, 3).swapaxes(1, 2)
+    return grid.reshape(rows * height, columns * width, 3)
+
+
+def vtt_time(seconds):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    return f"{hours:02d}:{minutes:02d}:{milliseconds / 1000:06.3f}"
+
+
+class VideoThumbnails:
+    """一个视频的缩略图
+    
+    jobs 是处理该视频的任务数，每个任务结束时调用 finish_job()，最后一个任务拼接雪碧图
+    """
+    
+    def __init__(self, video_output_dir, base_name, segments, interval, width, jobs=1,
+                 log=print):
+        self.directory = os.path.join(video_output_dir, THUMBNAIL_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.base_name = base_name
+        self.segments = segments
+        self.interval = interval
+        self.width, self.height = thumbnail_size(width)
+        self.remaining = jobs
+        self.lock = threading.Lock()
+        self.log = log
+    
+    def raw_path(self, index):
+        """从第 index 个片段开始的一次解码输出原始帧的临时文件"""
+        return os.path.join(self.directory, f".frames_{index:03d}.raw")
+    
+    def frames_path(self, index):
+        return os.path.join(self.directory, f".frames_{index:03d}.npz")
+    
+    def poster_filename(self, index):
+        return f"{self.base_name}_segment_{index:03d}.jpg"
+    
+    def sprite_filename(self, number):
+        return f"{self.base_name}_sprite_{number:03d}.jpg"
+    
+    def ffmpeg_args(self, raw_path, duration=None, stream="0:v:0"):
+        """追加到FFmpeg命令末尾的一路输出：解码后的帧按间隔取样、缩小后以原始RGB写入 raw_path
+        
+        duration 是输出时长（-t 写在前一个输出之后时只作用于该输出，这里需要再指定一次）
+        """
+        width, height = self.width, self.height
+        filters = (
+            f"fps=1/{self.interval},"
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"format=rgb24,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+        )
+        args = ["-map", stream, "-vf", filters]
+        if duration is not None:
+            args += ["-t", str(duration)]
+        return args + ["-f", "rawvideo", "-pix_fmt", "rgb24", raw_path]
+    
+    def add_raw(self, raw_path, first_time, indices):
+        """读取FFmpeg输出的原始帧（从 first_time 开始每 interval 秒一帧）并删除临时文件"""
+        try:
+            data = np.fromfile(raw_path, dtype=np.uint8)
+        except OSError:
+            data = np.zeros(0, dtype=np.uint8)
+        finally:
+            try:
+                os.remove(raw_path)
+            except OSError:
+                pass
+        frame_bytes = self.width * self.height * 3
+        count = len(data) // frame_bytes
+        frames = data[:count * frame_bytes].reshape(count, self.height, self.width, 3)
+        self.add_frames(frames, first_time + np.arange(count) * self.interval, indices)
+    
+    def add_frames(self, frames, times, indices):
+        """保存一次解码取到的帧，按时间分给片段 indices（从1开始），并保存这些片段的封面"""
+        times = np.asarray(times, dtype=np.float64)
+        for index in indices:
+            start, end = self.segments[index - 1]
+            inside = (times >= start - TIME_EPSILON) & (times < end - TIME_EPSILON)
+            np.savez(self.frames_path(index), frames=frames[inside], times=times[inside])
+            if len(frames):
+                # 片段比取样间隔短时可能没有自己的帧，用时间最接近的帧作为封面
+                nearest = int(np.argmin(np.abs(times - (start + end) / 2)))
+                Image.fromarray(frames[nearest]).save(
+                    os.path.join(self.directory, self.poster_filename(index)),
+                    quality=JPEG_QUALITY
+                )
+    
+    def finish_job(self):
+        """处理该视频的一个任务结束；所有任务都结束时拼接雪碧图，返回是否拼接"""
+        with self.lock:
+            self.remaining -= 1
+            if self.remaining > 0:
+                return False
+        self.write_sprites()
+        return True
+    
+    def load_frames(self):
+        """读取所有片段保存的帧，返回 (帧, 取样时间, 所属片段) 和没有帧的片段数"""
+        frames, times, owners = [], [], []
+        missing = 0
+        for index in range(1, len(self.segments) + 1):
+            try:
+                with np.load(self.frames_path(index)) as data:
+                    frames.append(data["frames"])
+                    times.append(data["times"])
+            except (OSError, ValueError, KeyError):
+                missing += 1
+                continue
+            owners.append(np.full(len(times[-1]), index))
+        if not frames:
+            return None, missing
+        return (np.concatenate(frames), np.concatenate(times), np.concatenate(owners)), missing
+    
+    def write_sprites(self):
+        """拼接雪碧图，写入WebVTT和JSON索引"""
+        loaded, missing = self.load_frames()
+        if missing:
+            self.log(f"警告: {missing}/{len(self.segments)} 个片段没有缩略图")
+        if loaded is None or not len(loaded[0]):
+            return
+        frames, times, owners = loaded
+        count = len(frames)
+        columns = min(SPRITE_COLUMNS, count)
+        per_sheet = columns * SPRITE_ROWS
+        
+        sheets = []
+        for first in range(0, count, per_sheet):
+            name = self.sprite_filename(len(sheets) + 1)
+            sheet = tile_sheet(frames[first:first + per_sheet], columns)
+            Image.fromarray(sheet).save(os.path.join(self.directory, name), quality=JPEG_QUALITY)
+            sheets.append(name)
+        # 之前运行生成的多余雪碧图
+        number = len(sheets) + 1
+        while os.path.exists(os.path.join(self.directory, self.sprite_filename(number))):
+            os.remove(os.path.join(self.directory, self.sprite_filename(number)))
+            number += 1
+        
+        tiles = []
+        for k in range(count):
+            index = int(owners[k])
+            # 到下一个缩略图为止；下一个片段没有缩略图时到本片段结束为止
+            if k + 1 < count and owners[k + 1] <= index + 1:
+                end = float(times[k + 1])
+            else:
+                end = self.segments[index - 1][1]
+            position = k % per_sheet
+            tiles.append({
+                "start": round(float(times[k]), 3),
+                "end": round(end, 3),
+                "segment": index,
+                "sheet": sheets[k // per_sheet],
+                "x": position % columns * self.width,
+                "y": position // columns * self.height,
+            })
+        
+        def write_vtt(f):
+            f.write("WEBVTT\n")
+            for tile in tiles:
+                f.write(f"\n{vtt_time(tile['start'])} --> {vtt_time(tile['end'])}\n"
+                        f"{tile['sheet']}#xywh={tile['x']},{tile['y']},"
+                        f"{self.width},{self.height}\n")
+        
+        index = {
+            "interval": self.interval,
+            "tile_width": self.width,
+            "tile_height": self.height,
+            "columns": columns,
+            "rows": SPRITE_ROWS,
+            "sheets": sheets,
+            "posters": [
+                {"segment": i, "file": self.poster_filename(i)}
+                for i in range(1, len(self.segments) + 1)
+                if os.path.exists(os.path.join(self.directory, self.poster_filename(i)))
+            ],
+            "tiles": tiles,
+        }
+        write_atomic(os.path.join(self.directory, f"{self.base_name}_sprite.vtt"), write_vtt)
+        write_atomic(os.path.join(self.directory, f"{self.base_name}_sprite.json"),
+                     lambda f: json.dump(index, f, ensure_ascii=False, indent=2))
+        self.log(f"缩略图: {count} 帧，{len(sheets)} 张雪碧图")
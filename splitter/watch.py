@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""监视目录：发现新视频文件并在写入完成后立即分割
+
+采集设备通过共享目录写入文件时，文件会在很长一段时间内不断增长。
+每隔 interval 秒检查一次目录中文件的大小和修改时间，连续 settle 秒没有变化
+（并且能以只读方式打开）才认为文件已写完。已处理过的文件被替换或修改后会再次处理。
+只检查目录本身，不检查子目录，输出目录放在监视目录中也不会把输出片段当作新文件。
+"""
+import os
+import time
+
+# 视频文件扩展名（与图形界面的文件选择对话框相同）
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".flv", ".wmv", ".webm")
+
+# 默认的检查间隔和判断写入完成所需的稳定时间（秒）
+DEFAULT_INTERVAL = 1.0
+DEFAULT_SETTLE = 2.0
+
+
+def is_video_file(name):
+    """视频文件；跳过隐藏文件和正在下载/复制的临时文件（例如 .part、.tmp 结尾）"""
+    return not name.startswith(".") and name.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def can_open(path):
+    """Windows上仍被写入方独占打开的文件不能读取"""
+    try:
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    def __init__(self, directories, settle=DEFAULT_SETTLE):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.settle = settle
+        # 路径 -> (大小, 修改时间, 开始保持不变的时刻)
+        self.candidates = {}
+        # 路径 -> 开始处理时的 (大小, 修改时间)
+        self.dispatched = {}
+    
+    def scan(self):
+        """列出所有监视目录中的视频文件：路径 -> (大小, 修改时间)"""
+        files = {}
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if not is_video_file(entry.name):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+    
+    def poll(self, now=None):
+        """检查一次目录，返回已写入完成、尚未处理（或处理后又被修改）的文件，按发现顺序排列"""
+        now = time.monotonic() if now is None else now
+        files = self.scan()
+        
+        # 删除的文件不再跟踪，之后出现同名文件时作为新文件处理
+        for path in list(self.candidates):
+            if path not in files:
+                del self.candidates[path]
+        for path in list(self.dispatched):
+            if path not in files:
+                del self.dispatched[path]
+        
+        ready = []
+        for path, identity in files.items():
+            if self.dispatched.get(path) == identity:
+                continue
+            candidate = self.candidates.get(path)
+            if candidate is None or candidate[:2] != identity:
+                # 新文件或仍在变化：重新开始计时
+                self.candidates[path] = identity + (now,)
+                continue
+            if identity[0] == 0 or now - candidate[2] < self.settle or not can_open(path):
+                continue
+            del self.candidates[path]
+            self.dispatched[path] = identity
+            ready.append((candidate[2], path))
+        return [path for _, path in sorted(ready)]
+    
+    def defer(self, path):
+        """文件仍在处理中：暂不处理，之后再次稳定时重新返回"""
+        self.dispatched.pop(path, None)
@@ -2,18 +2,57 @@
 import os
 import threading
 import time
-import subprocess
-import shlex
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
 from PIL import Image, ImageTk
 import numpy as np
-from moviepy.editor import VideoFileClip
+
+from file_list import QUEUE_STATUSES, VirtualFileList, format_duration
+from splitter import JobQueue, SplitOptions, create_splitter, parse_rendition
+from splitter.event_sink import EventSink, LOG_LINES, UI_INTERVAL_MS
+from splitter.ffmpeg_engine import check_ffmpeg
+from splitter.importer import FileImporter
+from splitter.job_queue import STATUS_QUEUED
 
 # 设置主题和外观
 ctk.set_appearance_mode("System")  # 系统主题（跟随系统）
 ctk.set_default_color_theme("blue")  # 蓝色主题
 
+# 分割模式（界面显示名称 -> 引擎中的名称）
+SPLIT_MODES = {
+    "逐段编码": "per_segment",    # 每个片段启动一个FFmpeg进程
+    "单次编码": "single_pass",    # 解码/编码一次，由segment复用器输出所有片段
+    "无损复制": "copy",           # 不重新编码，分割点对齐到关键帧
+    "智能剪切": "smart",          # 只重新编码分割点附近不完整的GOP，其余直接复制
+}
+
+# 分割点（界面显示名称 -> SplitOptions.boundaries）
+BOUNDARY_MODES = {
+    "固定间隔": "fixed",          # 每隔设定的片段长度分割
+    "场景切换": "scene",          # 在场景切换处分割，片段长度为设定值的一半到两倍
+    "静音处": "silence",          # 分割点移到前后1秒内的静音处，避免切断说话
+}
+
+# 输出格式（界面显示名称 -> SplitOptions.output_format）
+OUTPUT_FORMATS = {
+    "MP4片段": "mp4",                # 每个片段一个独立的MP4文件
+    "HLS (fMP4片段)": "hls",         # 播放列表 + 每个片段一个 .m4s 文件
+    "HLS (单个文件)": "hls_single",  # 播放列表 + 一个分片MP4文件，按字节范围引用片段
+}
+
+# 勾选“优先处理”时加入队列的优先级（未勾选为0）
+URGENT_PRIORITY = 10
+
+# 关闭窗口时等待正在处理的视频停止（回到队列、删除未完成的片段）的最长时间（秒）
+CLOSE_TIMEOUT = 10
+
+# 编码质量（界面显示名称 -> 引擎中的名称）
+QUALITY_LEVELS = {
+    "低": "low",
+    "中等": "medium",
+    "高": "high",
+}
+
 class VideoSplitterApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -28,9 +67,37 @@ class VideoSplitterApp(ctk.CTk):
         self.output_directory = ""
         self.is_processing = False
         self.segment_duration = 3.0  # 默认片段时长为3秒
+        self.cpu_count = os.cpu_count() or 1
+        self.num_workers = 1  # 并行任务数
+        self.importer = None  # 正在进行的导入 (FileImporter)
+        self.importing = False  # 导入的文件夹尚未扫描完毕
+        self.splitter = None  # 正在处理队列的引擎
+        self.process_thread = None
+        self.stop_event = threading.Event()
+        self.paused = False
+        self.closing = False
+        # 队列中的路径（绝对路径）-> 文件列表中的路径
+        self.list_paths = {}
+        # 本次处理的结果：状态 -> 视频数
+        self.results = {}
+        
+        # 持久化的处理队列：关闭窗口时未处理完的视频，下次启动后继续
+        try:
+            self.queue = JobQueue.open()
+            self.queue_error = None
+        except Exception as e:
+            self.queue = None
+            self.queue_error = e
+        
+        # 工作线程的日志和进度先放入队列，由界面线程定时取出显示
+        self.events = EventSink()
+        self.log_line_count = 0
         
         # 创建UI
         self.create_ui()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(UI_INTERVAL_MS, self.poll_events)
+        self.restore_queue()
         
     def create_ui(self):
         # 创建左右面板
@@ -84,12 +151,24 @@ class VideoSplitterApp(ctk.CTk):
         )
         input_label.grid(row=3, column=0, padx=20, pady=(20, 5), sticky="w")
         
+        input_buttons = ctk.CTkFrame(self.control_frame, fg_color="transparent")
+        input_buttons.grid(row=4, column=0, padx=20, pady=(0, 10), sticky="ew")
+        input_buttons.grid_columnconfigure((0, 1), weight=1)
+        
         self.input_button = ctk.CTkButton(
-            self.control_frame,
+            input_buttons,
             text="选择视频文件",
             command=self.select_input_files
         )
-        self.input_button.grid(row=4, column=0, padx=20, pady=(0, 10), sticky="ew")
+        self.input_button.grid(row=0, column=0, padx=(0, 5), sticky="ew")
+        
+        # 导入文件夹（包括子文件夹）中的所有视频
+        self.folder_button = ctk.CTkButton(
+            input_buttons,
+            text="导入文件夹",
+            command=self.select_input_folder
+        )
+        self.folder_button.grid(row=0, column=1, padx=(5, 0), sticky="ew")
         
         # 输出目录选择
         output_label = ctk.CTkLabel(
@@ -133,13 +212,28 @@ class VideoSplitterApp(ctk.CTk):
         )
         self.segment_value_label.grid(row=9, column=0, padx=20, pady=(0, 10), sticky="e")
         
+        # 分割点选择
+        boundaries_label = ctk.CTkLabel(
+            self.control_frame,
+            text="分割点:",
+        )
+        boundaries_label.grid(row=10, column=0, padx=20, pady=(5, 0), sticky="w")
+        
+        self.boundaries_var = ctk.StringVar(value="固定间隔")
+        boundaries_menu = ctk.CTkOptionMenu(
+            self.control_frame,
+            values=list(BOUNDARY_MODES.keys()),
+            variable=self.boundaries_var
+        )
+        boundaries_menu.grid(row=11, column=0, padx=20, pady=(0, 5), sticky="ew")
+        
         # FFmpeg高级选项
         options_label = ctk.CTkLabel(
             self.control_frame,
             text="FFmpeg选项:",
             font=ctk.CTkFont(size=14, weight="bold")
         )
-        options_label.grid(row=10, column=0, padx=20, pady=(10, 5), sticky="w")
+        options_label.grid(row=12, column=0, padx=20, pady=(10, 5), sticky="w")
         
         # 编码质量选择
         self.quality_var = ctk.StringVar(value="中等")
@@ -147,10 +241,10 @@ class VideoSplitterApp(ctk.CTk):
             self.control_frame,
             text="编码质量:",
         )
-        quality_label.grid(row=11, column=0, padx=20, pady=(5, 0), sticky="w")
+        quality_label.grid(row=13, column=0, padx=20, pady=(5, 0), sticky="w")
         
         quality_frame = ctk.CTkFrame(self.control_frame, fg_color="transparent")
-        quality_frame.grid(row=12, column=0, padx=20, pady=(0, 5), sticky="ew")
+        quality_frame.grid(row=14, column=0, padx=20, pady=(0, 5), sticky="ew")
         quality_frame.grid_columnconfigure((0, 1, 2), weight=1)
         
         quality_low = ctk.CTkRadioButton(
@@ -177,9 +271,96 @@ class VideoSplitterApp(ctk.CTk):
         )
         quality_high.grid(row=0, column=2, padx=5, pady=5)
         
+        # 分割模式选择
+        mode_label = ctk.CTkLabel(
+            self.control_frame,
+            text="分割模式:",
+        )
+        mode_label.grid(row=15, column=0, padx=20, pady=(5, 0), sticky="w")
+        
+        self.mode_var = ctk.StringVar(value="逐段编码")
+        mode_menu = ctk.CTkOptionMenu(
+            self.control_frame,
+            values=list(SPLIT_MODES.keys()),
+            variable=self.mode_var
+        )
+        mode_menu.grid(row=16, column=0, padx=20, pady=(0, 5), sticky="ew")
+        
+        # 输出格式选择
+        format_label = ctk.CTkLabel(
+            self.control_frame,
+            text="输出格式:",
+        )
+        format_label.grid(row=17, column=0, padx=20, pady=(5, 0), sticky="w")
+        
+        self.format_var = ctk.StringVar(value="MP4片段")
+        format_menu = ctk.CTkOptionMenu(
+            self.control_frame,
+            values=list(OUTPUT_FORMATS.keys()),
+            variable=self.format_var
+        )
+        format_menu.grid(row=18, column=0, padx=20, pady=(0, 5), sticky="ew")
+        
+        # 多规格输出（可选）
+        renditions_label = ctk.CTkLabel(
+            self.control_frame,
+            text="多规格输出 (可选):",
+        )
+        renditions_label.grid(row=19, column=0, padx=20, pady=(5, 0), sticky="w")
+        
+        self.renditions_entry = ctk.CTkEntry(
+            self.control_frame,
+            placeholder_text="720p:720:23:3M 480p:480:28"
+        )
+        self.renditions_entry.grid(row=20, column=0, padx=20, pady=(0, 5), sticky="ew")
+        
+        # 并行任务数设置
+        workers_label = ctk.CTkLabel(
+            self.control_frame,
+            text="并行任务数:",
+        )
+        workers_label.grid(row=21, column=0, padx=20, pady=(5, 0), sticky="w")
+        
+        self.workers_var = ctk.IntVar(value=self.num_workers)
+        max_workers = max(self.cpu_count, 2)
+        workers_slider = ctk.CTkSlider(
+            self.control_frame,
+            from_=1,
+            to=max_workers,
+            number_of_steps=max_workers - 1,
+            variable=self.workers_var,
+            command=self.update_workers_value
+        )
+        workers_slider.grid(row=22, column=0, padx=20, pady=(0, 0), sticky="ew")
+        
+        self.workers_value_label = ctk.CTkLabel(
+            self.control_frame,
+            text=self.format_workers_text(),
+            font=ctk.CTkFont(size=12)
+        )
+        self.workers_value_label.grid(row=23, column=0, padx=20, pady=(0, 5), sticky="e")
+        
+        # 断点续传
+        self.resume_var = ctk.BooleanVar(value=True)
+        resume_checkbox = ctk.CTkCheckBox(
+            self.control_frame,
+            text="断点续传 (跳过已完成的片段)",
+            variable=self.resume_var
+        )
+        resume_checkbox.grid(row=24, column=0, padx=20, pady=(5, 5), sticky="w")
+        
+        # 缩略图
+        self.thumbnails_var = ctk.BooleanVar(value=False)
+        thumbnails_checkbox = ctk.CTkCheckBox(
+            self.control_frame,
+            text="生成封面和雪碧图 (不支持无损复制/智能剪切)",
+            variable=self.thumbnails_var
+        )
+        thumbnails_checkbox.grid(row=25, column=0, padx=20, pady=(5, 5), sticky="w")
+        
         # 分割线
         separator2 = ctk.CTkFrame(self.control_frame, height=2, width=200)
-        separator2.grid(row=13, column=0, padx=20, pady=10, sticky="ew")
+        separator2.grid(row=26, column=0, padx=20, pady=10, sticky="ew")
         
         # 处理按钮
         self.process_button = ctk.CTkButton(
@@ -189,20 +370,58 @@ class VideoSplitterApp(ctk.CTk):
             height=40,
             command=self.start_processing
         )
-        self.process_button.grid(row=14, column=0, padx=20, pady=(20, 0), sticky="ew")
+        self.process_button.grid(row=27, column=0, padx=20, pady=(20, 0), sticky="ew")
+        
+        # 处理期间加入的视频按优先级和时长插入队列，勾选后排在未勾选的视频前面
+        self.priority_var = ctk.BooleanVar(value=False)
+        priority_checkbox = ctk.CTkCheckBox(
+            self.control_frame,
+            text="优先处理",
+            variable=self.priority_var
+        )
+        priority_checkbox.grid(row=28, column=0, padx=20, pady=(10, 0), sticky="w")
+        
+        # 暂停/取消按钮
+        queue_frame = ctk.CTkFrame(self.control_frame, fg_color="transparent")
+        queue_frame.grid(row=29, column=0, padx=20, pady=(10, 0), sticky="ew")
+        queue_frame.grid_columnconfigure((0, 1), weight=1)
+        
+        self.pause_button = ctk.CTkButton(
+            queue_frame,
+            text="暂停",
+            state="disabled",
+            command=self.toggle_pause
+        )
+        self.pause_button.grid(row=0, column=0, padx=(0, 5), sticky="ew")
+        
+        self.cancel_button = ctk.CTkButton(
+            queue_frame,
+            text="取消",
+            state="disabled",
+            command=self.cancel_processing
+        )
+        self.cancel_button.grid(row=0, column=1, padx=(5, 0), sticky="ew")
         
         # 进度条
         self.progress_bar = ctk.CTkProgressBar(self.control_frame)
-        self.progress_bar.grid(row=15, column=0, padx=20, pady=(10, 0), sticky="ew")
+        self.progress_bar.grid(row=30, column=0, padx=20, pady=(10, 0), sticky="ew")
         self.progress_bar.set(0)
         
+        # 状态（速度、剩余时间）
+        self.status_label = ctk.CTkLabel(
+            self.control_frame,
+            text="",
+            font=ctk.CTkFont(size=12)
+        )
+        self.status_label.grid(row=31, column=0, padx=20, pady=(5, 0), sticky="w")
+        
         # 版本信息
         version_label = ctk.CTkLabel(
             self.control_frame,
             text="v1.1.0 FFmpeg",
             font=ctk.CTkFont(size=10)
         )
-        version_label.grid(row=16, column=0, padx=20, pady=(20, 10), sticky="e")
+        version_label.grid(row=32, column=0, padx=20, pady=(20, 10), sticky="e")
     
     def setup_display_panel(self):
         self.display_frame.grid_columnconfigure(0, weight=1)
@@ -216,15 +435,15 @@ class VideoSplitterApp(ctk.CTk):
         file_list_frame.grid_rowconfigure(1, weight=1)
         
         # 文件列表标题
-        file_list_label = ctk.CTkLabel(
+        self.file_list_label = ctk.CTkLabel(
             file_list_frame,
             text="选定的文件",
             font=ctk.CTkFont(size=16, weight="bold")
         )
-        file_list_label.grid(row=0, column=0, padx=10, pady=10, sticky="w")
+        self.file_list_label.grid(row=0, column=0, padx=10, pady=10, sticky="w")
         
-        # 文件列表
-        self.file_list = ctk.CTkTextbox(file_list_frame, state="disabled")
+        # 文件列表（只绘制可见的行，几万个文件也能流畅滚动）
+        self.file_list = VirtualFileList(file_list_frame, self.segment_duration)
         self.file_list.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
         
         # 日志框架
@@ -241,6 +460,15 @@ class VideoSplitterApp(ctk.CTk):
         )
         log_label.grid(row=0, column=0, padx=10, pady=10, sticky="w")
         
+        # 把完整日志和性能报告保存到输出目录（屏幕上只保留最近的日志）
+        self.log_file_var = ctk.BooleanVar(value=False)
+        log_file_checkbox = ctk.CTkCheckBox(
+            log_frame,
+            text="保存完整日志和性能报告",
+            variable=self.log_file_var
+        )
+        log_file_checkbox.grid(row=0, column=0, padx=10, pady=10, sticky="e")
+        
         # 日志内容
         self.log_text = ctk.CTkTextbox(log_frame)
         self.log_text.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
@@ -249,6 +477,16 @@ class VideoSplitterApp(ctk.CTk):
     def update_segment_value(self, value):
         self.segment_duration = float(value)
         self.segment_value_label.configure(text=f"{self.segment_duration:.1f} 秒")
+        self.file_list.set_segment_duration(self.segment_duration)
+        self.update_file_summary()
+    
+    def update_workers_value(self, value):
+        self.num_workers = int(round(float(value)))
+        self.workers_value_label.configure(text=self.format_workers_text())
+    
+    def format_workers_text(self):
+        threads = SplitOptions(workers=self.num_workers).threads
+        return f"{self.num_workers} 个 (每个 {threads} 线程)"
     
     def select_input_files(self):
         files = filedialog.askopenfilenames(
@@ -260,9 +498,24 @@ class VideoSplitterApp(ctk.CTk):
         )
         
         if files:
-            self.video_files = list(files)
-            self.update_file_list()
-            self.log(f"已选择 {len(self.video_files)} 个文件")
+            self.import_paths(files)
+    
+    def select_input_folder(self):
+        directory = filedialog.askdirectory(title="选择包含视频的文件夹（包括子文件夹）")
+        if directory:
+            self.log(f"扫描文件夹: {directory}")
+            self.import_paths([directory])
+    
+    def import_paths(self, paths):
+        """替换文件列表：在后台扫描文件夹并并行获取时长，列表随结果逐步更新"""
+        if self.importer is not None:
+            self.importer.cancel()
+        self.video_files = []
+        self.file_list.clear()
+        self.update_file_summary()
+        self.importer = FileImporter()
+        self.importing = True
+        self.importer.start(paths)
     
     def select_output_directory(self):
         directory = filedialog.askdirectory(title="选择输出目录")
@@ -271,158 +524,259 @@ class VideoSplitterApp(ctk.CTk):
             self.log(f"输出目录: {self.output_directory}")
     
     def update_file_list(self):
-        self.file_list.configure(state="normal")
-        self.file_list.delete("0.0", "end")
-        
-        for i, file in enumerate(self.video_files, 1):
-            filename = os.path.basename(file)
-            self.file_list.insert("end", f"{i}. {filename}\n")
-        
-        self.file_list.configure(state="disabled")
+        """取出导入线程积压的结果，更新文件列表"""
+        if self.importer is None:
+            return
+        found, probed, scanned, finished = self.importer.drain()
+        if found:
+            self.video_files.extend(self.file_list.add_files(found))
+        for path, duration, error in probed:
+            self.file_list.set_duration(path, duration, error)
+        if found or probed:
+            self.update_file_summary()
+        self.importing = not scanned
+        if finished:
+            self.importer = None
+            self.log(f"已选择 {len(self.video_files)} 个文件")
+    
+    def update_file_summary(self):
+        count, total, segments, errors = self.file_list.summary()
+        text = "选定的文件"
+        if count:
+            text += f" ({count} 个，总时长 {format_duration(total)}，约 {segments} 个片段"
+            if errors:
+                text += f"，{errors} 个无法读取"
+            text += ")"
+        self.file_list_label.configure(text=text)
     
     def log(self, message):
         """向日志区添加消息"""
-        self.log_text.configure(state="normal")
         timestamp = time.strftime("%H:%M:%S", time.localtime())
-        self.log_text.insert("end", f"[{timestamp}] {message}\n")
+        self.events.log(f"[{timestamp}] {message}\n")
+    
+    def poll_events(self):
+        """在界面线程中定时取出工作线程积压的事件，合并后一次更新界面"""
+        lines, dropped, progress, status, calls = self.events.drain()
+        if dropped:
+            lines.insert(0, f"... 省略 {dropped} 行日志 ...\n")
+        if lines:
+            self.write_log_lines(lines)
+        if progress is not None:
+            self.progress_bar.set(progress)
+        if status is not None:
+            self.status_label.configure(text=status)
+        for func in calls:
+            func()
+        self.update_file_list()
+        self.after(UI_INTERVAL_MS, self.poll_events)
+    
+    def write_log_lines(self, lines):
+        """向日志区添加多行日志，超过 LOG_LINES 行时删除最早的行"""
+        self.log_text.configure(state="normal")
+        self.log_text.insert("end", "".join(lines))
+        self.log_line_count += len(lines)
+        if self.log_line_count > LOG_LINES:
+            excess = self.log_line_count - LOG_LINES
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_line_count = LOG_LINES
         self.log_text.see("end")
         self.log_text.configure(state="disabled")
     
+    def restore_queue(self):
+        """启动时提示上次关闭窗口时未处理完的视频"""
+        if self.queue is None:
+            self.log(f"无法打开处理队列: {str(self.queue_error)}")
+            return
+        self.queue.requeue_interrupted()
+        pending = len(self.queue.entries([STATUS_QUEUED]))
+        if pending:
+            self.log(f"队列中有 {pending} 个未处理完的视频，点击“开始处理”继续")
+    
     def start_processing(self):
-        if not self.video_files:
+        if self.importing:
+            messagebox.showinfo("提示", "正在扫描文件夹，请稍候")
+            return
+        
+        if self.queue is None:
+            messagebox.showerror("错误", f"无法打开处理队列:\n{str(self.queue_error)}")
+            return
+        
+        if not self.video_files and (self.is_processing or self.queue.next_entry() is None):
             messagebox.showerror("错误", "请先选择视频文件")
             return
             
-        if not self.output_directory:
+        if self.video_files and not self.output_directory:
             messagebox.showerror("错误", "请选择输出目录")
             return
         
-        if self.is_processing:
-            messagebox.showinfo("提示", "正在处理中，请稍候")
-            return
-        
         # 检查是否有FFmpeg
-        try:
-            subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
-        except (subprocess.SubprocessError, FileNotFoundError):
+        if not check_ffmpeg():
             messagebox.showerror(
                 "错误", 
                 "未检测到FFmpeg。请确保FFmpeg已安装并添加到系统PATH中。\n"
                 "您可以从https://ffmpeg.org/download.html下载FFmpeg。"
             )
             return
-            
+        
+        if not self.is_processing:
+            try:
+                options = self.create_options()
+            except ValueError as e:
+                messagebox.showerror("错误", str(e))
+                return
+        
+        if self.video_files:
+            self.enqueue_files()
+        if self.is_processing:
+            # 正在处理：新加入的视频按优先级和时长插入队列，使用本次处理的设置
+            self.splitter.wake.set()
+            return
+        
         # 开始处理
         self.is_processing = True
-        self.process_button.configure(state="disabled", text="处理中...")
+        self.paused = False
+        self.results = {}
+        self.process_button.configure(text="加入队列")
+        self.pause_button.configure(state="normal", text="暂停")
+        self.cancel_button.configure(state="normal")
         self.progress_bar.set(0)
-        
-        # 在新线程中运行视频处理，避免UI卡顿
-        threading.Thread(target=self.process_videos_ffmpeg, daemon=True).start()
+        self.status_label.configure(text="")
+        
+        if self.log_file_var.get() and self.output_directory:
+            stamp = time.strftime("%Y%m%d_%H%M%S")
+            log_path = os.path.join(self.output_directory, f"split_log_{stamp}.log")
+            self.events.open_log_file(log_path)
+            self.log(f"完整日志: {log_path}")
+            report_prefix = os.path.join(self.output_directory, f"split_report_{stamp}")
+            options.report_json = report_prefix + ".json"
+            options.report_csv = report_prefix + ".csv"
+        
+        self.log(f"分割模式: {self.mode_var.get()}")
+        self.log(f"输出格式: {self.format_var.get()}")
+        self.options = options
+        self.start_queue_thread()
     
-    def process_videos_ffmpeg(self):
+    def create_options(self):
+        # 每种规格为 名称:高度:CRF[:码率上限]，以空格或逗号分隔；填写后忽略编码质量
+        renditions = [
+            parse_rendition(text)
+            for text in self.renditions_entry.get().replace(",", " ").split()
+        ]
+        return SplitOptions(
+            segment_duration=self.segment_duration,
+            boundaries=BOUNDARY_MODES[self.boundaries_var.get()],
+            quality=QUALITY_LEVELS[self.quality_var.get()],
+            engine="ffmpeg",
+            mode=SPLIT_MODES[self.mode_var.get()],
+            output_format=OUTPUT_FORMATS[self.format_var.get()],
+            renditions=renditions,
+            thumbnails=self.thumbnails_var.get(),
+            workers=self.num_workers,
+            resume=self.resume_var.get()
+        )
+    
+    def enqueue_files(self):
+        """把选定的文件加入队列（时长用于排序），文件列表显示队列中的状态"""
+        priority = URGENT_PRIORITY if self.priority_var.get() else 0
+        durations = [self.file_list.duration(path) for path in self.video_files]
+        for path in self.video_files:
+            self.list_paths[os.path.abspath(path)] = path
+        added = self.queue.add(self.video_files, self.output_directory, priority, durations)
+        for entry in added:
+            self.file_list.set_status(self.list_paths[entry.path], QUEUE_STATUSES[entry.status])
+        self.log(f"加入队列: {len(added)} 个视频" + (" (优先处理)" if priority else ""))
+        # 已加入队列的文件再次点击时不重复加入
+        self.video_files = []
+    
+    def start_queue_thread(self):
+        self.splitter = create_splitter(
+            self.options, log=self.events.log, progress=self.events.progress,
+            status=self.events.status
+        )
+        self.stop_event = threading.Event()
+        # 在新线程中处理队列，避免UI卡顿
+        self.process_thread = threading.Thread(
+            target=self.process_queue, args=(self.splitter, self.stop_event), daemon=True
+        )
+        self.process_thread.start()
+    
+    def process_queue(self, splitter, stop):
         try:
-            total_files = len(self.video_files)
-            
-            for i, video_file in enumerate(self.video_files, 1):
-                filename = os.path.basename(video_file)
-                base_name = os.path.splitext(filename)[0]
-                
-                self.log(f"处理 ({i}/{total_files}): {filename}")
-                
-                # 创建视频的输出子目录
-                video_output_dir = os.path.join(self.output_directory, base_name)
-                os.makedirs(video_output_dir, exist_ok=True)
-                
-                # 获取视频时长
-                self.log(f"分析视频: {filename}")
-                try:
-                    # 使用FFprobe获取视频时长
-                    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", 
-                          "default=noprint_wrappers=1:nokey=1", video_file]
-                    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-                    duration = float(result.stdout.strip())
-                    self.log(f"视频时长: {duration:.2f}秒")
-                except:
-                    # 如果FFprobe失败，则尝试使用moviepy
-                    self.log("使用备用方法获取视频时长...")
-                    video = VideoFileClip(video_file)
-                    duration = video.duration
-                    video.close()
-                    self.log(f"视频时长: {duration:.2f}秒")
-                
-                # 计算分割数量
-                num_segments = int(np.ceil(duration / self.segment_duration))
-                self.log(f"将分割为 {num_segments} 个片段")
-                
-                # 设置编码参数（基于选择的质量）
-                crf = "23"  # 默认中等质量
-                if self.quality_var.get() == "低":
-                    crf = "28"
-                elif self.quality_var.get() == "高":
-                    crf = "18"
-                
-                # 分割视频
-                for j in range(num_segments):
-                    # 计算片段的开始和结束时间
-                    start_time = j * self.segment_duration
-                    end_time = min((j + 1) * self.segment_duration, duration)
-                    segment_duration = end_time - start_time
-                    
-                    # 输出文件名
-                    output_filename = f"{base_name}_segment_{j+1:03d}.mp4"
-                    output_path = os.path.join(video_output_dir, output_filename)
-                    
-                    # 构建FFmpeg命令
-                    cmd = [
-                        "ffmpeg", "-y", "-ss", str(start_time), "-i", video_file,
-                        "-t", str(segment_duration), "-c:v", "libx264", "-crf", crf,
-                        "-preset", "fast", "-c:a", "aac", "-b:a", "128k",
-                        "-movflags", "+faststart", output_path
-                    ]
-                    
-                    # 执行FFmpeg命令
-                    self.log(f"处理片段 {j+1}/{num_segments} (时间: {start_time:.2f}s - {end_time:.2f}s)")
-                    process = subprocess.Popen(
-                        cmd, 
-                        stdout=subprocess.PIPE, 
-                        stderr=subprocess.PIPE, 
-                        universal_newlines=True
-                    )
-                    
-                    # 等待处理完成
-                    process.wait()
-                    
-                    # 检查结果
-                    if process.returncode != 0:
-                        stderr = process.stderr.read()
-                        self.log(f"警告: 处理片段 {j+1} 时出错: {stderr[:100]}...")
-                    else:
-                        self.log(f"完成片段 {j+1}/{num_segments}: {output_filename}")
-                    
-                    # 更新进度
-                    segment_progress = (j + 1) / num_segments
-                    overall_progress = (i - 1 + segment_progress) / total_files
-                    self.update_progress(overall_progress)
-                
-                self.log(f"完成处理: {filename}")
-            
-            self.log("所有视频处理完成!")
-            messagebox.showinfo("完成", "所有视频已处理完成!")
+            splitter.run_queue(self.queue, stop, on_entry=self.on_queue_entry)
+            self.events.call(lambda: self.finish_processing(None))
         
         except Exception as e:
             self.log(f"错误: {str(e)}")
-            messagebox.showerror("错误", f"处理过程中出错:\n{str(e)}")
-        
-        finally:
-            # 重置UI状态
-            self.is_processing = False
-            self.process_button.configure(state="normal", text="开始处理")
-            self.progress_bar.set(1)  # 完成状态
+            self.events.call(lambda error=e: self.finish_processing(error))
+    
+    def on_queue_entry(self, entry):
+        """队列中的视频开始或结束（在工作线程中调用）"""
+        self.events.call(lambda status=entry.status: self.update_entry(entry.path, status))
+    
+    def update_entry(self, path, status):
+        self.file_list.set_status(self.list_paths.get(path, path), QUEUE_STATUSES[status])
+        self.results[status] = self.results.get(status, 0) + 1
     
-    def update_progress(self, value):
-        """更新进度条，这个方法会从工作线程调用"""
-        self.after(0, lambda: self.progress_bar.set(value))
+    def toggle_pause(self):
+        """暂停时正在运行的任务被挂起，继续后从原处接着处理"""
+        if self.splitter is None:
+            return
+        self.paused = not self.paused
+        if self.paused:
+            self.splitter.pause()
+        else:
+            self.splitter.resume()
+        self.pause_button.configure(text="继续" if self.paused else "暂停")
+    
+    def cancel_processing(self):
+        if self.splitter is None:
+            return
+        if not messagebox.askyesno(
+            "取消", "取消队列中所有未处理完的视频？\n正在处理的视频立即停止，未完成的片段将被删除。"
+        ):
+            return
+        self.splitter.cancel()
+        if self.paused:
+            self.toggle_pause()
+    
+    def on_close(self):
+        """关闭窗口：终止正在运行的任务，正在处理的视频回到队列，下次启动后继续"""
+        self.closing = True
+        if self.is_processing:
+            self.log("停止处理...")
+            self.stop_event.set()
+            self.splitter.wake.set()
+            self.process_thread.join(CLOSE_TIMEOUT)
+        if self.queue is not None and not (self.process_thread and self.process_thread.is_alive()):
+            self.queue.close()
+        self.events.close_log_file()
+        self.destroy()
+    
+    def finish_processing(self, error):
+        """处理结束后在界面线程中重置UI状态"""
+        self.splitter = None
+        if self.closing:
+            return
+        if error is None and self.queue.next_entry() is not None:
+            # 队列处理结束前又加入了视频
+            self.start_queue_thread()
+            return
+        self.events.close_log_file()
+        self.is_processing = False
+        self.process_button.configure(text="开始处理")
+        self.pause_button.configure(state="disabled", text="暂停")
+        self.cancel_button.configure(state="disabled")
+        self.progress_bar.set(1)  # 完成状态
+        if error is not None:
+            messagebox.showerror("错误", f"处理过程中出错:\n{str(error)}")
+            return
+        summary = (f"{self.results.get('done', 0)} 个视频已处理完成，"
+                   f"{self.results.get('failed', 0)} 个失败，"
+                   f"{self.results.get('cancelled', 0)} 个已取消")
+        if self.results.get("failed"):
+            messagebox.showwarning("完成", summary)
+        else:
+            messagebox.showinfo("完成", summary)
 
 if __name__ == "__main__":
     app = VideoSplitterApp()